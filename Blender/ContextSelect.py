@@ -31,6 +31,23 @@ bl_info = {
 
 import bpy
 import bmesh
+import numpy as np
+import os
+import sys
+import json
+import time
+import hashlib
+import cProfile
+import pstats
+import threading
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python 3.7 (Blender 2.80 to 2.92) doesn't have it, indices are then always built in one process.
+    shared_memory = None
 
 # Clever trick. Manage class registration automatically instead of in a hand-written list.
 classes = []
@@ -72,6 +89,55 @@ class ContextSelectPreferences(bpy.types.AddonPreferences):
                     + "NOTE: This changes the behavior of chained neighbour selections to be non-Maya like.",
         default=False)
 
+    record_timings: bpy.props.BoolProperty(
+        name="Record Timings",
+        description="Time every stage of each context select and keep the last calls for the timings report "
+                    + "(search for Context Select Timings).",
+        default=False)
+
+    profile_calls: bpy.props.BoolProperty(
+        name="Profile Calls",
+        description="Also run each context select under cProfile so the timings report can write a pstats file. "
+                    + "Slows every call down.",
+        default=False)
+
+    timing_history: bpy.props.IntProperty(
+        name="Calls To Keep",
+        description="How many of the most recent calls the timings and the profile cover.",
+        default=50,
+        min=1)
+
+    result_cache_size: bpy.props.IntProperty(
+        name="Result Cache Size (MB)",
+        description="Memory used to remember loops, rings and boundaries that were selected before "
+                    + "so that selecting them again is instant.",
+        default=64,
+        min=0)
+
+    disk_cache: bpy.props.BoolProperty(
+        name="Cache Indices On Disk",
+        description="Save the loop and ring index of every mesh to a cache folder, so that the first selection "
+                    + "after opening a file doesn't have to build it again.",
+        default=False)
+
+    disk_cache_folder: bpy.props.StringProperty(
+        name="Cache Folder",
+        description="Where to keep the cached indices. Leave empty for a folder in Blender's user data.",
+        subtype='DIR_PATH',
+        default="")
+
+    disk_cache_size: bpy.props.IntProperty(
+        name="Disk Cache Size (MB)",
+        description="The least recently used indices are deleted when the cache folder grows past this.",
+        default=2048,
+        min=0)
+
+    worker_processes: bpy.props.BoolProperty(
+        name="Build Large Indices In Worker Processes",
+        description="Label the loops and rings of meshes with millions of edges in forked worker processes. "
+                    + "Linux only. Forking a running Blender is not guaranteed to be safe, so this is off by default.",
+        default=False)
+
     def draw(self, context):
         layout = self.layout
         layout.label(text="General Selection:")
@@ -82,9 +148,31 @@ class ContextSelectPreferences(bpy.types.AddonPreferences):
         layout.label(text="Face Selection:")
         layout.prop(self, "allow_non_quads_at_ends")
         layout.prop(self, "terminate_self_intersects")
+        layout.label(text="Performance:")
+        layout.prop(self, "result_cache_size")
+        layout.prop(self, "disk_cache")
+        col = layout.column()
+        col.enabled = self.disk_cache
+        col.prop(self, "disk_cache_folder")
+        col.prop(self, "disk_cache_size")
+        layout.prop(self, "worker_processes")
+        layout.prop(self, "record_timings")
+        row = layout.row()
+        row.enabled = self.record_timings
+        row.prop(self, "profile_calls")
+        row.prop(self, "timing_history")
 classes.append(ContextSelectPreferences)
 
 
+# Every mesh object in edit mode, the active one first.  Older versions have no multi-object editing.
+def mesh_objects_in_mode(context):
+    objects = [context.object]
+    for obj in getattr(context, "objects_in_mode", []):
+        if obj.type == 'MESH' and obj != context.object:
+            objects.append(obj)
+    return objects
+
+
 class ObjectMode:
     OBJECT = 'OBJECT'
     EDIT = 'EDIT'
@@ -97,52 +185,257 @@ class ObjectMode:
     GPENCIL_EDIT = 'GPENCIL_EDIT'
 
 
+# Prints where the time of the recent context selects went, per mesh and select mode, and writes the
+# profile of those calls to a pstats file if Profile Calls is on.
+class OBJECT_OT_context_select_timings(bpy.types.Operator):
+    bl_idname = "object.context_select_timings"
+    bl_label = "Context Select Timings"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        if not _timing_history:
+            self.report({'WARNING'}, "No timings recorded, turn on Record Timings in the add-on preferences.")
+            return {'CANCELLED'}
+        print(timing_report())
+        message = "Context Select timings of the last %d calls printed to the console." % len(_timing_history)
+        if _profile_history:
+            path = os.path.join(bpy.app.tempdir, "context_select.pstats")
+            pstats.Stats(*_profile_history).dump_stats(path)
+            message += " Profile written to " + path
+        self.report({'INFO'}, message)
+        return {'FINISHED'}
+classes.append(OBJECT_OT_context_select_timings)
+
+
+# Grows every selected edge into its whole loop or ring in one go, for scripts and macros with many seeds.
+class OBJECT_OT_context_select_expand(bpy.types.Operator):
+    bl_idname = "object.context_select_expand"
+    bl_label = "Expand Selection To Loops"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    ring: bpy.props.BoolProperty(
+        name="Rings",
+        description="Expand to edge rings instead of edge loops.",
+        default=False)
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object is not None and context.active_object.mode == ObjectMode.EDIT
+
+    def execute(self, context):
+        objects = mesh_objects_in_mode(context)
+        topos = get_topology_indices(objects)
+        seeds = [selected_edges(obj) for obj in objects]
+        if not any(s.size for s in seeds):
+            return {'CANCELLED'}
+        edges = run_in_threads(rings_from_seeds if self.ring else loops_from_seeds, topos, seeds)
+        for obj, topo, obj_edges in zip(objects, topos, edges):
+            if obj_edges.size:
+                selection = SelectionBuffer(bmesh.from_edit_mesh(obj.data), topo)
+                selection.add_edges(obj_edges)
+                selection.write(context.tool_settings.mesh_select_mode)
+                update_edit_mesh(obj.data)
+        return {'FINISHED'}
+classes.append(OBJECT_OT_context_select_expand)
+
+
+# Thins the loop or ring under the active edge, or the face loop through the last two faces picked, down to
+# every Nth element counted from the active one.  The rest of that loop gets deselected.
+class OBJECT_OT_context_select_nth(bpy.types.Operator):
+    bl_idname = "object.context_select_nth"
+    bl_label = "Select Every Nth Along Loop"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    step: bpy.props.IntProperty(
+        name="Step",
+        description="Select one element out of this many.",
+        default=2,
+        min=2)
+
+    offset: bpy.props.IntProperty(
+        name="Offset",
+        description="Shift the pattern this many elements along the loop.",
+        default=0)
+
+    ring: bpy.props.BoolProperty(
+        name="Ring",
+        description="Use the edge ring of the active edge instead of its edge loop.",
+        default=False)
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object is not None and context.active_object.mode == ObjectMode.EDIT
+
+    def execute(self, context):
+        obj = context.active_object
+        me = obj.data
+        bm = bmesh.from_edit_mesh(me)
+        history = bm.select_history
+        active = history.active
+        if isinstance(active, bmesh.types.BMEdge):
+            topo = get_topology_index(obj, bm)
+            if self.ring:
+                elements, picked = nth_along_ring(topo, active.index, self.step, self.offset)
+            else:
+                elements, picked = nth_along_loop(topo, active.index, self.step, self.offset)
+            seq = bm.edges
+        elif isinstance(active, bmesh.types.BMFace) and len(history) > 1 and \
+                isinstance(history[len(history) - 2], bmesh.types.BMFace):
+            topo = get_topology_index(obj, bm)
+            shared = face_loop_edges(topo, history[len(history) - 2].index, active.index)
+            if not shared:
+                self.report({'WARNING'}, "The last two faces picked have to be neighbours.")
+                return {'CANCELLED'}
+            if len(shared) > 1:
+                self.report({'WARNING'}, "The last two faces picked share more than one edge, the loop is ambiguous.")
+                return {'CANCELLED'}
+            prefs = context.preferences.addons[__name__].preferences
+            elements, picked = nth_along_face_loop(topo, shared[0], active.index, self.step, self.offset,
+                                                   prefs.allow_non_quads_at_ends)
+            seq = bm.faces
+        else:
+            self.report({'WARNING'}, "Pick an edge, or two neighbouring faces, to go along.")
+            return {'CANCELLED'}
+        if not elements.size:
+            return {'CANCELLED'}
+
+        selection = SelectionBuffer(bm, topo)
+        if seq is bm.edges:
+            selection.remove_edges(np.intersect1d(elements, selected_edges(obj)))
+            selection.add_edges(picked)
+        else:
+            selection.remove_faces(np.intersect1d(elements, selected_faces(obj)))
+            selection.add_faces(picked)
+        selection.write(context.tool_settings.mesh_select_mode)
+        update_edit_mesh(me)
+        return {'FINISHED'}
+classes.append(OBJECT_OT_context_select_nth)
+
+
+# Prints loop and ring length statistics, poles and the tris and n-gons that end face loops for every mesh in
+# edit mode, and can select the poles and those faces.
+class OBJECT_OT_context_select_report(bpy.types.Operator):
+    bl_idname = "object.context_select_report"
+    bl_label = "Topology Report"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    select_poles: bpy.props.BoolProperty(
+        name="Select Poles",
+        description="Select the vertices with more or fewer edges than a grid has.",
+        default=False)
+
+    select_terminators: bpy.props.BoolProperty(
+        name="Select Loop Ends",
+        description="Select the tris and n-gons that face loops run into.",
+        default=False)
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object is not None and context.active_object.mode == ObjectMode.EDIT
+
+    def execute(self, context):
+        objects = mesh_objects_in_mode(context)
+        topos = get_topology_indices(objects)
+        reports = run_in_threads(topology_report, topos)
+        for obj, report in zip(objects, reports):
+            print(format_topology_report(obj.name, report))
+        self.report({'INFO'}, "Topology report printed to the console: %d poles, %d loop ends." % (
+            sum(len(r["pole_verts"]) for r in reports), sum(len(r["terminator_faces"]) for r in reports)))
+
+        if self.select_poles or self.select_terminators:
+            for obj, topo, report in zip(objects, topos, reports):
+                selection = SelectionBuffer(bmesh.from_edit_mesh(obj.data), topo)
+                if self.select_poles:
+                    selection.add_verts(report["pole_verts"])
+                if self.select_terminators:
+                    selection.add_faces(report["terminator_faces"])
+                selection.write(context.tool_settings.mesh_select_mode)
+                update_edit_mesh(obj.data)
+        return {'FINISHED'}
+classes.append(OBJECT_OT_context_select_report)
+
+
 class OBJECT_OT_context_select(bpy.types.Operator):
     bl_idname = "object.context_select"
     bl_label = "Context Select"
     bl_options = {'REGISTER', 'UNDO'}
 
+    uv_location: bpy.props.FloatVectorProperty(
+        name="UV Location",
+        description="Where the double-click in the UV editor was, in UV space.",
+        size=2,
+        options={'HIDDEN', 'SKIP_SAVE'})
+
     @classmethod
     def poll(cls, context):
         return context.active_object is not None
 
+    def invoke(self, context, event):
+        # The UV editor has no select history to go by, so remember what was under the mouse.
+        if context.area is not None and context.area.type == 'IMAGE_EDITOR':
+            self.uv_location = context.region.view2d.region_to_view(event.mouse_region_x, event.mouse_region_y)
+        return self.execute(context)
+
     def execute(self, context):
+        prefs = context.preferences.addons[__name__].preferences
+        if not prefs.record_timings:
+            return self.select(context)
+
+        start_timing(context)
+        profile = cProfile.Profile() if prefs.profile_calls else None
+        if profile is not None:
+            profile.enable()
+        try:
+            return self.select(context)
+        finally:
+            if profile is not None:
+                profile.disable()
+            finish_timing(prefs, profile)
+
+    def select(self, context):
         if context.object.mode == ObjectMode.EDIT:
+            # Picking an element in multi-object edit mode makes its object the active one, so that is the
+            # object to work on.  The indices of the others are left until one of them is picked.
+            obj = context.object
+
+            if context.area is not None and context.area.type == 'IMAGE_EDITOR':
+                location = tuple(self.uv_location) if self.properties.is_property_set("uv_location") else None
+                return maya_uv_select(context, obj, location)
+
             # Checks if we are in vertex selection mode.
             if context.tool_settings.mesh_select_mode[0]:
-                return maya_vert_select(context)
+                return maya_vert_select(context, obj)
 
             # Checks if we are in edge selection mode.
             if context.tool_settings.mesh_select_mode[1]:
-                return maya_edge_select(context)
+                return maya_edge_select(context, obj)
 
             # Checks if we are in face selection mode.
             if context.tool_settings.mesh_select_mode[2]:
-                if context.area.type == 'VIEW_3D':
-                    return maya_face_select(context)
-                elif context.area.type == 'IMAGE_EDITOR':
-                    bpy.ops.uv.select_linked_pick(extend=False)
+                return maya_face_select(context, obj)
         return {'FINISHED'}
 classes.append(OBJECT_OT_context_select)
 
 
-def maya_vert_select(context):
+def maya_vert_select(context, obj):
     prefs = context.preferences.addons[__name__].preferences
-    me = context.object.data
+    me = obj.data
     bm = bmesh.from_edit_mesh(me)
+    mark_stage("from_edit_mesh")
 
     if len(bm.select_history) == 0:
         return {'CANCELLED'}
 
-    selected_components = [v for v in bm.verts if v.select]
-
     active_vert = bm.select_history.active
     previous_active_vert = bm.select_history[len(bm.select_history) - 2]
     # Sanity check.  Make sure we're actually working with vertices.
     if type(active_vert) is not bmesh.types.BMVert or type(previous_active_vert) is not bmesh.types.BMVert:
         return {'CANCELLED'}
 
-    relevant_neighbour_verts = get_neighbour_verts(active_vert)
+    topo = get_topology_index(obj, bm)
+    mark_stage("topology_index")
+    selection = SelectionBuffer(bm, topo)
+    relevant_neighbour_verts = get_neighbour_verts(topo, active_vert.index)
 
     adjacent = False
     if previous_active_vert.index in relevant_neighbour_verts:
@@ -151,52 +444,58 @@ def maya_vert_select(context):
     if not previous_active_vert.index == active_vert.index:
         if adjacent:
             # Instead of looping through vertices we totally cheat and use the two adjacent vertices to get an edge
-            # and then use that edge to get an edge loop. The select_flush_mode (which we must do anyway)
-            # near the end of maya_vert_select will handle converting the edge loop back into vertices.
-            active_edge = [e for e in active_vert.link_edges[:] if e in previous_active_vert.link_edges[:]][0]
-            if active_edge.is_boundary:
-                boundary_edges = get_boundary_edge_loop(active_edge)
-                for i in boundary_edges:
-                    bm.edges[i].select = True
+            # and then use that edge to get an edge loop. Selecting an edge selects its vertices anyway.
+            active_edge = topo.edge_between(active_vert.index, previous_active_vert.index)
+            if topo.edge_is_boundary[active_edge]:
+                boundary_edges = cached_result(topo, get_boundary_edge_loop, active_edge, prefs.boundary_ignore_wires)
+                selection.add_edges(boundary_edges)
             else:
-                loop_edges = entire_loop(active_edge)
-                for e in loop_edges:
-                    e.select = True
+                loop_edges = cached_result(topo, entire_loop, active_edge)
+                selection.add_edges(loop_edges)
         else:
-            if prefs.select_linked_on_double_click:
-                select_vert(active_vert)
-                bpy.ops.mesh.select_linked()
+            # If both vertices are on the same loop select the stretch of loop between them, otherwise
+            # select the whole piece.
+            loop_edges = vert_loop_span(topo, previous_active_vert.index, active_vert.index)
+            # Edges on an open border have no loops through them, so vertices along one get the border instead.
+            if not len(loop_edges):
+                loop_edges = vert_boundary_span(topo, previous_active_vert.index, active_vert.index,
+                                                prefs.boundary_ignore_wires)
+            if len(loop_edges):
+                selection.add_edges(loop_edges)
+            elif prefs.select_linked_on_double_click:
+                selection.add_verts(linked_verts(topo, active_vert.index))
     else:
         if prefs.select_linked_on_double_click:
-            select_vert(active_vert)
-            bpy.ops.mesh.select_linked()
-
-    for component in selected_components:
-        component.select = True
+            selection.add_verts(linked_verts(topo, active_vert.index))
 
     bm.select_history.add(active_vert)  # Re-add active_vert to history to keep it active.
-    bm.select_flush_mode()
-    bmesh.update_edit_mesh(me)
+    mark_stage("traversal")
+    selection.write(context.tool_settings.mesh_select_mode)
+    mark_stage("write_selection", topo, selection)
+    update_edit_mesh(me)
+    mark_stage("update_edit_mesh")
     return {'FINISHED'}
 
 
-def maya_face_select(context):
+def maya_face_select(context, obj):
     prefs = context.preferences.addons[__name__].preferences
-    me = context.object.data
+    me = obj.data
     bm = bmesh.from_edit_mesh(me)
+    mark_stage("from_edit_mesh")
 
     if len(bm.select_history) == 0:
         return {'CANCELLED'}
 
-    selected_components = [f for f in bm.faces if f.select]
-
     active_face = bm.select_history.active
     previous_active_face = bm.select_history[len(bm.select_history) - 2]
     # Sanity check.  Make sure we're actually working with faces.
     if type(active_face) is not bmesh.types.BMFace or type(previous_active_face) is not bmesh.types.BMFace:
         return {'CANCELLED'}
 
-    relevant_neighbour_faces = get_neighbour_faces(active_face)
+    topo = get_topology_index(obj, bm)
+    mark_stage("topology_index")
+    selection = SelectionBuffer(bm, topo)
+    relevant_neighbour_faces = get_neighbour_faces(topo, active_face.index)
 
     if len(active_face.verts) != 4 and len(previous_active_face.verts) != 4:
         quads = (0, 0)
@@ -211,8 +510,8 @@ def maya_face_select(context):
     if previous_active_face.index in relevant_neighbour_faces:
         adjacent = True
 
-    a_edges = active_face.edges
-    p_edges = previous_active_face.edges
+    a_edges = topo.face_edges(active_face.index)
+    p_edges = topo.face_edges(previous_active_face.index)
     if adjacent:
         ring_edge = [e for e in a_edges if e in p_edges][0]
     elif not adjacent:
@@ -221,481 +520,2467 @@ def maya_face_select(context):
         elif quads == (0, 1):
             ring_edge = p_edges[0]
 
-    corner_vert = ring_edge.verts[0]
+    corner_vert = topo.edge_verts[ring_edge, 0]
     if quads == (1, 1) or quads == (1, 0) or quads == (0, 0):
-        other_edge = [e for e in a_edges if e != ring_edge and
-                     (e.verts[0].index == corner_vert.index or e.verts[1].index == corner_vert.index)][0]
+        other_edge = [e for e in a_edges if e != ring_edge and corner_vert in topo.edge_verts[e]][0]
     elif quads == (0, 1):
-        other_edge = [e for e in p_edges if e != ring_edge and
-                     (e.verts[0].index == corner_vert.index or e.verts[1].index == corner_vert.index)][0]
+        other_edge = [e for e in p_edges if e != ring_edge and corner_vert in topo.edge_verts[e]][0]
 
     if not previous_active_face.index == active_face.index and not quads == (0, 0):
         if adjacent and (quads == (1, 1) or prefs.allow_non_quads_at_ends):
-            loop1_faces = face_loop_from_edge(ring_edge)
-            for f in loop1_faces:  # We already have the loop, so just select it.
-                bm.faces[f].select = True
+            loop1_faces = cached_result(topo, face_loop_from_edge, ring_edge, prefs.allow_non_quads_at_ends,
+                                        prefs.terminate_self_intersects)
+            if active_face.index not in loop1_faces:
+                # The faces meet at an edge that ends face loops, like a non-manifold one, so take the loops that
+                # run away from it through each of them.
+                loop1_faces = face_loops_beyond(topo, ring_edge, (previous_active_face.index, active_face.index))
+            if active_face.index in loop1_faces:
+                selection.add_faces(loop1_faces)  # We already have the loop, so just select it.
+            elif prefs.select_linked_on_double_click:
+                selection.add_faces(linked_faces(topo, active_face.index, seam_edges(obj)))
         elif not adjacent and (quads == (1, 1) or prefs.allow_non_quads_at_ends):
-            loop1_faces = face_loop_from_edge(ring_edge)
+            loop1_faces = cached_result(topo, face_loop_from_edge, ring_edge, prefs.allow_non_quads_at_ends,
+                                        prefs.terminate_self_intersects)
             # If we are lucky then both faces will be in the first loop and we won't even have to test a second loop.
             # (Save time on very dense meshes with LONG face loops.)
             if active_face.index in loop1_faces and previous_active_face.index in loop1_faces:
-                select_face(active_face)
-                previous_active_face.select = True
-                # Using topology distance seems to catch more cases which makes this slightly better?
-                bpy.ops.mesh.shortest_path_select(use_face_step=False, use_topology_distance=True)
+                selection.add_faces(face_path(topo, previous_active_face.index, active_face.index, ring_edge))
             # If they weren't both in the first loop tested, try a second loop perpendicular to the first.
             else:
-                loop2_faces = face_loop_from_edge(other_edge)
+                loop2_faces = cached_result(topo, face_loop_from_edge, other_edge, prefs.allow_non_quads_at_ends,
+                                            prefs.terminate_self_intersects)
                 if active_face.index in loop2_faces and previous_active_face.index in loop2_faces:
-                    select_face(active_face)
-                    previous_active_face.select = True
-                    # Using topology distance seems to catch more cases which makes this slightly better?
-                    bpy.ops.mesh.shortest_path_select(use_face_step=False, use_topology_distance=True)
+                    selection.add_faces(face_path(topo, previous_active_face.index, active_face.index, other_edge))
                 # If neither loop contains both faces, select linked.
                 else:
                     if prefs.select_linked_on_double_click:
-                        select_face(active_face)
-                        bpy.ops.mesh.select_linked()
+                        selection.add_faces(linked_faces(topo, active_face.index, seam_edges(obj)))
         else:  # Catchall for if not prefs.allow_non_quads_at_ends
             if prefs.select_linked_on_double_click:
-                select_face(active_face)
-                bpy.ops.mesh.select_linked()
+                selection.add_faces(linked_faces(topo, active_face.index, seam_edges(obj)))
     else:
         if prefs.select_linked_on_double_click:
-            select_face(active_face)
-            bpy.ops.mesh.select_linked()
-
-    for component in selected_components:
-        component.select = True
+            selection.add_faces(linked_faces(topo, active_face.index, seam_edges(obj)))
 
     bm.select_history.add(active_face)
-    bm.select_flush_mode()
-    bmesh.update_edit_mesh(me)
+    mark_stage("traversal")
+    selection.write(context.tool_settings.mesh_select_mode)
+    mark_stage("write_selection", topo, selection)
+    update_edit_mesh(me)
+    mark_stage("update_edit_mesh")
     return {'FINISHED'}
 
 
-def maya_edge_select(context):
+def maya_edge_select(context, obj):
     prefs = context.preferences.addons[__name__].preferences
-    me = context.object.data
+    me = obj.data
     bm = bmesh.from_edit_mesh(me)
+    mark_stage("from_edit_mesh")
 
     if len(bm.select_history) == 0:
         return {'CANCELLED'}
 
-    # Everything that is currently selected.
-    selected_components = [e for e in bm.edges if e.select]
-
     active_edge = bm.select_history.active
     previous_active_edge = bm.select_history[len(bm.select_history) - 2]
     # Sanity check.  Make sure we're actually working with edges.
     if type(active_edge) is not bmesh.types.BMEdge or type(previous_active_edge) is not bmesh.types.BMEdge:
         return {'CANCELLED'}
 
-    relevant_neighbour_edges = get_neighbour_edges(active_edge)
+    topo = get_topology_index(obj, bm)
+    mark_stage("topology_index")
+    selection = SelectionBuffer(bm, topo)
+    # From here on we only deal in edge indices.
+    active_edge = active_edge.index
+    previous_active_edge = previous_active_edge.index
+
+    relevant_neighbour_edges = get_neighbour_edges(topo, active_edge)
     opr_selection = [active_edge, previous_active_edge]
 
     adjacent = False
-    if previous_active_edge.index in relevant_neighbour_edges:
+    if previous_active_edge in relevant_neighbour_edges:
         adjacent = True
 
-    if not previous_active_edge.index == active_edge.index:
+    if not previous_active_edge == active_edge:
         if adjacent:
             # If a vertex is shared then the active_edge and previous_active_edge are physically connected.
             # We want to select a full edge loop.
-            if any([v for v in active_edge.verts if v in previous_active_edge.verts]):
-                if not active_edge.is_boundary:
-                    loop_edges = entire_loop(active_edge)
-                    for e in loop_edges:
-                        e.select = True
-                elif active_edge.is_boundary:
-                    boundary_edges = get_boundary_edge_loop(active_edge)
-                    for i in boundary_edges:
-                        bm.edges[i].select = True
+            if np.intersect1d(topo.edge_verts[active_edge], topo.edge_verts[previous_active_edge]).size:
+                if not topo.edge_is_boundary[active_edge]:
+                    loop_edges = cached_result(topo, entire_loop, active_edge)
+                    selection.add_edges(loop_edges)
+                elif topo.edge_is_boundary[active_edge]:
+                    boundary_edges = cached_result(topo, get_boundary_edge_loop, active_edge,
+                                                   prefs.boundary_ignore_wires)
+                    selection.add_edges(boundary_edges)
             # If they're not connected but still adjacent then we want a full edge ring.
             else:
-                ring_edges = entire_ring(active_edge)
-                for e in ring_edges:
-                    e.select = True
+                ring_edges = cached_result(topo, entire_ring, active_edge)
+                selection.add_edges(ring_edges)
         # If we're not adjacent we have to test for bounded selections.
         elif not adjacent:
-            test_loop_edges = entire_loop(active_edge)
+            test_loop_edges = cached_result(topo, entire_loop, active_edge)
             if previous_active_edge in test_loop_edges:
-                if not active_edge.is_boundary:
-                    new_sel = select_bounded_loop(opr_selection)
-                    for i in new_sel:
-                        bm.edges[i].select = True
+                if not topo.edge_is_boundary[active_edge]:
+                    new_sel = select_bounded_loop(topo, opr_selection)
+                    selection.add_edges(new_sel)
             # If we're not in the loop test selection, try a ring test selection.
             elif previous_active_edge not in test_loop_edges:
-                test_ring_edges = entire_ring(active_edge)
+                test_ring_edges = cached_result(topo, entire_ring, active_edge)
                 if previous_active_edge in test_ring_edges:
-                    new_sel = select_bounded_ring(opr_selection)
-                    for i in new_sel:
-                        bm.edges[i].select = True
+                    new_sel = select_bounded_ring(topo, opr_selection)
+                    selection.add_edges(new_sel)
                 # If we're not in the test_loop_edges and not in the test_ring_edges
                 # we're adding a new loop selection somewhere else on the mesh.
                 else:
-                    if active_edge.is_boundary:
-                        boundary_edges = get_boundary_edge_loop(active_edge)
-                        for i in boundary_edges:
-                            bm.edges[i].select = True
-                    elif active_edge.is_wire:
-                        bpy.ops.mesh.edgering_select('INVOKE_DEFAULT', ring=False)
+                    if topo.edge_is_boundary[active_edge]:
+                        boundary_edges = cached_result(topo, get_boundary_edge_loop, active_edge,
+                                                       prefs.boundary_ignore_wires)
+                        selection.add_edges(boundary_edges)
+                    # Wire edges have loops too, they run through vertices where just two wire edges meet.
                     else:
-                        loop_edges = entire_loop(active_edge)
-                        for e in loop_edges:
-                            e.select = True
+                        loop_edges = cached_result(topo, entire_loop, active_edge)
+                        selection.add_edges(loop_edges)
     # I guess clicking an edge twice makes the previous and active the same? Or maybe the selection history is
     # only 1 item long.  Therefore we must be selecting a new loop that's not related to any previous selected edge.
     else:
-        if active_edge.is_boundary:
-            boundary_edges = get_boundary_edge_loop(active_edge)
-            for i in boundary_edges:
-                bm.edges[i].select = True
-        elif active_edge.is_wire:
-            bpy.ops.mesh.edgering_select('INVOKE_DEFAULT', ring=False)
+        if topo.edge_is_boundary[active_edge]:
+            boundary_edges = cached_result(topo, get_boundary_edge_loop, active_edge, prefs.boundary_ignore_wires)
+            selection.add_edges(boundary_edges)
+        # Wire edges have loops too, they run through vertices where just two wire edges meet.
         else:
-            loop_edges = entire_loop(active_edge)
-            for e in loop_edges:
-                e.select = True
-
-    # Finally, in addition to the new selection we made, re-select anything that was selected back when we started.
-    for component in selected_components:
-        component.select = True
+            loop_edges = cached_result(topo, entire_loop, active_edge)
+            selection.add_edges(loop_edges)
 
     # I have no idea why clearing history matters for edges and not for verts/faces, but it seems that it does.
     bm.select_history.clear()
     # Re-adding the active_edge to keep it active alters the way chained selections work
     # in a way that is not like Maya so it is a user preference now.
     if prefs.leave_edge_active:
-        bm.select_history.add(active_edge)
-    bm.select_flush_mode()
-    bmesh.update_edit_mesh(me)
+        bm.select_history.add(bm.edges[active_edge])
+    mark_stage("traversal")
+    selection.write(context.tool_settings.mesh_select_mode)
+    mark_stage("write_selection", topo, selection)
+    update_edit_mesh(me)
+    mark_stage("update_edit_mesh")
     return {'FINISHED'}
 
 
-# Takes a vertex and return a set of indicies for adjacent vertices.
-def get_neighbour_verts(vertex):
-    edges = vertex.link_edges[:]
-    relevant_neighbour_verts = {v.index for e in edges for v in e.verts[:] if v != vertex}
+# Double-click in the UV editor: the whole UV island in face and vertex mode, and in edge mode the UV boundary
+# when the edge is on one, otherwise the edge loop for as far as it stays connected in UV space.  With sync
+# selection on the mesh elements get selected, otherwise the UVs.
+def maya_uv_select(context, obj, location):
+    prefs = context.preferences.addons[__name__].preferences
+    me = obj.data
+    bm = bmesh.from_edit_mesh(me)
+    mark_stage("from_edit_mesh")
+    uv_layer = bm.loops.layers.uv.active
+    if uv_layer is None:
+        return {'CANCELLED'}
+
+    topo = get_topology_index(obj, bm)
+    mark_stage("topology_index")
+    uvi = get_uv_index(obj, topo)
+    mark_stage("uv_index")
+
+    tool_settings = context.tool_settings
+    sync = tool_settings.use_uv_select_sync
+    if not sync:
+        mode = tool_settings.uv_select_mode
+    elif tool_settings.mesh_select_mode[0]:
+        mode = 'VERTEX'
+    elif tool_settings.mesh_select_mode[1]:
+        mode = 'EDGE'
+    else:
+        mode = 'FACE'
+    shown = uv_editor_faces(obj, sync)
+    mark_stage("uv_editor_faces")
+
+    faces = loops = None
+    if location is None:
+        # Called without a mouse position, from a script or a redo: go by the active face.
+        if bm.faces.active is None:
+            return {'CANCELLED'}
+        faces = uvi.island(uvi.face_island[bm.faces.active.index])
+    elif not shown.size:
+        return {'CANCELLED'}
+    elif mode == 'EDGE':
+        loop = pick_uv_edge(topo, uvi, location, shown)
+        if uvi.loop_boundary[loop] >= 0:
+            loops = uvi.boundary(uvi.loop_boundary[loop])
+        else:
+            loops = uv_edge_loop(topo, uvi, loop)
+    elif mode == 'VERTEX':
+        if not prefs.select_linked_on_double_click:
+            return {'FINISHED'}
+        loop = pick_uv_corner(topo, uvi, location, shown)
+        faces = uvi.island(uvi.face_island[topo.loop_face[loop]])
+    else:
+        face = pick_uv_face(topo, uvi, location, shown)
+        faces = uvi.island(uvi.face_island[face])
+    if faces is not None:
+        is_shown = np.zeros(topo.num_faces, dtype=bool)
+        is_shown[shown] = True
+        faces = faces[is_shown[faces]]
+    mark_stage("uv_select")
+
+    if sync:
+        selection = SelectionBuffer(bm, topo)
+        if faces is not None:
+            selection.add_faces(faces)
+        else:
+            selection.add_edges(topo.loop_edge[loops])
+        selection.write(tool_settings.mesh_select_mode)
+    elif faces is not None:
+        select_uv_faces(bm, uv_layer, faces)
+    else:
+        select_uv_edges(bm, topo, uv_layer, loops)
+    mark_stage("write_selection")
+    update_edit_mesh(me)
+    return {'FINISHED'}
+
+
+# ##################### Instrumentation ##################### #
+
+# The call being timed, if Record Timings is on, and the last timing_history calls.
+_timing = None
+_timing_history = deque()
+_profile_history = deque()
+# Histogram bucket edges in seconds, doubling from 0.1 ms.
+_TIMING_BUCKETS = 0.0001 * 2.0 ** np.arange(16)
+
+
+def start_timing(context):
+    global _timing
+    mode = [name for name, on in zip(("VERT", "EDGE", "FACE"), context.tool_settings.mesh_select_mode) if on]
+    _timing = {"mesh": context.object.data.name, "mode": "+".join(mode), "stages": [], "counts": {},
+               "start": time.perf_counter()}
+    _timing["last"] = _timing["start"]
+
+
+# Ends the current stage of the call being timed.  Passing the index and the selection also records the size
+# of the mesh and of the new selection.
+def mark_stage(name, topo=None, selection=None):
+    if _timing is None:
+        return
+    now = time.perf_counter()
+    _timing["stages"].append((name, now - _timing["last"]))
+    _timing["last"] = now
+    if topo is not None:
+        _timing["counts"] = {"verts": topo.num_verts, "edges": topo.num_edges, "faces": topo.num_faces,
+                             "selected": int(selection.verts.sum() + selection.edges.sum() + selection.faces.sum())}
+
+
+def finish_timing(prefs, profile):
+    global _timing
+    if _timing is None:
+        return
+    _timing["stages"].append(("total", time.perf_counter() - _timing["start"]))
+    _timing_history.append(_timing)
+    _timing = None
+    if profile is not None:
+        _profile_history.append(profile)
+    while len(_timing_history) > prefs.timing_history:
+        _timing_history.popleft()
+    while len(_profile_history) > prefs.timing_history:
+        _profile_history.popleft()
+
+
+# Per mesh and select mode: the number of calls, the mesh size, and for every stage the mean time and a
+# histogram over the buckets of _TIMING_BUCKETS.
+def timing_report():
+    groups = OrderedDict()
+    for call in _timing_history:
+        groups.setdefault((call["mesh"], call["mode"]), []).append(call)
+    lines = ["Context Select timings, last %d calls" % len(_timing_history)]
+    for (mesh, mode), calls in groups.items():
+        counts = next((c["counts"] for c in reversed(calls) if c["counts"]), {})
+        lines.append("%s (%s): %d calls, %s" % (mesh, mode, len(calls),
+                                                ", ".join("%d %s" % (v, k) for k, v in counts.items())))
+        stages = OrderedDict()
+        for call in calls:
+            for name, seconds in call["stages"]:
+                stages.setdefault(name, []).append(seconds)
+        for name, times in stages.items():
+            histogram = np.bincount(np.searchsorted(_TIMING_BUCKETS, times), minlength=len(_TIMING_BUCKETS) + 1)
+            lines.append("  %-18s mean %9.2f ms  max %9.2f ms  |%s|" % (
+                name, np.mean(times) * 1000, np.max(times) * 1000,
+                "".join(" .:-=+*#"[min(7, c)] for c in histogram)))
+    lines.append("Histogram columns double from 0.1 ms, one character per bucket from . (1 call) to # (7+).")
+    return "\n".join(lines)
+
+
+# ##################### Selection I/O ##################### #
+
+# Edit-mode BMesh has no bulk access to selection state, every read or write is one Python call per element.
+# So new selections are gathered as boolean masks over the topology index, only the highest element of each
+# is written (a face selects its edges and vertices, an edge its vertices), and the selection is flushed
+# around the elements that were touched instead of over the whole mesh.  Deselections are gathered the same
+# way, callers should only remove elements that are selected (see selected_edges) so nothing else is touched.
+class SelectionBuffer:
+    def __init__(self, bm, topo):
+        self.bm = bm
+        self.topo = topo
+        self.verts = np.zeros(topo.num_verts, dtype=bool)
+        self.edges = np.zeros(topo.num_edges, dtype=bool)
+        self.faces = np.zeros(topo.num_faces, dtype=bool)
+        self.removed_edges = np.zeros(topo.num_edges, dtype=bool)
+        self.removed_faces = np.zeros(topo.num_faces, dtype=bool)
+
+    def add_verts(self, verts):
+        self.verts[_indices(verts)] = True
+
+    def add_edges(self, edges):
+        self.edges[_indices(edges)] = True
+
+    def add_faces(self, faces):
+        self.faces[_indices(faces)] = True
+
+    def remove_edges(self, edges):
+        self.removed_edges[_indices(edges)] = True
+
+    def remove_faces(self, faces):
+        self.removed_faces[_indices(faces)] = True
+
+    # Deselects what was removed and not added back, selects everything that was added, then does what
+    # BMesh.select_flush_mode would for the given select mode around the additions.  Deselecting an edge
+    # leaves the faces around it selected, so after removals the whole selection is flushed instead.
+    def write(self, select_mode):
+        topo = self.topo
+        removed_faces = np.flatnonzero(self.removed_faces & ~self.faces)
+        removed_edges = np.flatnonzero(self.removed_edges & ~self.edges)
+        for i in removed_faces.tolist():
+            self.bm.faces[i].select = False
+        for i in removed_edges.tolist():
+            self.bm.edges[i].select = False
+        faces = np.flatnonzero(self.faces)
+        corners = _ranges(topo.face_loop_start[faces], topo.face_valence[faces])
+        face_edges = np.zeros(topo.num_edges, dtype=bool)
+        face_edges[topo.loop_edge[corners]] = True
+        edges = np.flatnonzero(self.edges & ~face_edges)
+        edge_verts = np.zeros(topo.num_verts, dtype=bool)
+        edge_verts[topo.loop_vert[corners]] = True
+        edge_verts[topo.edge_verts[edges].ravel()] = True
+        verts = np.flatnonzero(self.verts & ~edge_verts)
+
+        for i in faces.tolist():
+            self.bm.faces[i].select = True
+        for i in edges.tolist():
+            self.bm.edges[i].select = True
+        for i in verts.tolist():
+            self.bm.verts[i].select = True
+        self.edges |= face_edges
+        self.verts |= edge_verts
+
+        if removed_faces.size or removed_edges.size:
+            self.bm.select_flush_mode()
+        elif select_mode[0]:
+            self._flush_verts()
+        elif select_mode[1]:
+            self._flush_edges()
+
+    # Vertex mode: edges and faces next to the new vertices are selected if all of their vertices are.
+    def _flush_verts(self):
+        topo = self.topo
+        edges = np.flatnonzero(self.verts[topo.edge_verts].any(axis=1) & ~self.edges)
+        ends = self._selected(self.bm.verts, self.verts, topo.edge_verts[edges].ravel())
+        for i in edges[ends.reshape(-1, 2).all(axis=1)].tolist():
+            self.bm.edges[i].select = True
+        self._flush_faces(self.verts, self.bm.verts, topo.loop_vert)
+
+    # Edge mode: faces next to the new edges are selected if all of their edges are.
+    def _flush_edges(self):
+        self._flush_faces(self.edges, self.bm.edges, self.topo.loop_edge)
+
+    def _flush_faces(self, mask, seq, loop_elem):
+        topo = self.topo
+        if not topo.num_faces:
+            return
+        near = np.logical_or.reduceat(mask[loop_elem], topo.face_loop_start) & ~self.faces
+        faces = np.flatnonzero(near)
+        if not faces.size:
+            return
+        corners = self._selected(seq, mask, loop_elem[_ranges(topo.face_loop_start[faces], topo.face_valence[faces])])
+        full = np.logical_and.reduceat(corners, _offsets(topo.face_valence[faces]))
+        for i in faces[full].tolist():
+            self.bm.faces[i].select = True
+
+    # Selection state of the given elements: known if we selected them, otherwise read from the BMesh.
+    @staticmethod
+    def _selected(seq, mask, indices):
+        state = mask[indices]
+        unknown, where = np.unique(indices[~state], return_inverse=True)
+        if unknown.size:
+            read = np.fromiter((seq[i].select for i in unknown.tolist()), dtype=bool, count=len(unknown))
+            state[~state] = read[where]
+        return state
+
+
+# Indices of the selected edges, read in bulk from the Mesh datablock after syncing it with the edit BMesh.
+# get_topology_index keeps the BMesh indices in Mesh order so they can be used on either.
+def selected_edges(obj):
+    obj.update_from_editmode()
+    return _selected_indices(obj.data.edges)
+
+
+# Same as selected_edges for faces.
+def selected_faces(obj):
+    obj.update_from_editmode()
+    return _selected_indices(obj.data.polygons)
+
+
+# Mask of the edges marked as UV seams, read the same way as selected_edges.
+def seam_edges(obj):
+    obj.update_from_editmode()
+    mask = np.empty(len(obj.data.edges), dtype=bool)
+    obj.data.edges.foreach_get("use_seam", mask)
+    return mask
+
+
+def _selected_indices(seq):
+    mask = np.empty(len(seq), dtype=bool)
+    seq.foreach_get("select", mask)
+    return np.flatnonzero(mask)
+
+
+def _indices(items):
+    if isinstance(items, np.ndarray):
+        return items
+    return np.fromiter(items, dtype=np.int64, count=len(items))
+
+
+# ##################### Topology index ##################### #
+
+# Walking BMesh wrappers (link_loops, link_loop_radial_next, link_edges[:]) allocates a Python proxy object or a
+# list copy on every hop, which stalls for seconds on multi-million face meshes.  Instead the mesh connectivity
+# is pulled out of the Mesh datablock in bulk once per edit session and every traversal below runs over these
+# flat integer arrays.  Loops are the half-edges; a loop belongs to one face and one edge and starts at one vertex.
+class TopologyIndex:
+    def __init__(self, num_verts, edge_verts, loop_vert, loop_edge, face_loop_start, face_loop_total):
+        self._build_base(num_verts, edge_verts, loop_vert, loop_edge, face_loop_start, face_loop_total)
+        self.vert_is_manifold = self._vert_is_manifold()
+
+        # Edge loops: every edge gets a loop ID and its ordinal position along that loop.
+        self.loop_successor = self._loop_successors()
+        self._build_loops()
+
+        # Edge rings: every edge gets a ring ID and a position, and the quads between ring edges form face loops.
+        self._build_rings()
+        self._build_rest()
+
+    # The plain connectivity: everything that is a direct lookup or a sort of the mesh arrays.
+    def _build_base(self, num_verts, edge_verts, loop_vert, loop_edge, face_loop_start, face_loop_total):
+        num_edges = len(edge_verts)
+        num_faces = len(face_loop_start)
+        num_loops = len(loop_vert)
+        self.num_verts = num_verts
+        self.num_edges = num_edges
+        self.num_faces = num_faces
+        self.num_loops = num_loops
+
+        self.edge_verts = edge_verts
+        self.loop_vert = loop_vert
+        self.loop_edge = loop_edge
+        self.face_loop_start = face_loop_start
+        self.face_valence = face_loop_total
+
+        # Loop -> face, and next/prev loop around that face.
+        self.loop_face = np.repeat(np.arange(num_faces, dtype=np.int32), face_loop_total)
+        first = face_loop_start[self.loop_face]
+        size = face_loop_total[self.loop_face]
+        offset = np.arange(num_loops, dtype=np.int32) - first
+        self.loop_next = (first + (offset + 1) % size).astype(np.int32)
+        self.loop_prev = (first + (offset - 1) % size).astype(np.int32)
+
+        # Edge -> loops (the radial cycle), stored CSR style: edge_loops[edge_loop_start[e]:][:edge_face_count[e]].
+        self.edge_face_count = np.bincount(loop_edge, minlength=num_edges).astype(np.int32)
+        self.edge_loop_start = _offsets(self.edge_face_count)
+        self.edge_loops = np.argsort(loop_edge, kind='stable').astype(np.int32)
+        group_start = self.edge_loop_start[loop_edge[self.edge_loops]]
+        group_size = self.edge_face_count[loop_edge[self.edge_loops]]
+        group_offset = np.arange(num_loops, dtype=np.int32) - group_start
+        self.loop_radial = np.empty(num_loops, dtype=np.int32)
+        self.loop_radial[self.edge_loops] = self.edge_loops[group_start + (group_offset + 1) % group_size]
+
+        self.edge_is_wire = self.edge_face_count == 0
+        self.edge_is_boundary = self.edge_face_count == 1
+        self.edge_is_manifold = self.edge_face_count == 2
+
+        # Vertex -> edges (the disk cycle), also CSR.  The stable sort keeps each vertex's edges in index order.
+        flat_verts = edge_verts.ravel()
+        self.vert_valence = np.bincount(flat_verts, minlength=num_verts).astype(np.int32)
+        self.vert_edge_start = _offsets(self.vert_valence)
+        self.vert_edges = (np.argsort(flat_verts, kind='stable') // 2).astype(np.int32)
+        self.vert_loop_count = np.bincount(loop_vert, minlength=num_verts).astype(np.int32)
+
+        # The loop on the far side of a quad, and the edges where rings stop.
+        self.quad_opposite = np.where(self.face_valence[self.loop_face] == 4,
+                                      self.loop_next[self.loop_next], -1).astype(np.int32)
+        quad_count = np.bincount(loop_edge[self.quad_opposite >= 0], minlength=num_edges)
+        self.edge_is_ring_end = (self.edge_face_count != 2) | (quad_count != self.edge_face_count)
+        self.edge_is_ring_end &= ~self.edge_is_wire
+        self._hashes = None
+
+    # What is built on top of the loops and rings, the same after a full build and after a repair.
+    def _build_rest(self):
+        # Vertex -> the loops through it, lined up with vert_edges.
+        self.vert_loop_ids = self.loop_id[self.vert_edges]
+
+        # Boundary loops: every border edge gets a boundary ID for each setting of boundary_ignore_wires.
+        self._build_boundaries()
+
+        # Face -> faces across its edges, built the first time a face path is needed.
+        self.face_link_start = None
+        self.face_link_count = None
+        self.face_links = None
+
+        # Connected pieces of the mesh, also built on first use.
+        self.vert_component = None
+        self.saved_to_disk = False
+
+    @classmethod
+    def from_mesh(cls, me):
+        return cls(*cls.mesh_arrays(me))
+
+    @staticmethod
+    def mesh_arrays(me):
+        edge_verts = np.empty(len(me.edges) * 2, dtype=np.int32)
+        me.edges.foreach_get("vertices", edge_verts)
+        loop_vert = np.empty(len(me.loops), dtype=np.int32)
+        me.loops.foreach_get("vertex_index", loop_vert)
+        loop_edge = np.empty(len(me.loops), dtype=np.int32)
+        me.loops.foreach_get("edge_index", loop_edge)
+        face_loop_start = np.empty(len(me.polygons), dtype=np.int32)
+        me.polygons.foreach_get("loop_start", face_loop_start)
+        face_loop_total = np.empty(len(me.polygons), dtype=np.int32)
+        me.polygons.foreach_get("loop_total", face_loop_total)
+        return (len(me.vertices), edge_verts.reshape(-1, 2), loop_vert, loop_edge,
+                face_loop_start, face_loop_total)
+
+    # The mesh arrays this index was built from, in the order mesh_arrays returns them.
+    def source_arrays(self):
+        return (self.num_verts, self.edge_verts, self.loop_vert, self.loop_edge,
+                self.face_loop_start, self.face_valence)
+
+    # The arrays of this index that go in the disk cache (_STORED_ARRAYS), by name.  Lazily built parts are left
+    # out until they exist.
+    def stored_arrays(self):
+        return {name: getattr(self, name) for name in _STORED_ARRAYS if getattr(self, name) is not None}
+
+    # Puts an index back together from the mesh arrays and what stored_arrays returned for them.
+    @classmethod
+    def from_stored(cls, arrays, stored):
+        topo = cls.__new__(cls)
+        topo._build_base(*arrays)
+        for name, value in stored.items():
+            setattr(topo, name, value)
+        topo._build_rest()
+        topo.vert_component = stored.get("vert_component")
+        topo.saved_to_disk = True
+        return topo
+
+    # Whether mesh_arrays read from a mesh describe the same topology this index was built from.
+    def same_topology(self, arrays):
+        num_verts, edge_verts, loop_vert, loop_edge, face_loop_start, face_loop_total = arrays
+        return (num_verts == self.num_verts and np.array_equal(edge_verts, self.edge_verts)
+                and np.array_equal(loop_vert, self.loop_vert) and np.array_equal(loop_edge, self.loop_edge)
+                and np.array_equal(face_loop_start, self.face_loop_start)
+                and np.array_equal(face_loop_total, self.face_valence))
+
+    # Builds the index of an edited mesh from the index of the same mesh before the edit.  Loops and rings that
+    # don't come near anything that changed keep their IDs, only the ones through the changed part get labelled
+    # again.  That needs the untouched elements to keep their indices, which holds when an edit only adds
+    # elements or changes some in place (extrude, knife, subdivide).  Returns None, for a full build instead,
+    # when more than _REPAIR_LIMIT of the mesh changed, which is also what deleting something low in the
+    # index order looks like.
+    @classmethod
+    def repaired(cls, old, arrays):
+        if len(old.loop_edges) > 2 * old.num_edges or len(old.ring_edges) > 3 * old.num_edges:
+            # Too many leftovers of earlier repairs, compact everything again.
+            return None
+        topo = cls.__new__(cls)
+        topo._build_base(*arrays)
+        dirty_verts, dirty_edges = topo._changes_since(old)
+        limit = _REPAIR_LIMIT * max(topo.num_edges, 1)
+        if np.count_nonzero(dirty_edges) > limit or np.count_nonzero(dirty_verts) > limit:
+            return None
+        topo._repair_loops(old, dirty_verts)
+        topo._repair_rings(old, dirty_edges)
+        topo._build_rest()
+        return topo
+
+    # A hash of every vertex and edge over the elements around it.  An edge's hash covers its vertices and
+    # its faces with their corners, a vertex's hash covers its edges and their hashes.  When an element keeps
+    # its index and its hash through an edit, the loops and rings around it are still the same.
+    def _element_hashes(self):
+        if self._hashes is None:
+            corner = self.loop_vert.astype(np.uint64)
+            corner = corner << np.uint64(32) | corner[self.loop_next]
+            face_hash = _sum_runs(_mix(corner), self.face_loop_start, self.face_valence)
+            face_hash = _mix(face_hash ^ np.arange(self.num_faces, dtype=np.uint64))
+            edge_key = self.edge_verts.astype(np.uint64)
+            edge_key = edge_key[:, 0] << np.uint64(32) | edge_key[:, 1]
+            edge_faces = face_hash[self.loop_face[self.edge_loops]]
+            edge_hash = _mix(edge_key) + _sum_runs(edge_faces, self.edge_loop_start, self.edge_face_count)
+            vert_edges = _mix(edge_hash[self.vert_edges] ^ self.vert_edges.astype(np.uint64))
+            vert_hash = _sum_runs(vert_edges, self.vert_edge_start, self.vert_valence)
+            self._hashes = (vert_hash, edge_hash)
+        return self._hashes
+
+    # Masks of the vertices and edges that are new or differ from the ones with the same index in old.
+    def _changes_since(self, old):
+        dirty = []
+        for new_hash, old_hash in zip(self._element_hashes(), old._element_hashes()):
+            n = min(len(new_hash), len(old_hash))
+            changed = np.ones(len(new_hash), dtype=bool)
+            changed[:n] = new_hash[:n] != old_hash[:n]
+            dirty.append(changed)
+        return dirty
+
+    # Takes over old's loops, except for the ones through edges at changed vertices which are labelled again
+    # and appended.  Their old IDs are left behind with length 0.
+    def _repair_loops(self, old, dirty_verts):
+        num_edges = self.num_edges
+        kept_verts = min(self.num_verts, old.num_verts)
+        kept_edges = min(num_edges, old.num_edges)
+
+        # Manifold vertices and loop successors only change at changed vertices.
+        self.vert_is_manifold = np.zeros(self.num_verts, dtype=bool)
+        self.vert_is_manifold[:kept_verts] = old.vert_is_manifold[:kept_verts]
+        self.vert_is_manifold[dirty_verts] = self._vert_is_manifold(dirty_verts)[dirty_verts]
+        self.loop_successor = np.full((num_edges, 2), -1, dtype=np.int32)
+        self.loop_successor[:kept_edges] = old.loop_successor[:kept_edges]
+        at_dirty = dirty_verts[self.edge_verts]
+        self.loop_successor[at_dirty] = self._loop_successors(dirty_verts)[at_dirty]
+
+        # Every loop that touched a changed vertex before the edit is gone, and the edges it had are relabelled
+        # along with the ones at changed vertices now.
+        touched = at_dirty.any(axis=1)
+        dead = np.unique(old.loop_id[np.flatnonzero(touched[:kept_edges])])
+        edges = touched.copy()
+        members = old.loop_edges[_ranges(old.loop_start[dead], old.loop_length[dead])]
+        edges[members[members < num_edges]] = True
+        loop_edges, run, start, length, closed = self._label_loops(np.flatnonzero(edges).astype(np.int32))
+
+        first_id = len(old.loop_start)
+        self.loop_edges = np.concatenate((old.loop_edges, loop_edges))
+        self.loop_start = np.concatenate((old.loop_start, len(old.loop_edges) + start))
+        self.loop_length = np.concatenate((old.loop_length, length))
+        self.loop_length[dead] = 0
+        self.loop_closed = np.concatenate((old.loop_closed, closed))
+        self.loop_id = np.empty(num_edges, dtype=np.int32)
+        self.loop_id[:kept_edges] = old.loop_id[:kept_edges]
+        self.loop_id[loop_edges] = first_id + run
+        self.loop_pos = np.empty(num_edges, dtype=np.int32)
+        self.loop_pos[:kept_edges] = old.loop_pos[:kept_edges]
+        self.loop_pos[loop_edges] = np.arange(len(loop_edges), dtype=np.int32) - start[run]
+
+    # Same as _repair_loops for the rings, which only change at changed edges.
+    def _repair_rings(self, old, dirty_edges):
+        num_edges = self.num_edges
+        kept_edges = min(num_edges, old.num_edges)
+
+        # The rings through changed edges before and after the edit, and those that ran across the quads next
+        # to them, as far as they are made of edges that already existed.
+        old_dirty = np.ones(old.num_edges, dtype=bool)
+        old_dirty[:kept_edges] = dirty_edges[:kept_edges]
+        across = [old.ring_id[old_dirty], old.ring_id[old._quad_neighbours(old_dirty)]]
+        neighbours = self._quad_neighbours(dirty_edges)
+        across.append(old.ring_id[neighbours[neighbours < kept_edges]])
+        rings = np.unique(np.concatenate(across))
+        edges = dirty_edges.copy()
+        members = old.ring_edges[_ranges(old.ring_start[rings], old.ring_length[rings])]
+        edges[members[members < num_edges]] = True
+        dead = np.union1d(rings, old.ring_id[np.flatnonzero(edges[:kept_edges])])
+
+        ring_edges, ring_start, ring_length, closed, ring_faces, face_start, face_count = self._label_rings(edges)
+        self.ring_id = np.full(num_edges, -1, dtype=np.int32)
+        self.ring_id[:kept_edges] = old.ring_id[:kept_edges]
+        self.ring_id[edges] = -1
+        self.ring_pos = np.zeros(num_edges, dtype=np.int32)
+        self.ring_pos[:kept_edges] = old.ring_pos[:kept_edges]
+        first_id = len(old.ring_start)
+        self._label_ring_edges(ring_edges, ring_start, ring_length, first_id)
+        single = np.flatnonzero(self.ring_id < 0).astype(np.int32)
+        self.ring_id[single] = first_id + len(ring_length) + np.arange(len(single), dtype=np.int32)
+        self.ring_pos[single] = 0
+
+        first_slot = len(old.ring_edges)
+        first_face = len(old.ring_faces)
+        self.ring_edges = np.concatenate((old.ring_edges, ring_edges, single))
+        self.ring_start = np.concatenate((old.ring_start, first_slot + ring_start,
+                                          first_slot + len(ring_edges) + np.arange(len(single), dtype=np.int32)))
+        self.ring_length = np.concatenate((old.ring_length, ring_length, np.ones(len(single), dtype=np.int32)))
+        self.ring_length[dead] = 0
+        self.ring_closed = np.concatenate((old.ring_closed, closed, np.zeros(len(single), dtype=bool)))
+        self.ring_faces = np.concatenate((old.ring_faces, ring_faces))
+        self.ring_face_start = np.concatenate((old.ring_face_start, first_face + face_start,
+                                               np.full(len(single), first_face + len(ring_faces), dtype=np.int32)))
+        self.ring_face_count = np.concatenate((old.ring_face_count, face_count,
+                                               np.zeros(len(single), dtype=np.int32)))
+        self.ring_face_count[dead] = 0
+
+    # The edges across the quads on the edges of a mask.
+    def _quad_neighbours(self, edges):
+        loops = self.edge_loops[_ranges(self.edge_loop_start[edges], self.edge_face_count[edges])]
+        opposite = self.quad_opposite[loops]
+        return self.loop_edge[opposite[opposite >= 0]]
+
+    # Same rules as BMVert.is_manifold: no wire or non-manifold edges, at most two boundary edges,
+    # and all the face corners around the vertex belong to one fan.  Only the vertices in subset (a mask)
+    # are looked at if one is given, the rest come out False.
+    def _vert_is_manifold(self, subset=None):
+        num_verts = self.num_verts
+        bad_edges = self.edge_is_wire | (self.edge_face_count > 2)
+        candidate = self.vert_valence > 0
+        if subset is not None:
+            candidate &= subset
+        candidate[self.edge_verts[bad_edges].ravel()] = False
+        boundary_verts = self.edge_verts[self.edge_is_boundary].ravel()
+        candidate &= np.bincount(boundary_verts, minlength=num_verts) <= 2
+
+        # Start each fan walk where BMesh does: the first loop of the first edge, or of the last boundary edge.
+        verts = np.flatnonzero(candidate).astype(np.int32)
+        start_edge = self.vert_edges[self.vert_edge_start[verts]]
+        last_boundary = np.full(num_verts, -1, dtype=np.int32)
+        boundary_edges = np.repeat(np.flatnonzero(self.edge_is_boundary).astype(np.int32), 2)
+        np.maximum.at(last_boundary, boundary_verts, boundary_edges)
+        start_edge = np.where(last_boundary[verts] >= 0, last_boundary[verts], start_edge)
+        first_loop = self.edge_loops[self.edge_loop_start[start_edge]]
+        first_loop = np.where(self.loop_vert[first_loop] == verts, first_loop, self.loop_next[first_loop])
+
+        region = np.ones(len(verts), dtype=np.int32)
+        cur_loop = first_loop.copy()
+        prev_edge = start_edge.copy()
+        active = np.arange(len(verts))
+        while active.size:
+            l = cur_loop[active]
+            on_prev = self.loop_edge[l] == prev_edge[active]
+            next_edge = np.where(on_prev, self.loop_edge[self.loop_prev[l]], self.loop_edge[l])
+            # Step across next_edge into the neighbouring face, unless the fan ends there.
+            alive = self.edge_is_manifold[next_edge]
+            active, l, on_prev, next_edge = active[alive], l[alive], on_prev[alive], next_edge[alive]
+            across = self.loop_radial[np.where(on_prev, self.loop_prev[l], l)]
+            l = np.where(self.loop_vert[across] == verts[active], across, self.loop_next[across])
+            alive = l != first_loop[active]
+            active, l, next_edge = active[alive], l[alive], next_edge[alive]
+            cur_loop[active] = l
+            prev_edge[active] = next_edge
+            region[active] += 1
+
+        is_manifold = np.zeros(num_verts, dtype=bool)
+        is_manifold[verts] = region == self.vert_loop_count[verts]
+        return is_manifold
+
+    # For every edge and each of its two ends, the edge that continues the loop past that end's vertex, or -1.
+    # This is Loopanar's loop extension done for the whole mesh at once: at a manifold vertex with four face corners
+    # the next edge is the first one in the disk cycle that shares no face corner with the current edge.
+    # With a subset mask of vertices only the edge ends at those vertices get filled in.
+    def _loop_successors(self, subset=None):
+        successor = np.full((self.num_edges, 2), -1, dtype=np.int32)
+        if subset is None:
+            subset = np.ones(self.num_verts, dtype=bool)
+
+        # Wire edges run on through vertices where exactly two of them meet, like Blender's own loop select.
+        verts = np.flatnonzero((self.vert_valence == 2) & (self.vert_loop_count == 0) & subset).astype(np.int32)
+        pair = self.vert_edges[self.vert_edge_start[verts][:, None] + np.arange(2)]
+        for k in range(2):
+            edge = pair[:, k]
+            successor[edge, (self.edge_verts[edge, 0] != verts).astype(np.int32)] = pair[:, 1 - k]
+
+        verts = np.flatnonzero((self.vert_loop_count == 4) & self.vert_is_manifold & subset).astype(np.int32)
+        if not verts.size:
+            return successor
+
+        # Every (vertex, edge) incidence at those vertices, paired with every other incidence at the same vertex.
+        valence = self.vert_valence[verts]
+        incidence = _ranges(self.vert_edge_start[verts], valence)
+        inc_vert = np.repeat(verts, valence)
+        inc_edge = self.vert_edges[incidence]
+        inc_group = np.repeat(_offsets(valence), valence)
+        inc_count = np.repeat(valence, valence)
+        pair_a = np.repeat(np.arange(len(incidence)), inc_count)
+        pair_b = _ranges(inc_group, inc_count)
+
+        # Two edges that meet at a face corner are perpendicular to each other, not part of the same loop.
+        # Edges at these vertices have one or two faces, so each incidence has at most two such neighbours.
+        first_loop = self.edge_loops[self.edge_loop_start[inc_edge]]
+        second_loop = self.edge_loops[np.minimum(self.edge_loop_start[inc_edge] + 1, self.num_loops - 1)]
+        corner_1 = self._corner_neighbour(first_loop, inc_vert)
+        corner_2 = np.where(self.edge_face_count[inc_edge] > 1, self._corner_neighbour(second_loop, inc_vert), -1)
+        edge_b = inc_edge[pair_b]
+        candidate = ((edge_b != inc_edge[pair_a]) & (edge_b != corner_1[pair_a]) & (edge_b != corner_2[pair_a]))
+
+        # The disk cycle is in edge index order, so the first candidate of each incidence is the one to keep.
+        candidate = np.flatnonzero(candidate)
+        first = np.ones(len(candidate), dtype=bool)
+        first[1:] = pair_a[candidate][1:] != pair_a[candidate][:-1]
+        found = pair_a[candidate[first]]
+        edge = inc_edge[found]
+        end = (self.edge_verts[edge, 0] != inc_vert[found]).astype(np.int32)
+        successor[edge, end] = edge_b[candidate[first]]
+
+        # Keep only continuations that agree from both sides, so that every edge sits in exactly one loop.
+        next_edge = successor[edge, end]
+        next_end = (self.edge_verts[next_edge, 0] != inc_vert[found]).astype(np.int32)
+        one_sided = successor[next_edge, next_end] != edge
+        successor[edge[one_sided], end[one_sided]] = -1
+        return successor
+
+    # Labels every edge with a loop ID and a position, and stores the loops back to back in loop_edges so that
+    # a whole loop is the slice loop_edges[loop_start[id]:][:loop_length[id]].
+    def _build_loops(self):
+        num_edges = self.num_edges
+        self.loop_edges, run, self.loop_start, self.loop_length, self.loop_closed = self._label_loops()
+        self.loop_id = np.empty(num_edges, dtype=np.int32)
+        self.loop_id[self.loop_edges] = run
+        self.loop_pos = np.empty(num_edges, dtype=np.int32)
+        self.loop_pos[self.loop_edges] = np.arange(num_edges, dtype=np.int32) - self.loop_start[run]
+
+    # Splits the given edges (sorted, all of them by default) into loops.  The loop successors of those edges
+    # must not lead outside of them.  Returns the edges in loop order, the loop of each of them, and the
+    # start, length and closed flag of every loop.
+    def _label_loops(self, edges=None):
+        if edges is None:
+            edges = np.arange(self.num_edges, dtype=np.int32)
+        # A dart 2 * e + k walks edge e away from its end k.  The next dart walks the successor edge away from
+        # the vertex we just arrived at.
+        successor = self.loop_successor[edges]
+        arrive = self.edge_verts[edges, ::-1].ravel()
+        next_edge = successor[:, ::-1].ravel()
+        has_next = next_edge >= 0
+        next_dart = np.full(len(edges) * 2, -1, dtype=np.int64)
+        next_dart[has_next] = next_edge[has_next] * 2 + (self.edge_verts[next_edge[has_next], 0] != arrive[has_next])
+        darts = (edges.astype(np.int64)[:, None] * 2 + np.arange(2)).ravel()
+        term, rank, cyclic = _rank_chains(_renumber(next_dart, darts))
+        term = darts[term]
+
+        # Both darts of an edge run along the same loop in opposite directions.  The one whose chain ends at the
+        # lower dart is the canonical direction for that loop.
+        term = term.reshape(-1, 2)
+        rank = rank.reshape(-1, 2)
+        side = (term[:, 1] < term[:, 0]).astype(np.int32)
+        rows = np.arange(len(edges))
+        key = term[rows, side]
+        order = np.lexsort((-rank[rows, side], key)).astype(np.int32)
+        run, start, length = _runs(key[order])
+        closed = cyclic.reshape(-1, 2)[order[start], 0]
+        return edges[order], run, start, length, closed
+
+    # Labels every edge with a ring ID and a position and stores the rings back to back in ring_edges, like
+    # the loops.  Face k of a ring (ring_faces) sits between its edges k and k + 1.  A ring runs through edges
+    # that have exactly two faces which are both quads, and ends at the first edge that doesn't.
+    def _build_rings(self):
+        ring_edges, ring_start, ring_length, closed, ring_faces, face_start, face_count = self._label_rings()
+
+        # Edges on a ring get its ID, except non-manifold ones which can end several rings at once.  Those, wire
+        # edges and edges without any quads are rings of their own.
+        self.ring_id = np.full(self.num_edges, -1, dtype=np.int32)
+        self.ring_pos = np.zeros(self.num_edges, dtype=np.int32)
+        self._label_ring_edges(ring_edges, ring_start, ring_length, 0)
+        single = np.flatnonzero(self.ring_id < 0).astype(np.int32)
+        self.ring_id[single] = len(ring_length) + np.arange(len(single), dtype=np.int32)
+
+        self.ring_edges = np.concatenate((ring_edges, single))
+        self.ring_start = np.concatenate((ring_start, len(ring_edges) + np.arange(len(single), dtype=np.int32)))
+        self.ring_length = np.concatenate((ring_length, np.ones(len(single), dtype=np.int32)))
+        self.ring_closed = np.concatenate((closed, np.zeros(len(single), dtype=bool)))
+        self.ring_faces = ring_faces
+        self.ring_face_start = np.concatenate((face_start, np.full(len(single), len(ring_faces), dtype=np.int32)))
+        self.ring_face_count = np.concatenate((face_count, np.zeros(len(single), dtype=np.int32)))
+
+    # Finds the rings through the given edges (a mask, all edges by default).  Rings must not run from those
+    # edges into others.  Returns the ring edges, start, length and closed flag of every ring, and its faces
+    # with their start and count.
+    def _label_rings(self, edges=None):
+        # A dart is a loop of a quad: "we arrived at this edge through this face".  The next dart crosses the
+        # edge into the other quad and arrives at the opposite edge of that quad.  Only darts with both edges of
+        # their quad in the subset are part of it, the others belong to rings that merely end on its edges.
+        is_dart = self.quad_opposite >= 0
+        if edges is not None:
+            is_dart &= edges[self.loop_edge] & edges[self.loop_edge[np.maximum(self.quad_opposite, 0)]]
+        all_darts = np.flatnonzero(is_dart)
+        next_dart = np.full(self.num_loops, -1, dtype=np.int64)
+        through = all_darts[~self.edge_is_ring_end[self.loop_edge[all_darts]]]
+        next_dart[through] = self.quad_opposite[self.loop_radial[through]]
+        term = np.full(self.num_loops, -1, dtype=np.int64)
+        rank = np.zeros(self.num_loops, dtype=np.int64)
+        cyclic = np.zeros(self.num_loops, dtype=bool)
+        sub_term, sub_rank, sub_cyclic = _rank_chains(_renumber(next_dart[all_darts], all_darts))
+        term[all_darts] = all_darts[sub_term]
+        rank[all_darts] = sub_rank
+        cyclic[all_darts] = sub_cyclic
+
+        # The opposite loop of a dart is always on the chain that runs the other way along the same ring.
+        # Keep the direction whose chain ends at the lower dart.
+        darts = all_darts[term[all_darts] <= term[self.quad_opposite[all_darts]]]
+        darts = darts[np.lexsort((-rank[darts], term[darts]))]
+        group, group_start, group_len = _runs(term[darts])
+        # A ring around a Moebius strip is a single chain that goes around twice, keep one lap of it.
+        lap = term[self.quad_opposite[darts]] == term[darts]
+        if lap.any():
+            pos = np.arange(len(darts)) - group_start[group]
+            darts = darts[~lap | (pos < group_len[group] // 2)]
+            group, group_start, group_len = _runs(term[darts])
+        pos = np.arange(len(darts)) - group_start[group]
+        closed = cyclic[darts[group_start]]
+
+        # Open rings also start with the edge the first dart came from.
+        is_open = (~closed).astype(np.int32)
+        ring_length = group_len + is_open
+        ring_start = _offsets(ring_length)
+        ring_edges = np.empty(int(ring_length.sum()), dtype=np.int32)
+        ring_edges[ring_start[group] + is_open[group] + pos] = self.loop_edge[darts]
+        ring_edges[ring_start[~closed]] = self.loop_edge[self.quad_opposite[darts[group_start[~closed]]]]
+        ring_faces = self.loop_face[np.where(closed[group], next_dart[darts], darts)]
+        return ring_edges, ring_start, ring_length, closed, ring_faces, group_start, group_len
+
+    # Gives the edges of the rings (numbered from first_id on) their ring ID and position, skipping the
+    # non-manifold ones.
+    def _label_ring_edges(self, ring_edges, ring_start, ring_length, first_id):
+        slot_ring = np.repeat(np.arange(len(ring_length), dtype=np.int32), ring_length)
+        labelled = self.edge_face_count[ring_edges] <= 2
+        self.ring_id[ring_edges[labelled]] = first_id + slot_ring[labelled]
+        self.ring_pos[ring_edges[labelled]] = (np.arange(len(ring_edges)) - ring_start[slot_ring])[labelled]
+
+    # Border edges that touch at a vertex belong to the same boundary.  Unless wire edges are ignored a vertex
+    # with a wire edge doesn't join anything, so each border edge gets a copy of that vertex of its own.
+    # boundary_id[e, ignore_wires] is the boundary of edge e, or -1, and the boundaries are stored back to back
+    # in boundary_edges[ignore_wires] like the loops.
+    # Within a boundary the edges come in chains: runs of border edges in walking order that stop at vertices
+    # where the border branches.  A boundary that doesn't branch is a single chain.  Chains are labelled like the
+    # loops, with boundary_chain[e, ignore_wires], boundary_pos[e, ignore_wires] and per chain start, length and
+    # closed flag, where the start indexes boundary_edges.
+    def _build_boundaries(self):
+        edges = np.flatnonzero(self.edge_is_boundary).astype(np.int32)
+        ends = self.edge_verts[edges].astype(np.int64)
+        has_wire = np.zeros(self.num_verts, dtype=bool)
+        has_wire[self.edge_verts[self.edge_is_wire].ravel()] = True
+        self.boundary_id = np.full((self.num_edges, 2), -1, dtype=np.int32)
+        self.boundary_chain = np.full((self.num_edges, 2), -1, dtype=np.int32)
+        self.boundary_pos = np.zeros((self.num_edges, 2), dtype=np.int32)
+        self.boundary_edges = []
+        self.boundary_start = []
+        self.boundary_length = []
+        self.boundary_chain_start = []
+        self.boundary_chain_length = []
+        self.boundary_chain_closed = []
+        for ignore_wires in (False, True):
+            nodes = ends.copy()
+            if not ignore_wires:
+                own = has_wire[ends]
+                nodes[own] = self.num_verts + np.arange(len(ends) * 2).reshape(-1, 2)[own]
+            num_nodes = self.num_verts + len(ends) * 2
+            label = _label_components(num_nodes, nodes)[nodes[:, 0]]
+            key, rank, closed = self._chain_boundary(nodes, num_nodes)
+            order = np.lexsort((-rank, key, label)).astype(np.int32)
+            run, start, length = _runs(label[order])
+            chain, chain_start, chain_length = _runs(key[order])
+            self.boundary_id[edges[order], int(ignore_wires)] = run
+            self.boundary_chain[edges[order], int(ignore_wires)] = chain
+            self.boundary_pos[edges[order], int(ignore_wires)] = np.arange(len(order)) - chain_start[chain]
+            self.boundary_edges.append(edges[order])
+            self.boundary_start.append(start)
+            self.boundary_length.append(length)
+            self.boundary_chain_start.append(chain_start)
+            self.boundary_chain_length.append(chain_length)
+            self.boundary_chain_closed.append(closed[order[chain_start]])
+
+    # Walks the border edges given by their two end nodes, through every node that has exactly two of them, the
+    # way _label_loops walks the loop successors.  Returns, for every edge, the key of its chain, its rank along
+    # the chain counted from the far end and whether the chain is closed.
+    def _chain_boundary(self, nodes, num_nodes):
+        # A dart 2 * i + k walks edge i away from its end k, which is also the slot of that end in nodes.ravel().
+        # The next dart leaves the node we arrive at along the other edge there.
+        slots = nodes.ravel()
+        by_node = np.argsort(slots, kind='stable')
+        degree = np.bincount(slots, minlength=num_nodes)
+        node = slots[by_node[:-1]]
+        joined = (node == slots[by_node[1:]]) & (degree[node] == 2)
+        first, second = by_node[:-1][joined], by_node[1:][joined]
+        partner = np.full(len(slots), -1, dtype=np.int64)
+        partner[first] = second
+        partner[second] = first
+        next_dart = partner[np.arange(len(slots)) ^ 1]
+        term, rank, cyclic = _rank_chains(next_dart)
+
+        # Both darts of an edge run along the same chain in opposite directions, pick one like _label_loops.
+        term = term.reshape(-1, 2)
+        rank = rank.reshape(-1, 2)
+        side = (term[:, 1] < term[:, 0]).astype(np.int32)
+        rows = np.arange(len(nodes))
+        return term[rows, side], rank[rows, side], cyclic.reshape(-1, 2)[:, 0]
+
+    def boundary(self, boundary_id, ignore_wires):
+        start = self.boundary_start[ignore_wires][boundary_id]
+        return self.boundary_edges[ignore_wires][start:start + self.boundary_length[ignore_wires][boundary_id]]
+
+    def boundary_chain_edges(self, chain_id, ignore_wires):
+        start = self.boundary_chain_start[ignore_wires][chain_id]
+        return self.boundary_edges[ignore_wires][start:start + self.boundary_chain_length[ignore_wires][chain_id]]
+
+    # Face adjacency stored CSR style like the disk and radial cycles.  Every loop links its face to the faces
+    # of all the other loops around its edge, so faces that share two edges are listed twice.
+    def _build_face_links(self):
+        edge = self.loop_edge
+        partners = _ranges(self.edge_loop_start[edge], self.edge_face_count[edge])
+        owner = np.repeat(np.arange(self.num_loops, dtype=np.int32), self.edge_face_count[edge])
+        partners = self.edge_loops[partners]
+        keep = partners != owner
+        self.face_link_count = np.bincount(self.loop_face[owner[keep]], minlength=self.num_faces).astype(np.int32)
+        self.face_link_start = _offsets(self.face_link_count)
+        self.face_links = self.loop_face[partners[keep]]
+
+    # Labels every vertex with the lowest vertex index of its connected piece of the mesh, the same shells that
+    # select_linked walks from a vertex when no delimit is set.
+    def _build_components(self):
+        self.vert_component = _label_components(self.num_verts, self.edge_verts)
+
+    # The edge that shares the face corner at vert with the edge of the given loop.
+    def _corner_neighbour(self, loop, vert):
+        return np.where(self.loop_vert[loop] == vert,
+                        self.loop_edge[self.loop_prev[loop]], self.loop_edge[self.loop_next[loop]])
+
+    def loop(self, loop_id):
+        start = self.loop_start[loop_id]
+        return self.loop_edges[start:start + self.loop_length[loop_id]]
+
+    def ring(self, ring_id):
+        start = self.ring_start[ring_id]
+        return self.ring_edges[start:start + self.ring_length[ring_id]]
+
+    def ring_face_loop(self, ring_id):
+        start = self.ring_face_start[ring_id]
+        return self.ring_faces[start:start + self.ring_face_count[ring_id]]
+
+    def vert_link_edges(self, vert):
+        start = self.vert_edge_start[vert]
+        return self.vert_edges[start:start + self.vert_valence[vert]].tolist()
+
+    def edge_link_loops(self, edge):
+        start = self.edge_loop_start[edge]
+        return self.edge_loops[start:start + self.edge_face_count[edge]].tolist()
+
+    def edge_link_faces(self, edge):
+        return [int(self.loop_face[l]) for l in self.edge_link_loops(edge)]
+
+    def face_edges(self, face):
+        start = self.face_loop_start[face]
+        return self.loop_edge[start:start + self.face_valence[face]].tolist()
+
+    def other_vert(self, edge, vert):
+        v1, v2 = self.edge_verts[edge].tolist()
+        return v2 if v1 == vert else v1
+
+    def edge_between(self, vert_a, vert_b):
+        for e in self.vert_link_edges(vert_a):
+            if vert_b in self.edge_verts[e]:
+                return e
+        return -1
+
+
+# Turn a count per element into the start offset of each element's run in a CSR array.
+def _offsets(counts):
+    offsets = np.zeros(len(counts), dtype=np.int32)
+    np.cumsum(counts[:-1], out=offsets[1:])
+    return offsets
+
+
+# Sums the CSR runs [start, start + count) of a uint64 array, with wraparound.
+def _sum_runs(values, starts, counts):
+    sums = np.zeros(len(starts), dtype=np.uint64)
+    filled = counts > 0
+    if filled.any():
+        sums[filled] = np.add.reduceat(values, starts[filled])
+    return sums
+
+
+# Scrambles uint64 values (the splitmix64 finalizer), so that sums of them make decent hashes.
+def _mix(x):
+    x = x.astype(np.uint64)
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return x
+
+
+# Renumbers a successor array over a sorted subset of elements to positions within that subset, for
+# _rank_chains.  The order stays the same, so the chains get cut and compared exactly like over all elements.
+def _renumber(next_elem, elems):
+    if not len(elems) or elems[-1] == len(elems) - 1:
+        return next_elem
+    return np.where(next_elem >= 0, np.searchsorted(elems, next_elem), -1)
+
+
+# Splits a sorted key array into runs of equal keys.  Returns the run of every element and the start and
+# length of every run.
+def _runs(sorted_keys):
+    new_run = np.ones(len(sorted_keys), dtype=bool)
+    new_run[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    run = np.cumsum(new_run, dtype=np.int32) - 1
+    run_start = np.flatnonzero(new_run).astype(np.int32)
+    run_length = np.diff(np.append(run_start, len(sorted_keys))).astype(np.int32)
+    return run, run_start, run_length
+
+# Index array covering the runs [start, start + count) one after another.
+def _ranges(starts, counts):
+    total = int(counts.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    shift = np.repeat(starts.astype(np.int64) - _offsets(counts).astype(np.int64), counts)
+    return shift + np.arange(total, dtype=np.int64)
+
+
+# Ranks the chains of a successor array where every element has at most one successor and one predecessor
+# (-1 means no successor), which splits the elements into open chains and closed cycles.  Cycles are broken
+# just before their lowest element.  Returns, for every element, the last element of its chain, the number
+# of steps to get there and whether the chain was a cycle.
+# Chasing pointers one element at a time is far too slow in Python, so this is ruling set list ranking: walk
+# all chains in parallel from a sparse set of splitter elements, stitch the segments between splitters back
+# together into chains to find the cycles, then rank the much smaller chains of splitters by pointer jumping.
+def _rank_chains(next_elem):
+    n = len(next_elem)
+    next_elem = next_elem.astype(np.int64)
+    has_next = next_elem >= 0
+    prev_elem = np.full(n, -1, dtype=np.int64)
+    prev_elem[next_elem[has_next]] = np.flatnonzero(has_next)
+
+    # First find the cycles and their lowest elements.
+    seg, offset, seg_next, seg_len, seg_min, seg_last = _walk_segments(next_elem, _splitters(prev_elem < 0))
+    lowest, reaches_end = _stitch_segments(seg_next, seg_min)
+    cyclic = ~reaches_end[seg]
+    cuts = np.unique(lowest[seg[cyclic]])
+    next_elem[prev_elem[cuts]] = -1
+    prev_elem[cuts] = -1
+
+    # Then every chain is open, rank it.
+    seg, offset, seg_next, seg_len, seg_min, seg_last = _walk_segments(next_elem, _splitters(prev_elem < 0))
+    ptr = seg_next.copy()
+    after = np.where(ptr >= 0, seg_len[ptr], 0)
+    last_seg = np.where(ptr >= 0, ptr, np.arange(len(ptr)))
+    active = np.flatnonzero(ptr >= 0)
+    while active.size:
+        target = ptr[active]
+        after[active] += after[target]
+        last_seg[active] = last_seg[target]
+        ptr[active] = ptr[target]
+        active = active[ptr[active] >= 0]
+    rank = seg_len[seg] - 1 - offset + after[seg]
+    term = seg_last[last_seg[seg]]
+    return term, rank, cyclic
+
+
+# Union-find over the vertex pairs in bulk.  Each pass hooks the root of every pair to the lower of the two
+# roots and then flattens the trees, so the root of each component ends up being its lowest element.
+def _label_components(n, pairs):
+    parent = np.arange(n, dtype=np.int32)
+    a = pairs[:, 0]
+    b = pairs[:, 1]
+    while a.size:
+        root_a = parent[a]
+        root_b = parent[b]
+        apart = root_a != root_b
+        if not apart.any():
+            break
+        a, b, root_a, root_b = a[apart], b[apart], root_a[apart], root_b[apart]
+        np.minimum.at(parent, np.maximum(root_a, root_b), np.minimum(root_a, root_b))
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+    return parent
+
+
+# The share of the edges or vertices that may change before a repair stops paying off against a full build.
+_REPAIR_LIMIT = 0.2
+
+
+# Chains over fewer elements than this (edge ends for loops, quad corners for rings) are walked in this
+# process.  For those, handing the arrays to other processes costs more than it saves.
+_PARALLEL_MIN_ELEMENTS = 4000000
+
+
+# Every chain head, plus a pseudo-random one in _SPLITTER_STRIDE of the other elements.
+_SPLITTER_STRIDE = 16
+
+
+def _splitters(heads):
+    sample = ((np.arange(len(heads), dtype=np.int64) * 2654435761) >> 11) % _SPLITTER_STRIDE == 0
+    return heads | sample
+
+
+# Cuts the chains into segments that start at a splitter and walks them all at once.  Returns the segment and
+# offset of every element, and for every segment the following segment, its length, lowest and last element.
+# Cycles without a single splitter are left over after the walk, each of their elements becomes a segment.
+# Long arrays are walked in several processes when the worker processes are on.
+def _walk_segments(next_elem, splitter):
+    n = len(next_elem)
+    seeds = np.flatnonzero(splitter)
+    pool = _process_pool() if n >= _PARALLEL_MIN_ELEMENTS else None
+    if pool is not None:
+        seg, offset, seg_next, seg_len, seg_min, seg_last = _walk_in_processes(pool, next_elem, splitter, seeds)
+    else:
+        seg, offset, seg_next, seg_len, seg_min, seg_last = _start_segments(n, seeds)
+        _walk_seeds(next_elem, splitter, seeds, seg, offset, seg_next, seg_len, seg_min, seg_last, 0, len(seeds))
+
+    left = np.flatnonzero(seg < 0)
+    if left.size:
+        seg[left] = np.arange(len(seeds), len(seeds) + len(left))
+        seg_next = np.concatenate((seg_next, seg[next_elem[left]]))
+        seg_len = np.concatenate((seg_len, np.ones(len(left), dtype=np.int64)))
+        seg_min = np.concatenate((seg_min, left))
+        seg_last = np.concatenate((seg_last, left))
+    return seg, offset, seg_next, seg_len, seg_min, seg_last
+
+
+# The arrays _walk_seeds fills in, set up for segments that are only their seed so far.
+def _start_segments(n, seeds):
+    seg = np.full(n, -1, dtype=np.int64)
+    seg[seeds] = np.arange(len(seeds))
+    offset = np.zeros(n, dtype=np.int64)
+    seg_next = np.full(len(seeds), -1, dtype=np.int64)
+    seg_len = np.ones(len(seeds), dtype=np.int64)
+    return seg, offset, seg_next, seg_len, seeds.copy(), seeds.copy()
+
+
+# Walks the segments of seeds[first:last] in step.  Segments never share elements, so walks of different
+# seed ranges write to different places and can run at the same time.
+def _walk_seeds(next_elem, splitter, seeds, seg, offset, seg_next, seg_len, seg_min, seg_last, first, last):
+    walker = np.arange(first, last)
+    cur = seeds[first:last]
+    step = 0
+    while walker.size:
+        step += 1
+        cur = next_elem[cur]
+        alive = cur >= 0
+        walker, cur = walker[alive], cur[alive]
+        stop = splitter[cur]
+        seg_next[walker[stop]] = seg[cur[stop]]
+        walker, cur = walker[~stop], cur[~stop]
+        seg[cur] = walker
+        offset[cur] = step
+        seg_len[walker] += 1
+        seg_last[walker] = cur
+        seg_min[walker] = np.minimum(seg_min[walker], cur)
+
+
+# _walk_segments over several processes.  The arrays go into shared memory and every worker walks a range of
+# the seeds, so the result is exactly that of walking them all here.
+def _walk_in_processes(pool, next_elem, splitter, seeds):
+    arrays = (next_elem, splitter, seeds) + _start_segments(len(next_elem), seeds)
+    blocks = []
+    try:
+        for array in arrays:
+            block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+            blocks.append(block)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+        specs = [(block.name, array.dtype.str, array.shape) for block, array in zip(blocks, arrays)]
+        bounds = np.linspace(0, len(seeds), _process_count() * 4 + 1).astype(np.int64)
+        futures = [pool.submit(_walk_worker, specs, int(first), int(last))
+                   for first, last in zip(bounds[:-1], bounds[1:]) if last > first]
+        for future in futures:
+            future.result()
+        return tuple(np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf).copy()
+                     for block, array in zip(blocks[3:], arrays[3:]))
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+# Runs in a worker process: attaches to the shared arrays and walks seeds[first:last].
+def _walk_worker(specs, first, last):
+    blocks = [shared_memory.SharedMemory(name=name) for name, dtype, shape in specs]
+    try:
+        arrays = [np.ndarray(shape, dtype=dtype, buffer=block.buf)
+                  for block, (name, dtype, shape) in zip(blocks, specs)]
+        _walk_seeds(*arrays, first, last)
+        del arrays
+    finally:
+        for block in blocks:
+            block.close()
+
+
+# The lowest element along every chain of segments and whether the chain reaches an end.  Union-find merges
+# each segment with the one after it, which stitches the chains back together across the splitters and
+# across the seed ranges of the worker processes, then each piece is reduced.
+def _stitch_segments(seg_next, seg_min):
+    linked = np.flatnonzero(seg_next >= 0)
+    piece = _label_components(len(seg_next), np.stack((linked, seg_next[linked]), axis=1))
+    lowest = seg_min.copy()
+    np.minimum.at(lowest, piece, seg_min)
+    reaches_end = np.zeros(len(seg_next), dtype=bool)
+    reaches_end[piece[seg_next < 0]] = True
+    return lowest[piece], reaches_end[piece]
+
+
+# One index per mesh, kept for as long as the edit-mode BMesh that it was built from is alive (drop_dead_indices).
+_topology_indices = {}
+# Bumped every time a mesh's index is rebuilt, so that results cached for the old topology are never reused.
+_topology_versions = {}
+# Meshes that had a geometry update from somewhere else since their index was built.
+_changed_meshes = set()
+# Meshes that this addon just pushed a selection-only update for, the depsgraph reports those as geometry too.
+_own_updates = set()
+
+
+# Returns the TopologyIndex for an object in edit mode, building it only when the BMesh is new
+# (entering edit mode, undo), its element counts changed, or a geometry update since the last build
+# turns out to have changed the topology.  Edits within the same edit session repair the last index.
+def get_topology_index(obj, bm):
+    topo, arrays, previous = _cached_topology_index(obj, bm)
+    if topo is None:
+        update_process_pool(bpy.context.preferences.addons[__name__].preferences.worker_processes)
+        topo = _store_topology_index(obj, bm, build_topology_index(arrays, previous, disk_cache_settings()))
+    return topo
+
+
+# Repairs the index from before an edit if there is one and not too much changed.  Otherwise loads it from
+# the disk cache when that is on (disk is a (folder, size limit) pair), or builds it and saves it there.
+def build_topology_index(arrays, previous=None, disk=None):
+    topo = None
+    if previous is not None:
+        topo = TopologyIndex.repaired(previous, arrays)
+    elif disk is not None:
+        topo = load_cached_index(disk[0], arrays)
+    if topo is None:
+        topo = TopologyIndex(*arrays)
+        if previous is None and disk is not None:
+            save_index_later(topo, disk)
+    return topo
+
+
+# Same as get_topology_index for several objects in multi-object edit mode, returned in the same order.
+# Reading the mesh data has to happen on the main thread, but the builds are mostly NumPy work that
+# releases the GIL, so they run side by side in a thread pool.
+def get_topology_indices(objects):
+    indices = []
+    builds = []
+    for obj in objects:
+        bm = bmesh.from_edit_mesh(obj.data)
+        topo, arrays, previous = _cached_topology_index(obj, bm)
+        indices.append(topo)
+        if topo is None:
+            builds.append((len(indices) - 1, obj, bm, arrays, previous))
+    disk = disk_cache_settings()
+    if builds:
+        update_process_pool(bpy.context.preferences.addons[__name__].preferences.worker_processes)
+    if len(builds) == 1:
+        i, obj, bm, arrays, previous = builds[0]
+        indices[i] = _store_topology_index(obj, bm, build_topology_index(arrays, previous, disk))
+    elif builds:
+        futures = [_thread_pool().submit(build_topology_index, arrays, previous, disk)
+                   for i, obj, bm, arrays, previous in builds]
+        for (i, obj, bm, arrays, previous), future in zip(builds, futures):
+            indices[i] = _store_topology_index(obj, bm, future.result())
+    return indices
+
+
+# Runs func(*args) for every set of arguments in the thread pool and returns the results in order.
+def run_in_threads(func, *arg_lists):
+    if len(arg_lists[0]) < 2:
+        return [func(*args) for args in zip(*arg_lists)]
+    return list(_thread_pool().map(func, *arg_lists))
+
+
+_pool = None
+# The pools are made on first use, which can be from a thread of the thread pool (saving to the disk cache).
+_pool_lock = threading.Lock()
+
+
+def _thread_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
+        return _pool
+
+
+_processes = None
+
+
+# Worker processes for walking long chains, or None.  They are only used from the main thread, so that the
+# workers, which the pool starts on demand, are forked from it and not from a thread of the thread pool.
+def _process_pool():
+    if threading.current_thread() is not threading.main_thread():
+        return None
+    return _processes
+
+
+# Starts or stops the worker processes to match the worker_processes preference.  Workers are forked: a spawned
+# or forkserver one would have to import this addon, which needs bpy, and forking is only safe enough on Linux.
+def update_process_pool(enabled):
+    global _processes
+    with _pool_lock:
+        if enabled and _processes is None:
+            if (shared_memory is None or _process_count() < 2 or not sys.platform.startswith("linux")
+                    or "fork" not in multiprocessing.get_all_start_methods()):
+                return
+            _processes = ProcessPoolExecutor(max_workers=_process_count(),
+                                             mp_context=multiprocessing.get_context("fork"))
+        elif not enabled and _processes is not None:
+            _processes.shutdown(wait=False)
+            _processes = None
+
+
+def _process_count():
+    return min(8, os.cpu_count() or 1)
+
+
+# Returns (index, None, None) if the cached index is still good, or (None, mesh arrays, previous index) to build
+# a new one from.  The previous index is only passed on while the BMesh is the same one it was built from.
+def _cached_topology_index(obj, bm):
+    drop_dead_indices()
+    me = obj.data
+    key = me.as_pointer()
+    counts = (len(bm.verts), len(bm.edges), len(bm.faces))
+    cached = _topology_indices.get(key)
+    arrays = None
+    previous = None
+    if cached is not None:
+        cached_bm, cached_counts, topo = cached
+        if cached_bm is bm and bm.is_valid:
+            previous = topo
+        if previous is not None and cached_counts == counts:
+            if key not in _changed_meshes:
+                return topo, None, None
+            # Moving vertices around is a geometry update too, only rebuild if the connectivity changed.
+            _changed_meshes.discard(key)
+            obj.update_from_editmode()
+            arrays = TopologyIndex.mesh_arrays(me)
+            if topo.same_topology(arrays):
+                return topo, None, None
+
+    # Mesh data is stored in BMesh iteration order, so make the BMesh indices match it.
+    bm.verts.index_update()
+    bm.edges.index_update()
+    bm.faces.index_update()
+    bm.verts.ensure_lookup_table()
+    bm.edges.ensure_lookup_table()
+    bm.faces.ensure_lookup_table()
+    if arrays is None:
+        obj.update_from_editmode()
+        arrays = TopologyIndex.mesh_arrays(me)
+    return None, arrays, previous
+
+
+def _store_topology_index(obj, bm, topo):
+    key = obj.data.as_pointer()
+    counts = (len(bm.verts), len(bm.edges), len(bm.faces))
+    _changed_meshes.discard(key)
+    _topology_versions[key] = _topology_versions.get(key, 0) + 1
+    topo.cache_key = (key, counts, _topology_versions[key])
+    drop_cached_results(key)
+    _topology_indices[key] = (bm, counts, topo)
+    return topo
+
+
+# Marks meshes whose geometry changed.  Selection-only updates don't set is_updated_geometry, and the
+# updates this addon causes itself are skipped.
+@bpy.app.handlers.persistent
+def topology_update_handler(scene, depsgraph=None):
+    drop_dead_indices()
+    if depsgraph is None:
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+    for update in depsgraph.updates:
+        if not update.is_updated_geometry:
+            continue
+        data = update.id.original
+        if isinstance(data, bpy.types.Object):
+            if data.type != 'MESH':
+                continue
+            data = data.data
+        if not isinstance(data, bpy.types.Mesh):
+            continue
+        key = data.as_pointer()
+        # One pass reports an update_edit_mesh for both the object and its mesh, so skip them all.
+        if key in _own_updates:
+            continue
+        if key in _topology_indices:
+            _changed_meshes.add(key)
+        if key in _uv_indices:
+            _changed_uvs.add(key)
+    # Our own updates are evaluated in the next pass.  Forget them after it, even the ones it didn't report,
+    # so that a later edit is never mistaken for one of ours.
+    _own_updates.clear()
+
+
+# Forgets the meshes whose edit BMesh is gone, because they left edit mode or undo replaced it.  Blender
+# invalidates the BMesh wrapper when it frees the edit mesh.  Their UV indices and cached results go too.
+def drop_dead_indices():
+    for key in [key for key, (bm, counts, topo) in _topology_indices.items() if not bm.is_valid]:
+        del _topology_indices[key]
+        _changed_meshes.discard(key)
+        _uv_indices.pop(key, None)
+        _changed_uvs.discard(key)
+        drop_cached_results(key)
+
+
+# Mesh pointers get reused once a file is closed, so forget everything when another one is loaded.
+@bpy.app.handlers.persistent
+def clear_caches_handler(*args):
+    _topology_indices.clear()
+    _changed_meshes.clear()
+    _uv_indices.clear()
+    _changed_uvs.clear()
+    _own_updates.clear()
+    _result_cache.clear()
+    global _result_cache_bytes
+    _result_cache_bytes = 0
+
+
+# Pushes the edit-mode changes to the viewport without making the update handler think the topology changed.
+def update_edit_mesh(me):
+    _own_updates.add(me.as_pointer())
+    bmesh.update_edit_mesh(me)
+
+
+# ##################### UV index ##################### #
+
+# UVs on the same point of a grid this fine count as the same, the limit Blender's own UV select linked uses.
+_UV_LIMIT = 0.0001
+
+
+# The UV layout of a mesh on top of its TopologyIndex.  Loops (face corners) of the same vertex with the same
+# UV make up one UV vertex, and faces that share UV vertices make up an island.  A loop's edge is on a UV
+# boundary unless another loop of the same mesh edge runs between the same two UV vertices.
+class UVIndex:
+    def __init__(self, topo, uv):
+        self.uv = uv
+        loop_vert = topo.loop_vert
+        num_loops = len(loop_vert)
+
+        # UV vertices: the loops of a vertex whose UVs round to the same point of a _UV_LIMIT grid.  Exact keys
+        # keep the grouping transitive, which comparing neighbours within the limit is not.
+        keys = np.column_stack((loop_vert, np.round(uv / _UV_LIMIT))).astype(np.int64)
+        uv_verts, inverse = np.unique(keys, axis=0, return_inverse=True)
+        self.loop_uv_vert = inverse.reshape(-1).astype(np.int32)
+        self.num_uv_verts = len(uv_verts)
+        # The UV vertex at the other end of each loop's edge.
+        self.loop_uv_next = self.loop_uv_vert[topo.loop_next]
+
+        # UV edges: loops of the same mesh edge between the same two UV vertices.  A loop alone is a boundary.
+        low = np.minimum(self.loop_uv_vert, self.loop_uv_next)
+        high = np.maximum(self.loop_uv_vert, self.loop_uv_next)
+        order = np.lexsort((high, low, topo.loop_edge))
+        new_run = np.ones(num_loops, dtype=bool)
+        new_run[1:] = ((topo.loop_edge[order[1:]] != topo.loop_edge[order[:-1]])
+                       | (low[order[1:]] != low[order[:-1]]) | (high[order[1:]] != high[order[:-1]]))
+        alone = new_run.copy()
+        alone[:-1] &= new_run[1:]
+        boundary = np.sort(order[alone])
+
+        # Islands: faces linked through their UV vertices.
+        pairs = np.stack((self.loop_uv_vert, self.loop_uv_next), axis=1)
+        label = _label_components(self.num_uv_verts, pairs)[self.loop_uv_vert[topo.face_loop_start]]
+        self.island_faces = np.argsort(label, kind='stable').astype(np.int32)
+        run, self.island_start, self.island_length = _runs(label[self.island_faces])
+        self.face_island = np.empty(topo.num_faces, dtype=np.int32)
+        self.face_island[self.island_faces] = run
+
+        # Boundaries: the boundary loops linked through their UV vertices, grouped by boundary.
+        label = _label_components(self.num_uv_verts, pairs[boundary])[self.loop_uv_vert[boundary]]
+        order = np.argsort(label, kind='stable')
+        self.boundary_loops = boundary[order].astype(np.int32)
+        run, self.boundary_start, self.boundary_length = _runs(label[order])
+        self.loop_boundary = np.full(num_loops, -1, dtype=np.int32)
+        self.loop_boundary[self.boundary_loops] = run
+
+    def island(self, island_id):
+        start = self.island_start[island_id]
+        return self.island_faces[start:start + self.island_length[island_id]]
+
+    def boundary(self, boundary_id):
+        start = self.boundary_start[boundary_id]
+        return self.boundary_loops[start:start + self.boundary_length[boundary_id]]
+
+    # The UV vertex of a loop at one end of its edge.
+    def uv_vert_at(self, topo, loop, vert):
+        return self.loop_uv_vert[loop] if topo.loop_vert[loop] == vert else self.loop_uv_next[loop]
+
+
+# One UV index per mesh, for as long as its topology index and active UV layer stay the same.  Dropped along with
+# the topology index.
+_uv_indices = {}
+# Meshes with a geometry update since their UV index was built, which moving UVs around counts as.
+_changed_uvs = set()
+
+
+# Returns the UVIndex for the active UV layer of an object in edit mode, rebuilding it when the topology index
+# was rebuilt, another layer became active or the UVs changed.
+def get_uv_index(obj, topo):
+    me = obj.data
+    key = me.as_pointer()
+    layer = me.uv_layers.active.name
+    cached = _uv_indices.get(key)
+    uv = None
+    if cached is not None and cached[0] == topo.cache_key and cached[1] == layer:
+        if key not in _changed_uvs:
+            return cached[2]
+        _changed_uvs.discard(key)
+        uv = read_uvs(obj)
+        if np.array_equal(uv, cached[2].uv):
+            return cached[2]
+    if uv is None:
+        uv = read_uvs(obj)
+    _changed_uvs.discard(key)
+    uvi = UVIndex(topo, uv)
+    _uv_indices[key] = (topo.cache_key, layer, uvi)
+    return uvi
+
+
+# The active layer's UV of every loop, read in bulk like selected_edges.
+def read_uvs(obj):
+    obj.update_from_editmode()
+    me = obj.data
+    uv = np.empty(len(me.loops) * 2, dtype=np.float32)
+    me.uv_layers.active.data.foreach_get("uv", uv)
+    return uv.reshape(-1, 2)
+
+
+# Faces the UV editor shows: those that aren't hidden and, without sync selection, are selected.
+def uv_editor_faces(obj, sync):
+    obj.update_from_editmode()
+    me = obj.data
+    shown = np.empty(len(me.polygons), dtype=bool)
+    me.polygons.foreach_get("hide", shown)
+    shown = ~shown
+    if not sync:
+        selected = np.empty(len(me.polygons), dtype=bool)
+        me.polygons.foreach_get("select", selected)
+        shown &= selected
+    return np.flatnonzero(shown)
+
+
+# The loops of the given faces with the UVs at both ends of their edges.
+def _uv_segments(topo, uvi, faces):
+    loops = _ranges(topo.face_loop_start[faces], topo.face_valence[faces])
+    return loops, uvi.uv[loops], uvi.uv[topo.loop_next[loops]]
+
+
+# The loop of the given faces whose UV edge is closest to point.
+def pick_uv_edge(topo, uvi, point, faces):
+    loops, a, b = _uv_segments(topo, uvi, faces)
+    point = np.asarray(point, dtype=np.float32)
+    d = b - a
+    t = np.clip(((point - a) * d).sum(axis=1) / np.maximum((d * d).sum(axis=1), 1e-12), 0.0, 1.0)
+    dist = ((a + t[:, None] * d - point) ** 2).sum(axis=1)
+    return int(loops[np.argmin(dist)])
+
+
+# The loop of the given faces whose UV is closest to point.
+def pick_uv_corner(topo, uvi, point, faces):
+    loops, a, b = _uv_segments(topo, uvi, faces)
+    return int(loops[np.argmin(((a - np.asarray(point, dtype=np.float32)) ** 2).sum(axis=1))])
+
+
+# The face among the given ones that point is inside of in UV space, or the one with the closest UV edge.
+def pick_uv_face(topo, uvi, point, faces):
+    loops, a, b = _uv_segments(topo, uvi, faces)
+    x, y = point
+    crosses = (a[:, 1] > y) != (b[:, 1] > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        at_x = a[:, 0] + (b[:, 0] - a[:, 0]) * (y - a[:, 1]) / (b[:, 1] - a[:, 1])
+    crosses &= x < at_x
+    inside = np.add.reduceat(crosses.astype(np.int32), _offsets(topo.face_valence[faces])) % 2 == 1
+    if inside.any():
+        return int(faces[np.argmax(inside)])
+    return int(topo.loop_face[pick_uv_edge(topo, uvi, point, faces)])
+
+
+# The loops along the edge loop through a loop's edge, followed both ways for as long as the next edge has a
+# loop that shares the UV vertex where they meet, so the loop stops at UV seams.
+def uv_edge_loop(topo, uvi, loop):
+    edge = int(topo.loop_edge[loop])
+    loop_id = topo.loop_id[edge]
+    edges = topo.loop(loop_id).tolist()
+    closed = bool(topo.loop_closed[loop_id])
+    pos = int(topo.loop_pos[edge])
+    result = [loop]
+    seen = {edge}
+    for step in (1, -1):
+        current = loop
+        i = pos
+        while True:
+            i += step
+            if closed:
+                i %= len(edges)
+            elif not 0 <= i < len(edges):
+                break
+            next_edge = edges[i]
+            if next_edge in seen:
+                break
+            ends = topo.edge_verts[topo.loop_edge[current]]
+            vert = ends[0] if ends[0] in topo.edge_verts[next_edge] else ends[1]
+            uv_vert = uvi.uv_vert_at(topo, current, vert)
+            start = topo.edge_loop_start[next_edge]
+            current = -1
+            for candidate in topo.edge_loops[start:start + topo.edge_face_count[next_edge]].tolist():
+                if uvi.uv_vert_at(topo, candidate, vert) == uv_vert:
+                    current = candidate
+                    break
+            if current < 0:
+                break
+            result.append(current)
+            seen.add(next_edge)
+    return np.array(result, dtype=np.int64)
+
+
+# Selects the UVs of the given faces, edges included, on the BMesh.
+def select_uv_faces(bm, uv_layer, faces):
+    for i in faces.tolist():
+        for loop in bm.faces[i].loops:
+            luv = loop[uv_layer]
+            luv.select = True
+            luv.select_edge = True
+
+
+# Selects the UV edges of the given loops and the UVs at both of their ends on the BMesh.
+def select_uv_edges(bm, topo, uv_layer, loops):
+    for i in loops.tolist():
+        face = int(topo.loop_face[i])
+        loop = bm.faces[face].loops[i - int(topo.face_loop_start[face])]
+        luv = loop[uv_layer]
+        luv.select = True
+        luv.select_edge = True
+        loop.link_loop_next[uv_layer].select = True
+
+
+# ##################### Disk cache ##################### #
+
+# Indices of meshes from earlier sessions, one file per mesh topology named after a hash of its connectivity.
+# A file is a magic number, the length of a JSON header listing the arrays, the header and then the arrays
+# themselves, which are memory-mapped when loaded so only the pages a selection touches are ever read.
+# The cache is off unless turned on in the preferences.
+_DISK_MAGIC = b"CSTOPO02"
+_DISK_ALIGN = 64
+# Only the arrays that are slow to build are stored: the loop and ring labels, the loop successors and manifold
+# flags that a repair starts from, and the connected pieces.  The rest is quicker to rebuild than to read.
+_STORED_ARRAYS = ("vert_is_manifold", "loop_successor",
+                  "loop_edges", "loop_id", "loop_pos", "loop_start", "loop_length", "loop_closed",
+                  "ring_edges", "ring_id", "ring_pos", "ring_start", "ring_length", "ring_closed",
+                  "ring_faces", "ring_face_start", "ring_face_count", "vert_component")
+
+
+# (folder, size limit in bytes) for the disk cache, or None when it is off.
+def disk_cache_settings():
+    prefs = bpy.context.preferences.addons[__name__].preferences
+    if not prefs.disk_cache or prefs.disk_cache_size <= 0:
+        return None
+    folder = bpy.path.abspath(prefs.disk_cache_folder)
+    if not prefs.disk_cache_folder:
+        folder = os.path.join(bpy.utils.user_resource('DATAFILES'), "context_select_cache")
+    return folder, prefs.disk_cache_size * 1024 * 1024
+
+
+# Hash of the vertex count and the connectivity arrays, the part of a mesh that the index depends on.
+def connectivity_hash(arrays):
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(np.int64(arrays[0]).tobytes())
+    for array in arrays[1:]:
+        array = np.ascontiguousarray(array, dtype=np.int32)
+        digest.update(np.int64(array.size).tobytes())
+        digest.update(array.data)
+    return digest.hexdigest()
+
+
+def _aligned(offset):
+    return -(-offset // _DISK_ALIGN) * _DISK_ALIGN
+
+
+# Returns the index for the mesh arrays from the disk cache, or None.  Files that don't match the mesh they
+# are named after (cut short, from an older version) are deleted.
+def load_cached_index(folder, arrays):
+    digest = connectivity_hash(arrays)
+    path = os.path.join(folder, digest + ".topo")
+    try:
+        with open(path, "rb") as f:
+            magic = f.read(len(_DISK_MAGIC))
+            header_size = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(header_size).decode())
+        data_start = _aligned(len(_DISK_MAGIC) + 8 + header_size)
+        counts = [int(arrays[0])] + [len(a) for a in arrays[1:]]
+        if (magic != _DISK_MAGIC or header["hash"] != digest or header["counts"] != counts
+                or os.path.getsize(path) < data_start + header["size"]):
+            raise ValueError("stale cache entry")
+        data = np.memmap(path, dtype=np.uint8, mode='r', offset=data_start) if header["size"] else None
+        stored = {}
+        for name, dtype, shape, offset in header["arrays"]:
+            dtype = np.dtype(dtype)
+            size = int(np.prod(shape)) * dtype.itemsize
+            if size:
+                stored[name] = data[offset:offset + size].view(dtype).reshape(shape)
+            else:
+                stored[name] = np.zeros(shape, dtype=dtype)
+        # The modification time is when an entry was last used, for the eviction.
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    return TopologyIndex.from_stored(arrays, stored)
+
+
+# Writes the index to the disk cache in the background.
+def save_index_later(topo, disk):
+    topo.saved_to_disk = True
+    _thread_pool().submit(save_cached_index, topo, *disk)
+
+
+# Writes the index to the disk cache, then deletes the least recently used entries until the cache fits in
+# size_limit bytes again.  A cache that can't be written to is only reported.
+def save_cached_index(topo, folder, size_limit):
+    if topo.vert_component is None:
+        topo._build_components()
+    arrays = topo.source_arrays()
+    digest = connectivity_hash(arrays)
+    entries = []
+    offset = 0
+    for name, array in topo.stored_arrays().items():
+        array = np.ascontiguousarray(array)
+        entries.append((name, array))
+        offset = _aligned(offset + array.nbytes)
+    header = {"hash": digest, "counts": [int(arrays[0])] + [len(a) for a in arrays[1:]], "size": offset,
+              "arrays": []}
+    offset = 0
+    for name, array in entries:
+        header["arrays"].append([name, array.dtype.str, list(array.shape), offset])
+        offset = _aligned(offset + array.nbytes)
+    header_bytes = json.dumps(header).encode()
+
+    path = os.path.join(folder, digest + ".topo")
+    temp_path = "%s.%d.tmp" % (path, os.getpid())
+    try:
+        os.makedirs(folder, exist_ok=True)
+        with open(temp_path, "wb") as f:
+            f.write(_DISK_MAGIC)
+            f.write(len(header_bytes).to_bytes(8, "little"))
+            f.write(header_bytes)
+            data_start = _aligned(f.tell())
+            for (name, array), (_, _, _, offset) in zip(entries, header["arrays"]):
+                f.seek(data_start + offset)
+                f.write(array.data)
+            f.truncate(data_start + header["size"])
+        os.replace(temp_path, path)
+        _evict_cached_indices(folder, size_limit)
+    except OSError as error:
+        print("Context Select: could not write the index cache to %s: %s" % (folder, error))
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def _evict_cached_indices(folder, size_limit):
+    entries = []
+    for name in os.listdir(folder):
+        if name.endswith(".topo"):
+            stat = os.stat(os.path.join(folder, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= size_limit:
+            break
+        try:
+            os.remove(os.path.join(folder, name))
+            total -= size
+        except OSError:
+            # Still mapped by this or another Blender on Windows.
+            pass
+
+
+# Saving a file is a good moment to store the indices that changed since they were last saved, the next
+# session that opens it will need those.
+@bpy.app.handlers.persistent
+def save_indices_handler(*args):
+    disk = disk_cache_settings()
+    if disk is None:
+        return
+    for key, (bm, counts, topo) in _topology_indices.items():
+        if key not in _changed_meshes and not topo.saved_to_disk:
+            save_index_later(topo, disk)
+
+
+# ##################### Result cache ##################### #
+
+# Loops, rings, face loops and boundaries that were asked for before, least recently used first.  Results are
+# keyed by the index they came from (mesh, element counts and rebuild count), what was asked for, the element
+# and whichever preferences the answer depends on.
+_result_cache = OrderedDict()
+_result_cache_bytes = 0
+
+
+# Returns compute(topo, element), from the cache when possible.  The preferences that change the answer of
+# compute must be passed in as flags.
+def cached_result(topo, compute, element, *flags):
+    global _result_cache_bytes
+    key = (topo.cache_key, compute.__name__, int(element)) + flags
+    result = _result_cache.get(key)
+    if result is not None:
+        _result_cache.move_to_end(key)
+        return result
+
+    result = compute(topo, element)
+    if isinstance(result, set):
+        result = np.fromiter(result, dtype=np.int32, count=len(result))
+    # Copy, a view would keep the whole index alive after it's been replaced.
+    result = np.array(result, dtype=np.int32)
+    _result_cache[key] = result
+    _result_cache_bytes += result.nbytes
+
+    prefs = bpy.context.preferences.addons[__name__].preferences
+    limit = prefs.result_cache_size * 1024 * 1024
+    while _result_cache_bytes > limit and _result_cache:
+        _, old = _result_cache.popitem(last=False)
+        _result_cache_bytes -= old.nbytes
+    return result
+
+
+# Drops the cached results of a mesh, they belong to an index that is being replaced.
+def drop_cached_results(mesh_key):
+    global _result_cache_bytes
+    for key in [k for k in _result_cache if k[0][0] == mesh_key]:
+        _result_cache_bytes -= _result_cache.pop(key).nbytes
+
+
+# Takes a vertex index and return a set of indicies for adjacent vertices.
+def get_neighbour_verts(topo, vert):
+    edges = topo.vert_link_edges(vert)
+    relevant_neighbour_verts = {topo.other_vert(e, vert) for e in edges}
     return relevant_neighbour_verts
 
 
-# Takes a face and return a set of indicies for connected faces.
-def get_neighbour_faces(face):
-    face_edges = face.edges[:]
-    relevant_neighbour_faces = {f.index for e in face_edges for f in e.link_faces[:] if f != face}
+# Takes a face index and return a set of indicies for connected faces.
+def get_neighbour_faces(topo, face):
+    face_edges = topo.face_edges(face)
+    relevant_neighbour_faces = {f for e in face_edges for f in topo.edge_link_faces(e) if f != face}
     return relevant_neighbour_faces
 
 
-# Takes an edge and return a set of indicies for nearby edges.
+# Takes an edge index and return a set of indicies for nearby edges.
 # Will return some 'oddball' or extra edges if connected topology is triangles or poles.
 # This is no worse than the old bpy.ops.mesh.select_more(use_face_step=True) method (slightly better, even).
-def get_neighbour_edges(edge):
-    edge_loops = edge.link_loops[:]
-    edge_faces = edge.link_faces[:]  # Check here for more than 2 connected faces?
-    face_edges = {e for f in edge_faces for e in f.edges[:]}
-
-    if len(edge_loops) == 0:
-        ring_edges = []
-    # For the next 2 elif checks, link_loop hopping is only technically accurate for quads.
-    elif len(edge_loops) == 1:
-        ring_edges = [edge_loops[0].link_loop_radial_next.link_loop_next.link_loop_next.edge.index]
-    elif len(edge_loops) > 1:
-        ring_edges = [edge_loops[0].link_loop_radial_next.link_loop_next.link_loop_next.edge.index,
-                      edge_loops[1].link_loop_radial_next.link_loop_next.link_loop_next.edge.index]
+def get_neighbour_edges(topo, edge):
+    edge_loops = topo.edge_link_loops(edge)
+    face_edges = {e for l in edge_loops for e in topo.face_edges(topo.loop_face[l])}
+
+    # Hop to the radial loop and walk two loops forward to reach the opposite edge.
+    # This link_loop hopping is only technically accurate for quads.
+    ring_edges = [int(topo.loop_edge[topo.loop_next[topo.loop_next[topo.loop_radial[l]]]])
+                  for l in edge_loops[:2]]
     # loop_edges returns a lot of edges if 1 vert connected to a pole, such as the cap of a UV Sphere.
     # e not in face_edges coincidentally removes the starting edge which is what we wanted anyway.
-    loop_edges = [e.index for v in edge.verts for e in v.link_edges[:] if e not in face_edges]
+    loop_edges = [e for v in topo.edge_verts[edge].tolist() for e in topo.vert_link_edges(v) if e not in face_edges]
 
     relevant_neighbour_edges = set(ring_edges + loop_edges)
     return relevant_neighbour_edges
 
 
-def select_edge(active_edge):
-    bpy.ops.mesh.select_all(action='DESELECT')
-    active_edge.select = True
-
-
-def select_vert(active_vert):
-    bpy.ops.mesh.select_all(action='DESELECT')
-    active_vert.select = True
-
-
-def select_face(active_face):
-    bpy.ops.mesh.select_all(action='DESELECT')
-    active_face.select = True
-
-
-# Takes a boundary edge and returns a set of indices for other boundary edges
+# Takes a boundary edge index and returns an array of indices for other boundary edges
 # that are contiguous with it in the same boundary "loop".
-def get_boundary_edge_loop(edge):
+def get_boundary_edge_loop(topo, edge):
     prefs = bpy.context.preferences.addons[__name__].preferences
-    cur_edges = [edge]
-    final_selection = set()
-    visited_verts = set()
-    while True:
-        for e in cur_edges:
-            final_selection.add(e.index)
-        edge_verts = {v for e in cur_edges for v in e.verts[:]}
-        if not prefs.boundary_ignore_wires:
-            new_edges = []
-            for v in edge_verts:
-                if v.index not in visited_verts:
-                    linked_edges = v.link_edges[:]
-                    for e in linked_edges:
-                        if not any([e for e in linked_edges if e.is_wire]):
-                            if e.is_boundary and e.index not in final_selection:
-                                new_edges.append(e)
-                visited_verts.add(v.index)
-        elif prefs.boundary_ignore_wires:
-            new_edges = [e for v in edge_verts for e in v.link_edges[:]
-                         if e.is_boundary and e.index not in final_selection]
-
-        if len(new_edges) == 0:
-            break
-        else:
-            cur_edges = new_edges
-    return final_selection
+    ignore_wires = int(bool(prefs.boundary_ignore_wires))
+    boundary_id = topo.boundary_id[edge, ignore_wires]
+    if boundary_id < 0:
+        return np.array([edge], dtype=np.int32)
+    return topo.boundary(boundary_id, ignore_wires)
 
 
-# Takes an edge and returns a loop of face indices (as a set) for the ring direction of that edge.
-def face_loop_from_edge(edge):
+# Takes an edge index and returns a loop of face indices (as a set) for the ring direction of that edge.
+def face_loop_from_edge(topo, edge):
     prefs = bpy.context.preferences.addons[__name__].preferences
-    loop = edge.link_loops[0]
-    first_loop = loop
-    cur_loop = loop
+    ring_id = topo.ring_id[edge]
+    pos = topo.ring_pos[edge]
+    faces = topo.ring_face_loop(ring_id).tolist()
+    # Walk the faces on both sides of the edge, the same way the loops would be walked: around the ring
+    # to its ends, where a tri or n-gon on the other side of the end edge is the last face of the loop.
+    if topo.ring_closed[ring_id]:
+        faces = faces[pos:] + faces[:pos]
+        sides = [faces, faces[::-1]]
+    else:
+        ring = topo.ring(ring_id)
+        sides = [faces[pos:] + faces_beyond(topo, ring[-1]), faces[:pos][::-1] + faces_beyond(topo, ring[0])]
+    # The first walk goes into the face on the other side of the edge's first loop.
+    edge_faces = topo.edge_link_faces(edge)
+    if sides[1] and sides[1][0] == edge_faces[min(1, len(edge_faces) - 1)]:
+        sides.reverse()
+
     face_list = set()  # Checking for membership in sets is faster than lists []
-    going_forward = True
-    dead_end = False
-    while True:
-        # Jump to next loop on the same edge and walk two loops forward (opposite edge)
-        next_loop = cur_loop.link_loop_radial_next.link_loop_next.link_loop_next
-
-        next_face = next_loop.face
-        if next_face.index in face_list and prefs.terminate_self_intersects:
-            dead_end = True
-        elif next_face.index not in face_list:
-            if len(next_face.verts) == 4:
-                face_list.add(next_face.index)
-            elif len(next_face.verts) != 4 and prefs.allow_non_quads_at_ends:
-                face_list.add(next_face.index)
-
-        # If this is true then we've looped back to the beginning and are done
-        if next_loop == first_loop:
-            break
-        # If we reach a dead end because the next face is a tri or n-gon, or the next edge is boundary or nonmanifold.
-        elif len(next_face.verts) != 4 or len(next_loop.edge.link_faces) != 2 or dead_end:
-            # If going_forward then this is the first dead end and we want to go the other way
-            if going_forward:
-                going_forward = False
-                dead_end = False
-                # Return to the starting edge and go the other way
-                if len(edge.link_loops) > 1:
-                    next_loop = edge.link_loops[1]
-                else:
+    for side in sides:
+        for f in side:
+            if f in face_list:
+                if prefs.terminate_self_intersects:
                     break
-            # If not going_forward then this is the last dead end and we're done
-            else:
-                break
-        # Run this part always
-        cur_loop = next_loop
+            elif topo.face_valence[f] == 4 or prefs.allow_non_quads_at_ends:
+                face_list.add(f)
     return face_list
 
 
+# Takes an edge that ends face loops and quads on it, and returns the faces of the face loops that run away from
+# the edge through each of those quads.
+def face_loops_beyond(topo, edge, faces):
+    prefs = bpy.context.preferences.addons[__name__].preferences
+    face_list = set()
+    for f in faces:
+        edges = topo.face_edges(f)
+        if len(edges) == 4:
+            opposite = edges[(edges.index(edge) + 2) % 4]
+            face_list.update(cached_result(topo, face_loop_from_edge, opposite, prefs.allow_non_quads_at_ends,
+                                           prefs.terminate_self_intersects).tolist())
+    return np.fromiter(face_list, dtype=np.int32, count=len(face_list))
+
+
+# Takes the edge at the end of a ring and returns the tris and n-gons that the ring runs into there.
+def faces_beyond(topo, edge):
+    if topo.edge_face_count[edge] > 2:
+        return []
+    return [f for f in topo.edge_link_faces(edge) if topo.face_valence[f] != 4]
+
+
+# Takes a vertex index and returns an array of vertex indices for the whole piece of mesh it is part of.
+def linked_verts(topo, vert):
+    if topo.vert_component is None:
+        topo._build_components()
+    return np.flatnonzero(topo.vert_component == topo.vert_component[vert])
+
+
+# Takes a face index and returns an array of face indices for the piece of mesh it is part of, walking from face
+# to face across edges.  Edges marked in the seams mask aren't crossed, like select_linked's default delimit.
+def linked_faces(topo, face, seams=None):
+    owner = np.repeat(np.arange(topo.num_edges), topo.edge_face_count)
+    first = topo.edge_loops[topo.edge_loop_start[owner]]
+    keep = first != topo.edge_loops
+    if seams is not None:
+        keep &= ~seams[owner]
+    pairs = np.column_stack((topo.loop_face[first[keep]], topo.loop_face[topo.edge_loops[keep]]))
+    component = _label_components(topo.num_faces, pairs)
+    return np.flatnonzero(component == component[face])
+
+
+# Takes a face and the ID of a ring that runs through it and returns the position of the face along that
+# ring's face loop, or -1 if the face isn't one of its quads.  Face k sits between ring edges k and k + 1.
+def strip_position(topo, ring_id, face):
+    count = topo.ring_face_count[ring_id]
+    faces = topo.ring_face_loop(ring_id)
+    for e in topo.face_edges(face):
+        if topo.ring_id[e] != ring_id:
+            continue
+        for pos in (topo.ring_pos[e], topo.ring_pos[e] - 1):
+            if topo.ring_closed[ring_id]:
+                pos %= count
+            if 0 <= pos < count and faces[pos] == face:
+                return int(pos)
+    return -1
+
+
+# Takes two neighbouring faces and returns the edges between them that a face loop through both could cross, in
+# index order.  When they share several edges only those whose face loop has the two faces next to each other
+# count, so anything but a single edge means the loop is ambiguous.  Empty if the faces aren't neighbours.
+def face_loop_edges(topo, face_a, face_b):
+    shared = sorted(set(topo.face_edges(face_a)) & set(topo.face_edges(face_b)))
+    if len(shared) < 2:
+        return shared
+    edges = []
+    for e in shared:
+        ring_id = topo.ring_id[e]
+        pos_a = strip_position(topo, ring_id, face_a)
+        pos_b = strip_position(topo, ring_id, face_b)
+        if pos_a < 0 or pos_b < 0:
+            continue
+        distance = abs(pos_a - pos_b)
+        if distance == 1 or topo.ring_closed[ring_id] and distance == topo.ring_face_count[ring_id] - 1:
+            edges.append(e)
+    return edges if edges else shared
+
+
+# Takes two face indices and returns an array of face indices for a shortest path between them, both ends
+# included.  When both faces are quads on the face loop of ring_edge the path simply follows that strip,
+# otherwise it is a breadth first search across edges.  Returns an empty array if there is no path.
+def face_path(topo, face_a, face_b, ring_edge=-1):
+    if ring_edge >= 0:
+        ring_id = topo.ring_id[ring_edge]
+        pos_a = strip_position(topo, ring_id, face_a)
+        pos_b = strip_position(topo, ring_id, face_b)
+        if pos_a >= 0 and pos_b >= 0:
+            faces = topo.ring_face_loop(ring_id)
+            lo, hi = sorted((pos_a, pos_b))
+            if topo.ring_closed[ring_id] and hi - lo > len(faces) - (hi - lo):
+                return np.concatenate((faces[hi:], faces[:lo + 1]))
+            return faces[lo:hi + 1]
+
+    if topo.face_links is None:
+        topo._build_face_links()
+    return _bidirectional_path(face_a, face_b, topo.face_link_start, topo.face_link_count, topo.face_links)
+
+
+# Breadth first search from both ends at once over a CSR adjacency, expanding whichever frontier is smaller
+# one whole level at a time.  Returns the path from start to goal as an array.
+def _bidirectional_path(start, goal, link_start, link_count, links):
+    if start == goal:
+        return np.array([start], dtype=np.int32)
+    n = len(link_start)
+    parent = [np.full(n, -1, dtype=np.int32), np.full(n, -1, dtype=np.int32)]
+    depth = [np.full(n, -1, dtype=np.int32), np.full(n, -1, dtype=np.int32)]
+    depth[0][start] = 0
+    depth[1][goal] = 0
+    frontier = [np.array([start], dtype=np.int32), np.array([goal], dtype=np.int32)]
+    level = [0, 0]
+    while frontier[0].size and frontier[1].size:
+        side = 0 if frontier[0].size <= frontier[1].size else 1
+        other = 1 - side
+        cur = frontier[side]
+        counts = link_count[cur]
+        found = links[_ranges(link_start[cur], counts)]
+        source = np.repeat(cur, counts)
+        new = depth[side][found] < 0
+        found, first = np.unique(found[new], return_index=True)
+        source = source[new][first]
+        level[side] += 1
+        parent[side][found] = source
+        depth[side][found] = level[side]
+        meet = found[depth[other][found] >= 0]
+        if meet.size:
+            # Every meeting face is as far from this side, take the one closest to the other side.
+            middle = int(meet[np.argmin(depth[other][meet])])
+            halves = []
+            for walk in (0, 1):
+                half = []
+                f = middle
+                while f != (start, goal)[walk]:
+                    f = int(parent[walk][f])
+                    half.append(f)
+                halves.append(half)
+            return np.array(halves[0][::-1] + [middle] + halves[1], dtype=np.int32)
+        frontier[side] = found.astype(np.int32)
+    return np.zeros(0, dtype=np.int32)
+
+
+# ##################### Topology report ##################### #
+
+# Statistics of a whole mesh, all from arrays of the topology index:
+#   loops, rings          count, closed count and {length: count} of the edge loops and rings
+#   poles, border_poles   {valence: count} of the vertices inside the mesh without 4 edges, and on its border
+#                         without 3, counting only edges with faces
+#   pole_verts            those vertices
+#   terminators           how many tris and n-gons face loops run into
+#   terminator_faces      those faces
+# IDs a repair left unused have length 0 and are left out.
+def topology_report(topo):
+    report = {"loops": _length_stats(topo.loop_length, topo.loop_closed),
+              "rings": _length_stats(topo.ring_length, topo.ring_closed)}
+
+    edges = ~topo.edge_is_wire
+    valence = np.bincount(topo.edge_verts[edges].ravel(), minlength=topo.num_verts)
+    border = np.zeros(topo.num_verts, dtype=bool)
+    border[topo.edge_verts[topo.edge_is_boundary].ravel()] = True
+    candidates = topo.vert_is_manifold & (topo.vert_loop_count > 0)
+    inner_poles = np.flatnonzero(candidates & ~border & (valence != 4))
+    border_poles = np.flatnonzero(candidates & border & (valence != 3))
+    report["poles"] = _value_counts(valence[inner_poles])
+    report["border_poles"] = _value_counts(valence[border_poles])
+    report["pole_verts"] = np.union1d(inner_poles, border_poles)
+
+    # A face loop runs into a tri or n-gon across an edge that also has a quad on it.
+    is_quad = topo.quad_opposite >= 0
+    edge_has_quad = np.zeros(topo.num_edges, dtype=bool)
+    edge_has_quad[topo.loop_edge[is_quad]] = True
+    ends = ~is_quad & edge_has_quad[topo.loop_edge]
+    faces = np.unique(topo.loop_face[ends])
+    report["terminators"] = {"tris": int((topo.face_valence[faces] == 3).sum()),
+                             "ngons": int((topo.face_valence[faces] > 4).sum())}
+    report["terminator_faces"] = faces
+    return report
+
+
+def _length_stats(length, closed):
+    used = length > 0
+    return {"count": int(used.sum()), "closed": int((closed & used).sum()), "lengths": _value_counts(length[used])}
+
+
+def _value_counts(values):
+    values, counts = np.unique(values, return_counts=True)
+    return dict(zip(values.tolist(), counts.tolist()))
+
+
+def format_topology_report(name, report):
+    lines = ["Topology of %s" % name]
+    for kind in ("loops", "rings"):
+        stats = report[kind]
+        lines.append("  %d edge %s, %d of them closed" % (stats["count"], kind, stats["closed"]))
+        lines.append("    lengths: " + _format_counts(stats["lengths"]))
+    lines.append("  %d poles inside, by valence: %s" % (sum(report["poles"].values()), _format_counts(report["poles"])))
+    lines.append("  %d poles on borders, by valence: %s" % (sum(report["border_poles"].values()),
+                                                           _format_counts(report["border_poles"])))
+    lines.append("  face loops end in %(tris)d tris and %(ngons)d n-gons" % report["terminators"])
+    return "\n".join(lines)
+
+
+# {value: count} as "value x count" pairs, the long tail of rare values cut short.
+def _format_counts(counts, limit=12):
+    items = sorted(counts.items(), key=lambda item: -item[1])
+    text = ", ".join("%d x%d" % item for item in sorted(items[:limit]))
+    if len(items) > limit:
+        text += ", %d more values" % (len(items) - limit)
+    return text or "none"
+
+
 # ##################### Loopanar defs ##################### #
 
-def loop_extension(edge, vert):
-    candidates = vert.link_edges[:]
-    # For certain topology link_edges and link_loops return different numbers.
-    # So we have to use link_loops for our length test, otherwise somehow we get stuck in an infinite loop.
-    if len(vert.link_loops) == 4 and vert.is_manifold:
-        cruft = [edge]  # The next edge obviously can't be the current edge.
-        for l in edge.link_loops:
-            # The 'next' and 'prev' edges are perpendicular to the desired loop so we don't want them.
-            cruft.extend([l.link_loop_next.edge, l.link_loop_prev.edge])
-        # Therefore by process of elimination there are 3 unwanted edges in cruft and only 1 possible edge left.
-        return [e for e in candidates if e not in cruft][0]
+# Takes an edge index and returns the edge indices of its loop, in loop order.  If the loop is infinite
+# it starts at the given edge and the edge is repeated at the end.
+def entire_loop(topo, edge):
+    loop_id = topo.loop_id[edge]
+    loop = topo.loop(loop_id)
+    if topo.loop_closed[loop_id]:
+        return np.append(np.roll(loop, -topo.loop_pos[edge]), edge)
+    return loop
+
+
+# Takes an edge index and returns the edge indices of its ring, in ring order.  If the ring is infinite
+# it starts at the given edge and the edge is repeated at the end.
+def entire_ring(topo, edge):
+    ring_id = topo.ring_id[edge]
+    ring = topo.ring(ring_id)
+    if topo.ring_closed[ring_id]:
+        return np.append(np.roll(ring, -topo.ring_pos[edge]), edge)
+    return ring
+
+
+# Takes any number of seed edges and returns the indices of every edge in their loops, with each loop
+# walked once no matter how many seeds it has.  Scripts can use this with get_topology_index:
+#   topo = get_topology_index(obj, bmesh.from_edit_mesh(obj.data))
+#   edges = loops_from_seeds(topo, seed_edge_indices)
+def loops_from_seeds(topo, seeds):
+    return _union_of_runs(topo.loop_id, topo.loop_start, topo.loop_length, topo.loop_edges, seeds)
+
+
+# Same as loops_from_seeds for edge rings.
+def rings_from_seeds(topo, seeds):
+    return _union_of_runs(topo.ring_id, topo.ring_start, topo.ring_length, topo.ring_edges, seeds)
+
+
+# Takes an edge index and returns the edges of its loop, and those of them that are a whole number of steps
+# plus offset away from the edge along the loop.  Both are index arrays.
+def nth_along_loop(topo, edge, step, offset=0):
+    loop_id = topo.loop_id[edge]
+    return _every_nth(topo.loop(loop_id), topo.loop_closed[loop_id], topo.loop_pos[edge], step, offset)
+
+
+# Same as nth_along_loop along the edge's ring.
+def nth_along_ring(topo, edge, step, offset=0):
+    ring_id = topo.ring_id[edge]
+    return _every_nth(topo.ring(ring_id), topo.ring_closed[ring_id], topo.ring_pos[edge], step, offset)
+
+
+# Same as nth_along_loop for the faces of the face loop of an edge's ring, counted from one of its faces.  With
+# non_quad_ends a tri or n-gon past either end of an open face loop is part of it, like in face_loop_from_edge.
+def nth_along_face_loop(topo, edge, face, step, offset=0, non_quad_ends=False):
+    ring_id = topo.ring_id[edge]
+    faces = topo.ring_face_loop(ring_id)
+    closed = topo.ring_closed[ring_id]
+    pos = strip_position(topo, ring_id, face)
+    if non_quad_ends and not closed:
+        ring = topo.ring(ring_id)
+        before = faces_beyond(topo, ring[0])[::-1]
+        after = faces_beyond(topo, ring[-1])
+        faces = np.concatenate((np.array(before, dtype=faces.dtype), faces, np.array(after, dtype=faces.dtype)))
+        if pos >= 0:
+            pos += len(before)
+        elif face in before or face in after:
+            pos = int(np.flatnonzero(faces == face)[0])
+    if pos < 0:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+    return _every_nth(faces, closed, pos, step, offset)
+
+
+# The elements at the positions of a loop that are offset plus a multiple of step away from pos.  A closed loop
+# counts onwards from pos all the way round, so if its length isn't a multiple of step the pattern has one
+# irregular gap, just before pos.
+def _every_nth(elements, closed, pos, step, offset):
+    distance = np.arange(len(elements)) - pos
+    if closed:
+        distance %= len(elements)
+    return elements, elements[(distance - offset) % step == 0]
+
+
+def _union_of_runs(run_id, run_start, run_length, elements, seeds):
+    seeds = _indices(seeds)
+    visited = np.zeros(len(run_start), dtype=bool)
+    visited[run_id[seeds]] = True
+    runs = np.flatnonzero(visited)
+    return elements[_ranges(run_start[runs], run_length[runs])]
+
+
+# Takes two edges of the same loop and returns the indices of the edges between them.  On an infinite loop
+# this is the shorter way around, or both ways if they are the same length.  Positions along the loop make
+# this plain arithmetic, no matter how long the loop is.
+def loop_span(topo, edge_a, edge_b):
+    loop_id = topo.loop_id[edge_a]
+    if topo.loop_id[edge_b] != loop_id:
+        return np.zeros(0, dtype=np.int32)
+    return _span(topo.loop(loop_id), topo.loop_closed[loop_id], topo.loop_pos[edge_a], topo.loop_pos[edge_b])
+
+
+# Takes two vertices and returns the indices of the edges between them along an edge loop that runs through
+# both, going the shorter way if more than one loop or direction would do.  Returns an empty array if no loop
+# passes through both vertices.
+def vert_loop_span(topo, vert_a, vert_b):
+    start_a, start_b = topo.vert_edge_start[vert_a], topo.vert_edge_start[vert_b]
+    loops_a = topo.vert_loop_ids[start_a:start_a + topo.vert_valence[vert_a]]
+    loops_b = topo.vert_loop_ids[start_b:start_b + topo.vert_valence[vert_b]]
+    best = np.zeros(0, dtype=np.int32)
+    for loop_id in np.intersect1d(loops_a, loops_b).tolist():
+        loop = topo.loop(loop_id)
+        closed = topo.loop_closed[loop_id]
+        span = _chain_span(loop, closed,
+                           _chain_vert_positions(topo, loop, closed, topo.loop_id, topo.loop_pos, loop_id, vert_a),
+                           _chain_vert_positions(topo, loop, closed, topo.loop_id, topo.loop_pos, loop_id, vert_b))
+        if span.size and (not best.size or len(span) < len(best)):
+            best = span
+    return best
+
+
+# The shortest stretch of a chain of edges (a loop or a boundary chain) between any of the vertex positions in
+# positions_a and any in positions_b.  On a closed chain halfway round both ways is the whole chain.
+def _chain_span(chain, closed, positions_a, positions_b):
+    best = np.zeros(0, dtype=np.int32)
+    for pos_a in positions_a:
+        for pos_b in positions_b:
+            if pos_a == pos_b:
+                continue
+            lo, hi = sorted((pos_a, pos_b))
+            span = chain[lo:hi]
+            if closed:
+                other = np.concatenate((chain[hi:], chain[:lo]))
+                if len(other) < len(span):
+                    span = other
+                elif len(other) == len(span):
+                    span = np.concatenate((span, other))
+            if not best.size or len(span) < len(best):
+                best = span
+    return best
+
+
+# Where a vertex sits along a chain of edges, the loop or boundary chain that ids and positions (loop_id and
+# loop_pos, or their boundary counterparts) label as chain_id: vertex k is the one between chain edges k - 1 and
+# k.  A chain that crosses itself can pass through the same vertex more than once.
+def _chain_vert_positions(topo, chain, closed, ids, positions, chain_id, vert):
+    n = len(chain)
+    found = set()
+    for e in topo.vert_link_edges(vert):
+        if ids[e] != chain_id:
+            continue
+        pos = int(positions[e])
+        after = chain[(pos + 1) % n] if closed or pos + 1 < n else -1
+        before = chain[pos - 1] if closed or pos > 0 else -1
+        if after >= 0 and vert in topo.edge_verts[after]:
+            found.add((pos + 1) % n if closed else pos + 1)
+        elif before >= 0 and vert in topo.edge_verts[before]:
+            found.add(pos)
+        elif before >= 0:
+            found.add(pos + 1)
+        elif after >= 0:
+            found.add(pos)
+        else:
+            found.add(0 if topo.edge_verts[e, 0] == vert else 1)
+    return found
+
+
+# Takes two vertices and returns the indices of the border edges between them along a boundary that runs through
+# both, the shorter way round, or the whole boundary if both ways are the same length.  Follows the same rules for
+# wire edges as get_boundary_edge_loop.  Where a boundary branches only the stretches between the branches count,
+# the chains _build_boundaries found.  Returns an empty array if no boundary chain passes through both.
+def vert_boundary_span(topo, vert_a, vert_b, ignore_wires):
+    ignore_wires = int(bool(ignore_wires))
+    ids = topo.boundary_chain[:, ignore_wires]
+    positions = topo.boundary_pos[:, ignore_wires]
+    chains_a = ids[topo.vert_link_edges(vert_a)]
+    chains_b = ids[topo.vert_link_edges(vert_b)]
+    best = np.zeros(0, dtype=np.int32)
+    for chain_id in np.intersect1d(chains_a[chains_a >= 0], chains_b[chains_b >= 0]).tolist():
+        chain = topo.boundary_chain_edges(chain_id, ignore_wires)
+        closed = topo.boundary_chain_closed[ignore_wires][chain_id]
+        span = _chain_span(chain, closed,
+                           _chain_vert_positions(topo, chain, closed, ids, positions, chain_id, vert_a),
+                           _chain_vert_positions(topo, chain, closed, ids, positions, chain_id, vert_b))
+        if span.size and (not best.size or len(span) < len(best)):
+            best = span
+    return best
+
+
+# Same as loop_span, for two edges of the same ring.
+def ring_span(topo, edge_a, edge_b):
+    # Non-manifold edges are rings of their own but can also be at the end of the ring of the other edge.
+    if topo.edge_face_count[edge_a] > 2:
+        edge_a, edge_b = edge_b, edge_a
+    ring_id = topo.ring_id[edge_a]
+    ring = topo.ring(ring_id)
+    if topo.ring_id[edge_b] == ring_id:
+        pos_b = topo.ring_pos[edge_b]
+    elif ring[0] == edge_b:
+        pos_b = 0
+    elif ring[-1] == edge_b:
+        pos_b = len(ring) - 1
     else:
-        return
+        return np.zeros(0, dtype=np.int32)
+    return _span(ring, topo.ring_closed[ring_id], topo.ring_pos[edge_a], pos_b)
 
 
-def loop_end(edge):
-    # What's going on here?  This looks like it's assigning both vertices at once from the edge.verts
-    v1, v2 = edge.verts[:]
-    # And returns only one of them dependong on the result from loop_extension?
-    return not loop_extension(edge, v1) or not loop_extension(edge, v2)
+def _span(edges, closed, pos_a, pos_b):
+    lo, hi = sorted((int(pos_a), int(pos_b)))
+    inner = edges[lo + 1:hi]
+    # The gaps before the first and after the last edge, which wrap around into one gap on an infinite loop.
+    outer = np.concatenate((edges[hi + 1:], edges[:lo]))
+    if not closed:
+        # The tails run to the dead ends, they are only used when the edges are right next to each other.
+        return inner if len(inner) else outer
+    # Edges right next to each other leave only one gap, which is used even if it is the long way around.
+    if not len(inner):
+        return outer
+    if not len(outer):
+        return inner
+    if len(inner) != len(outer):
+        return inner if len(inner) < len(outer) else outer
+    return np.concatenate((inner, outer))
 
 
-def ring_extension(edge, face):
-    if len(face.verts) == 4:
-        # Get the only 2 verts that are not in the edge we start with.
-        target_verts = [v for v in face.verts if v not in edge.verts]
-        # Return the only edge that corresponds to those two verts back to partial_ring.
-        return [e for e in face.edges if target_verts[0] in e.verts and target_verts[1] in e.verts][0]
-    else:
-        # Otherwise the face isn't a quad.. return nothing to partial_ring.
-        return
+# Takes two separated loop edges and returns an array of indices for edges in the shortest loop between them.
+def select_bounded_loop(topo, edges):
+    return loop_span(topo, edges[0], edges[1])
 
 
-def ring_end(edge):
-    faces = edge.link_faces[:]
-    border = len(faces) == 1  # If only one face is connected then this edge must be the border of the mesh.
-    non_manifold = len(faces) > 2  # In manifold geometry one edge can only be connected to two faces.
-    dead_ends = map(lambda x: len(x.verts) != 4, faces)
-    return border or non_manifold or any(dead_ends)
-
-
-def entire_loop(edge):
-    e = edge
-    v = edge.verts[0]
-    loop = [edge]
-    going_forward = True
-    while True:
-        ext = loop_extension(e, v)  # Pass the edge and its starting vert to loop_extension
-        if ext:  # If loop_extension returns an edge, keep going.
-            if going_forward:
-                if ext == edge:  # infinite; we've reached our starting edge and are done
-                    # Why are we returning the loop and edge twice?  Loop already has edge in it.  Why not just loop?
-                    return [edge] + loop + [edge]
-                else:  # continue forward
-                    loop.append(ext)
-            else:  # continue backward
-                loop.insert(0, ext)
-            v = ext.other_vert(v)
-            e = ext
-        else:  # finite and we've reached an end
-            if going_forward:  # the first end
-                going_forward = False
-                e = edge
-                v = edge.verts[1]
-            else:  # the other end
-                return loop  # Return the completed partial loop
-
-
-def partial_ring(edge, face):
-    part_ring = []
-    e, f = edge, face
-    while True:
-        ext = ring_extension(e, f)  # Pass the edge and face to ring_extension
-        if not ext:
-            break
-        part_ring.append(ext)
-        if ext == edge:  # infinite; we've reached our starting edge and are done
-            break
-        if ring_end(ext):  # Pass the edge returned from ring_extension to check if it is the end.
-            break
-        else:
-            f = [x for x in ext.link_faces if x != f][0]
-            e = ext
-    return part_ring  # return partial ring to entire_ring
-
-
-def entire_ring(edge):
-    fs = edge.link_faces  # Get faces connected to this edge.
-    ring = [edge]
-    # First check to see if there is ANY face connected to the edge (because Blender allows for floating edges.
-    # If there's at least 1 face, then make sure only 2 faces are connected to 1 edge (manifold geometry) to continue.
-    if len(fs) and len(fs) < 3:
-        # ne must stand for Next Edge? Take the edge from the input, and a face from fs and pass it to partial_ring..
-        dirs = [ne for ne in [partial_ring(edge, f) for f in fs] if ne]
-        if dirs:
-            if len(dirs) == 2 and set(dirs[0]) != set(dirs[1]):
-                [ring.insert(0, e) for e in dirs[1]]
-            ring.extend(dirs[0])
-    return ring  # return ring back to complete_associated_rings
-
-
-def complete_associated_loops(edges):
-    loops = []
-    for e in edges:
-        if not any([e in l for l in loops]):
-            loops.append(entire_loop(e))
-    return loops
-
-
-def complete_associated_rings(edges):
-    rings = []
-    for e in edges:
-        # At first glance this line doesn't seem to matter because rings is empty but once we start
-        # adding rings to it then I believe it's needed to prevent duplicates (why not a set?)
-        if not any([e in r for r in rings]):
-            rings.append(entire_ring(e))
-    return rings  # return rings back to select_bounded_ring
-
-
-def group_unselected(edges, ends):
-    gaps = [[]]
-    for e in edges:
-        # if not e.select:  # We don't care about what's already selected.
-        if e not in ends:  # We only care about the gap between the two ends that we used to start the selection.
-            gaps[-1].extend([e])
-        else:
-            gaps.append([])
-    return [g for g in gaps if g != []]
-
-
-# Takes two separated loop edges and returns a set of indices for edges in the shortest loop between them.
-def select_bounded_loop(edges):
-    for l in complete_associated_loops(edges):
-        gaps = group_unselected(l, edges)
-        new_sel = set()
-        if l[0] == l[-1]:  # loop is infinite
-            sg = sorted(gaps,
-                        key = lambda x: len(x),
-                        reverse = True)
-            if len(sg) > 1 and len(sg[0]) > len(sg[1]):  # single longest gap
-                final_gaps = sg[1:]
-            else:
-                final_gaps = sg
-        else:  # loop is finite
-            tails = [g for g in gaps if any(map(lambda x: loop_end(x), g))]
-            nontails = [g for g in gaps if g not in tails]
-            if nontails:
-                final_gaps = nontails
-            else:
-                final_gaps = gaps
-        for g in final_gaps:
-            for e in g:
-                new_sel.add(e.index)
-    return new_sel
-
-
-# Takes two separated ring edges and returns a set of indices for edges in the shortest ring between them.
-def select_bounded_ring(edges):
-    for r in complete_associated_rings(edges):
-        gaps = group_unselected(r, edges)
-        new_sel = set()
-        if r[0] == r[-1]:  # ring is infinite
-            sg = sorted(gaps,
-                        key = lambda x: len(x),
-                        reverse = True)
-            if len(sg) > 1 and len(sg[0]) > len(sg[1]):  # single longest gap
-                final_gaps = sg[1:]
-            else:  # Otherwise the lengths must be identical and there is no single longest gap?
-                final_gaps = sg
-        else:  # ring is finite
-            # Tails = any group of unselected edges starting at one of the starting edges
-            # and extending all the way to a dead end.
-            tails = [g for g in gaps if any(map(lambda x: ring_end(x), g))]
-            nontails = [g for g in gaps if g not in tails]  # Any group between the edges in starting edges.
-            if nontails:
-                final_gaps = nontails
-            else:
-                final_gaps = gaps
-        for g in final_gaps:
-            for e in g:
-                new_sel.add(e.index)
-    return new_sel
+# Takes two separated ring edges and returns an array of indices for edges in the shortest ring between them.
+def select_bounded_ring(topo, edges):
+    return ring_span(topo, edges[0], edges[1])
 
 
 def register():
     for every_class in classes:
         bpy.utils.register_class(every_class)
+    bpy.app.handlers.depsgraph_update_post.append(topology_update_handler)
+    bpy.app.handlers.load_post.append(clear_caches_handler)
+    bpy.app.handlers.save_post.append(save_indices_handler)
 
 
 def unregister():
     for every_class in classes:
         bpy.utils.unregister_class(every_class)
+    bpy.app.handlers.depsgraph_update_post.remove(topology_update_handler)
+    bpy.app.handlers.load_post.remove(clear_caches_handler)
+    bpy.app.handlers.save_post.remove(save_indices_handler)
+    clear_caches_handler()
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False)
+        _pool = None
+    update_process_pool(False)
 
 
 if __name__ == "__main__":
@@ -29,6 +29,7 @@ bl_info = {
 }
 
 import bpy
+import time
 
 
 class MeshMode:
@@ -57,11 +58,57 @@ class EventType:
     RIGHTMOUSE = 'RIGHTMOUSE'
     ESC = 'ESC'
 
+
+# Time spent handling each type of event in a modal operator, summed up when the operator ends.
+class LatencyRecorder:
+    # Events that take longer than a frame at 60 fps hold up the window manager, which merges the mouse moves
+    # that come in meanwhile into one.
+    FRAME_BUDGET = 1.0 / 60.0
+
+    def __init__(self):
+        self.times = {}
+        self.slow = 0
+        self.coalesced = 0
+
+    def record(self, event_type, seconds):
+        self.times.setdefault(event_type, []).append(seconds)
+        if seconds > self.FRAME_BUDGET:
+            self.slow += 1
+            self.coalesced += int(seconds / self.FRAME_BUDGET)
+
+    def summary(self):
+        times = sorted(t for event_times in self.times.values() for t in event_times)
+        if not times:
+            return "No events recorded"
+        return "%d events, p50 %.1f ms, p95 %.1f ms, p99 %.1f ms, %d over a frame, about %d mouse moves coalesced" % (
+            len(times), percentile(times, 50) * 1000, percentile(times, 95) * 1000, percentile(times, 99) * 1000,
+            self.slow, self.coalesced)
+
+    def report(self, name):
+        lines = ["%s latency: %s" % (name, self.summary())]
+        for event_type, times in sorted(self.times.items(), key=lambda item: -sum(item[1])):
+            times = sorted(times)
+            lines.append("  %-16s %6d events  p50 %8.2f ms  p95 %8.2f ms  p99 %8.2f ms  max %8.2f ms" % (
+                event_type, len(times), percentile(times, 50) * 1000, percentile(times, 95) * 1000,
+                percentile(times, 99) * 1000, times[-1] * 1000))
+        return "\n".join(lines)
+
+
+# Nearest rank percentile of a sorted list.
+def percentile(sorted_times, percent):
+    return sorted_times[min(len(sorted_times) - 1, int(round(percent / 100.0 * (len(sorted_times) - 1))))]
+
+
 class ModalEdgeToCurve(bpy.types.Operator):
     bl_idname = "object.edge_to_curve"
     bl_label = "Edges To Curve"
     bl_options = {'REGISTER', 'UNDO'}
 
+    record_latency: bpy.props.BoolProperty(
+        name="Record Latency",
+        description="Time how long every event takes to handle, printed to the console when the operator ends",
+        default=False)
+
     @classmethod
     def poll(cls, context):
         return context.active_object.mode == ObjectMode.EDIT and context.active_object.type == 'MESH' or context.active_object.type == 'CURVE'
@@ -72,6 +119,17 @@ class ModalEdgeToCurve(bpy.types.Operator):
         return {'FINISHED'}
 
     def modal(self, context, event):
+        if not self.record_latency:
+            return self.handle_event(context, event)
+        start = time.perf_counter()
+        result = self.handle_event(context, event)
+        self.latency.record(event.type, time.perf_counter() - start)
+        if not result & {'RUNNING_MODAL', 'PASS_THROUGH'}:
+            print(self.latency.report(self.bl_label))
+            self.report({'INFO'}, self.latency.summary())
+        return result
+
+    def handle_event(self, context, event):
         if event.type == EventType.MOUSEMOVE:  # Apply
             self.value = max(0, (event.mouse_x - self.start_value))
         elif event.type == EventType.WHEELUPMOUSE:
@@ -102,6 +160,7 @@ class ModalEdgeToCurve(bpy.types.Operator):
         return {'RUNNING_MODAL'}
 
     def invoke(self, context, event):
+        self.latency = LatencyRecorder()
         self.value = 0.0
         self.start_value = event.mouse_x
         self.resolution = 2
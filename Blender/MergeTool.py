@@ -21,6 +21,8 @@ import bgl
 import gpu
 import bmesh
 import math
+import time
+import numpy as np
 from gpu_extras.batch import batch_for_shader
 
 bl_info = {
@@ -35,7 +37,28 @@ bl_info = {
 
 
 def draw_callback_px(self, context):
-    if self.started and self.start_vertex is not None and self.end_vertex is not None:
+    if self.cluster_coords:
+        bgl.glEnable(bgl.GL_BLEND)
+        shader = gpu.shader.from_builtin('3D_UNIFORM_COLOR')
+        batch = batch_for_shader(shader, 'POINTS', {"pos": self.cluster_coords})
+        shader.bind()
+        shader.uniform_float("color", (0.2, 0.8, 1, 1))
+        batch.draw(shader)
+        bgl.glDisable(bgl.GL_BLEND)
+
+    if self.pair_coords:
+        bgl.glEnable(bgl.GL_BLEND)
+        shader = gpu.shader.from_builtin('3D_UNIFORM_COLOR')
+        batch = batch_for_shader(shader, 'LINES', {"pos": self.pair_coords})
+        shader.bind()
+        shader.uniform_float("color", (1, 0.5, 0, 1))
+        batch.draw(shader)
+
+        batch = batch_for_shader(shader, 'POINTS', {"pos": self.pair_coords})
+        batch.draw(shader)
+        bgl.glDisable(bgl.GL_BLEND)
+
+    if self.started and self.start_index >= 0 and self.end_index >= 0:
         bgl.glEnable(bgl.GL_BLEND)
         coords = [self.start_vertex_transformed, self.end_vertex_transformed]
         shader = gpu.shader.from_builtin('3D_UNIFORM_COLOR')
@@ -54,17 +77,189 @@ def draw_callback_px(self, context):
         bgl.glDisable(bgl.GL_BLEND)
 
 
-def main(context, event, started):
-    """Run this function on left mouse, execute the ray cast"""
-    coord = event.mouse_region_x, event.mouse_region_y
+class LatencyRecorder:
+    """Time spent handling each type of event in a modal operator, summed up when the operator ends"""
+
+    # Events that take longer than a frame at 60 fps hold up the window manager, which merges the mouse moves
+    # that come in meanwhile into one.
+    FRAME_BUDGET = 1.0 / 60.0
+
+    def __init__(self):
+        self.times = {}
+        self.slow = 0
+        self.coalesced = 0
+
+    def record(self, event_type, seconds):
+        self.times.setdefault(event_type, []).append(seconds)
+        if seconds > self.FRAME_BUDGET:
+            self.slow += 1
+            self.coalesced += int(seconds / self.FRAME_BUDGET)
+
+    def summary(self):
+        times = sorted(t for event_times in self.times.values() for t in event_times)
+        if not times:
+            return "No events recorded"
+        return "%d events, p50 %.1f ms, p95 %.1f ms, p99 %.1f ms, %d over a frame, about %d mouse moves coalesced" % (
+            len(times), percentile(times, 50) * 1000, percentile(times, 95) * 1000, percentile(times, 99) * 1000,
+            self.slow, self.coalesced)
+
+    def report(self, name):
+        lines = ["%s latency: %s" % (name, self.summary())]
+        for event_type, times in sorted(self.times.items(), key=lambda item: -sum(item[1])):
+            times = sorted(times)
+            lines.append("  %-16s %6d events  p50 %8.2f ms  p95 %8.2f ms  p99 %8.2f ms  max %8.2f ms" % (
+                event_type, len(times), percentile(times, 50) * 1000, percentile(times, 95) * 1000,
+                percentile(times, 99) * 1000, times[-1] * 1000))
+        return "\n".join(lines)
+
+
+def percentile(sorted_times, percent):
+    """Nearest rank percentile of a sorted list"""
+    return sorted_times[min(len(sorted_times) - 1, int(round(percent / 100.0 * (len(sorted_times) - 1))))]
+
+
+# How far from the mouse, in pixels, a vertex can be hovered.
+PICK_RADIUS = 40
+# Vertices this many pixels further from the mouse than the closest one still win if they are nearer the view.
+PICK_DEPTH_SLACK = 6
+
+
+class ScreenGrid:
+    """Vertices in region space, bucketed into square cells of PICK_RADIUS for nearest vertex lookups"""
+
+    def __init__(self, points, indices, depths, height):
+        cells = np.floor(points / PICK_RADIUS).astype(np.int64) + 1
+        self.rows = int(math.ceil(height / PICK_RADIUS)) + 3
+        keys = cells[:, 0] * self.rows + cells[:, 1]
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.points = points[order]
+        self.indices = indices[order]
+        self.depths = depths[order]
+
+    def nearest(self, x, y):
+        """Index of the vertex closest to x, y within PICK_RADIUS, the one nearest the view among close calls, or -1"""
+        cx = int(math.floor(x / PICK_RADIUS)) + 1
+        cy = int(math.floor(y / PICK_RADIUS)) + 1
+        # The three cells of a column are next to each other in key order.
+        firsts = [(cx + dx) * self.rows + cy - 1 for dx in (-1, 0, 1)]
+        starts = np.searchsorted(self.keys, firsts)
+        ends = np.searchsorted(self.keys, [first + 3 for first in firsts])
+        candidates = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+        if not candidates.size:
+            return -1
+        distance = np.sqrt(((self.points[candidates] - (x, y)) ** 2).sum(axis=1))
+        closest = distance.min()
+        if closest > PICK_RADIUS:
+            return -1
+        # Vertices stacked on top of each other on screen go to the front one.
+        close = candidates[distance <= min(closest + PICK_DEPTH_SLACK, PICK_RADIUS)]
+        return int(self.indices[close[np.argmin(self.depths[close])]])
+
 
-    if started:
-        result = bpy.ops.view3d.select(extend=True, location=coord)
+def vertex_coordinates(obj):
+    """Local coordinates and hide flags of all vertices, read in bulk from the mesh"""
+    obj.update_from_editmode()
+    me = obj.data
+    co = np.empty(len(me.vertices) * 3, dtype=np.float64)
+    me.vertices.foreach_get("co", co)
+    hide = np.empty(len(me.vertices), dtype=bool)
+    me.vertices.foreach_get("hide", hide)
+    return co.reshape(-1, 3), hide
+
+
+def front_facing_vertices(obj, region_data):
+    """Mask of the vertices on a face turned towards the view, or on no face at all"""
+    me = obj.data
+    normals = np.empty(len(me.polygons) * 3, dtype=np.float64)
+    me.polygons.foreach_get("normal", normals)
+    centers = np.empty(len(me.polygons) * 3, dtype=np.float64)
+    me.polygons.foreach_get("center", centers)
+    loop_total = np.empty(len(me.polygons), dtype=np.int64)
+    me.polygons.foreach_get("loop_total", loop_total)
+    loop_vert = np.empty(len(me.loops), dtype=np.int64)
+    me.loops.foreach_get("vertex_index", loop_vert)
+
+    view_to_local = np.array(obj.matrix_world.inverted() @ region_data.view_matrix.inverted())
+    if region_data.is_perspective:
+        towards_view = view_to_local[:3, 3] - centers.reshape(-1, 3)
     else:
-        result = bpy.ops.view3d.select(extend=False, location=coord)
+        towards_view = view_to_local[:3, 2]
+    front = (normals.reshape(-1, 3) * towards_view).sum(axis=1) >= 0
+
+    on_face = np.zeros(len(me.vertices), dtype=bool)
+    on_face[loop_vert] = True
+    on_front = np.zeros(len(me.vertices), dtype=bool)
+    on_front[loop_vert[np.repeat(front, loop_total)]] = True
+    return on_front | ~on_face
+
+
+def shows_hidden_vertices(context):
+    """Whether X-ray lets the vertices behind the mesh be seen, and picked"""
+    shading = context.space_data.shading
+    return shading.show_xray_wireframe if shading.type == 'WIREFRAME' else shading.show_xray
+
+
+def project_vertices(context, obj):
+    """Region space coordinates, indices and depths of the pickable vertices that are shown and in the region"""
+    co, hide = vertex_coordinates(obj)
+    matrix = np.array(context.region_data.perspective_matrix @ obj.matrix_world)
+    clip = co @ matrix[:, :3].T + matrix[:, 3]
+    shown = (clip[:, 3] > 1e-6) & ~hide
+    # Without X-ray the far side of the mesh is covered, only vertices on faces facing the view can be picked.
+    if not shows_hidden_vertices(context):
+        shown &= front_facing_vertices(obj, context.region_data)
+    indices = np.flatnonzero(shown)
+    region = context.region
+    size = np.array((region.width, region.height))
+    points = (clip[indices, :2] / clip[indices, 3:] + 1) * 0.5 * size
+    depths = clip[indices, 2] / clip[indices, 3]
+    inside = ((points > -PICK_RADIUS) & (points < size + PICK_RADIUS)).all(axis=1)
+    return points[inside], indices[inside], depths[inside]
+
+
+class SpatialHash:
+    """World space vertices bucketed into cubic cells, for finding all vertices within a radius of a point"""
+
+    def __init__(self, points, indices, cell_size):
+        self.cell_size = cell_size
+        keys = self.cell_keys(np.floor(points / cell_size).astype(np.int64))
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.points = points[order]
+        self.indices = indices[order]
+
+    @staticmethod
+    def cell_keys(cells):
+        # 21 bits per axis, cells that wrap around to the same key only add candidates that get filtered out.
+        cells = cells & 0x1FFFFF
+        return cells[..., 0] << 42 | cells[..., 1] << 21 | cells[..., 2]
+
+    def within(self, point, radius):
+        """Indices of the vertices no further than radius from point, radius may not be more than the cell size"""
+        cell = np.floor(np.asarray(point) / self.cell_size).astype(np.int64)
+        offsets = np.stack(np.meshgrid((-1, 0, 1), (-1, 0, 1), (-1, 0, 1), indexing='ij'), axis=-1).reshape(-1, 3)
+        keys = np.unique(self.cell_keys(cell + offsets))
+        starts = np.searchsorted(self.keys, keys)
+        ends = np.searchsorted(self.keys, keys, side='right')
+        candidates = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+        if not candidates.size:
+            return candidates
+        near = ((self.points[candidates] - point) ** 2).sum(axis=1) <= radius ** 2
+        return self.indices[candidates[near]]
+
 
-    if result == {'PASS_THROUGH'}:
-        bpy.ops.mesh.select_all(action='DESELECT')
+def weld_pairs(bm, pairs):
+    """Merges the source of every pair of vertex indices into its target in a single weld, following chains of
+    pairs to the end"""
+    targets = dict(pairs)
+    targetmap = {}
+    bm.verts.ensure_lookup_table()
+    for source, target in targets.items():
+        while target in targets:
+            target = targets[target]
+        targetmap[bm.verts[source]] = bm.verts[target]
+    bmesh.ops.weld_verts(bm, targetmap=targetmap)
 
 
 class MergeTool(bpy.types.Operator):
@@ -73,68 +268,172 @@ class MergeTool(bpy.types.Operator):
     bl_label = "Merge Tool Operator"
     bl_options = {'REGISTER', 'UNDO'}
 
+    cluster: bpy.props.BoolProperty(
+        name="Cluster",
+        description="Merge every vertex within Radius of the vertex under the mouse into it on click, "
+                    "the mouse wheel sets the radius",
+        default=False)
+
+    radius: bpy.props.FloatProperty(
+        name="Radius",
+        description="How far around the target vertex Cluster merges vertices from, in world space",
+        default=0.1,
+        min=0.0)
+
+    queue: bpy.props.BoolProperty(
+        name="Queue",
+        description="Collect the pairs and merge them all at once, with one undo step, on Enter",
+        default=False)
+
+    record_latency: bpy.props.BoolProperty(
+        name="Record Latency",
+        description="Time how long every event takes to handle, printed to the console when the operator ends",
+        default=False)
+
     def __init__(self):
-        self.start_vertex = None
-        self.end_vertex = None
+        # Vertices are held by index, the selection is left alone.  -1 is no vertex.
+        self.start_index = -1
+        self.end_index = -1
         self.started = False
         self._handle = None
+        self.grid = None
+        self.grid_view = None
+        self.pairs = []
+        self.pair_coords = []
+        self.spatial_hash = None
+        self.world_co = None
+        self.target_index = -1
+        self.cluster_indices = []
+        self.cluster_coords = []
+        self.latency = LatencyRecorder()
+
+    def update_cluster(self, context, event):
+        """Finds the vertex under the mouse and every vertex within radius of it"""
+        self.target_index = self.vertex_under_mouse(context, event)
+        self.cluster_coords = []
+        if self.target_index < 0:
+            return
+        # Cells of the radius rounded up to a power of two, so that most turns of the wheel don't need a new hash.
+        cell_size = 2.0 ** math.ceil(math.log2(max(self.radius, 1e-6)))
+        if self.spatial_hash is None or self.spatial_hash.cell_size != cell_size or \
+                len(self.world_co) != len(self.bm.verts):
+            co, hide = vertex_coordinates(context.object)
+            matrix = np.array(self.world_matrix)
+            self.world_co = co @ matrix[:3, :3].T + matrix[:3, 3]
+            indices = np.flatnonzero(~hide)
+            self.spatial_hash = SpatialHash(self.world_co[indices], indices, cell_size)
+        within = self.spatial_hash.within(self.world_co[self.target_index], self.radius)
+        self.cluster_indices = within.tolist()
+        self.cluster_coords = self.world_co[within].tolist()
+
+    def merge_cluster(self):
+        """Welds the vertices around the target into it"""
+        pairs = [(i, self.target_index) for i in self.cluster_indices if i != self.target_index]
+        if pairs:
+            weld_pairs(self.bm, pairs)
+            bmesh.update_edit_mesh(self.me)
+            bpy.ops.ed.undo_push(message="Merge Tool Cluster")
+        self.spatial_hash = None
+        self.target_index = -1
+        self.cluster_indices = []
+        self.cluster_coords = []
+
+    def queue_pair(self, source, target):
+        """Adds a pair to merge on Enter, unless it would merge the target back into the source"""
+        queued = dict(self.pairs)
+        vertex = target
+        while vertex in queued:
+            vertex = queued[vertex]
+            if vertex == source:
+                self.report({'WARNING'}, "That vertex is already merging into this one")
+                return
+        self.pairs = [pair for pair in self.pairs if pair[0] != source]
+        self.pairs.append((source, target))
+        self.pair_coords = [self.world_matrix @ self.bm.verts[i].co for pair in self.pairs for i in pair]
+
+    def apply_pairs(self):
+        """Merges every queued pair"""
+        weld_pairs(self.bm, self.pairs)
+        bmesh.update_edit_mesh(self.me)
+        self.report({'INFO'}, "Merged %d vertices" % len(self.pairs))
+        self.pairs = []
+        self.pair_coords = []
+
+    def vertex_under_mouse(self, context, event):
+        """Index of the vertex closest to the mouse, or -1, from a grid that is only rebuilt when the view changes"""
+        view = (tuple(map(tuple, context.region_data.perspective_matrix)), tuple(map(tuple, self.world_matrix)),
+                context.region.width, context.region.height, len(self.bm.verts), shows_hidden_vertices(context))
+        if self.grid is None or view != self.grid_view:
+            points, indices, depths = project_vertices(context, context.object)
+            self.grid = ScreenGrid(points, indices, depths, context.region.height)
+            self.grid_view = view
+            self.bm.verts.ensure_lookup_table()
+        return self.grid.nearest(event.mouse_region_x, event.mouse_region_y)
 
     def modal(self, context, event):
+        if not self.record_latency:
+            return self.handle_event(context, event)
+        start = time.perf_counter()
+        result = self.handle_event(context, event)
+        self.latency.record(event.type, time.perf_counter() - start)
+        if not result & {'RUNNING_MODAL', 'PASS_THROUGH'}:
+            print(self.latency.report(self.bl_label))
+            self.report({'INFO'}, self.latency.summary())
+        return result
+
+    def handle_event(self, context, event):
         context.area.tag_redraw()
 
-        if event.type in {'MIDDLEMOUSE', 'WHEELUPMOUSE', 'WHEELDOWNMOUSE'}:
+        if self.cluster and event.type in {'WHEELUPMOUSE', 'WHEELDOWNMOUSE'} and not event.ctrl:
+            self.radius *= 1.25 if event.type == 'WHEELUPMOUSE' else 0.8
+            self.update_cluster(context, event)
+            return {'RUNNING_MODAL'}
+        elif event.type in {'MIDDLEMOUSE', 'WHEELUPMOUSE', 'WHEELDOWNMOUSE'}:
             # allow navigation
             return {'PASS_THROUGH'}
+        elif self.cluster and event.type == 'MOUSEMOVE':
+            self.update_cluster(context, event)
+        elif self.cluster and event.type == 'LEFTMOUSE':
+            if event.value == 'PRESS' and self.target_index >= 0:
+                self.merge_cluster()
+            return {'RUNNING_MODAL'}
         elif event.type == 'MOUSEMOVE':
             if self.started:
-                coord = event.mouse_region_x, event.mouse_region_y
-                bpy.ops.view3d.select(extend=False, location=coord)
-
-                selected_vertex = None
-                for v in self.bm.verts:
-                    if v.select:
-                        selected_vertex = v
-                        break
-
-                if selected_vertex:
-                    self.end_vertex = selected_vertex
-                    self.end_vertex_transformed = self.world_matrix @ self.end_vertex.co
+                hovered_index = self.vertex_under_mouse(context, event)
+                if hovered_index >= 0:
+                    self.end_index = hovered_index
+                    self.end_vertex_transformed = self.world_matrix @ self.bm.verts[hovered_index].co
         elif event.type == 'LEFTMOUSE':
-            main(context, event, self.started)
+            hovered_index = self.vertex_under_mouse(context, event)
             if not self.started:
-                if context.object.data.total_vert_sel == 1:
-                    selected_vertex = None
-                    for v in self.bm.verts:
-                        if v.select:
-                            selected_vertex = v
-                            break
-
-                    if selected_vertex:
-                        self.start_vertex = selected_vertex
-                        self.start_vertex_transformed = self.world_matrix @ self.start_vertex.co
-                    else:
-                        bpy.types.SpaceView3D.draw_handler_remove(self._handle, 'WINDOW')
-                        return {'CANCELLED'}
+                if hovered_index >= 0:
+                    self.start_index = hovered_index
+                    self.start_vertex_transformed = self.world_matrix @ self.bm.verts[hovered_index].co
                     self.started = True
-            elif self.start_vertex is self.end_vertex:
+                return {'RUNNING_MODAL'}
+            if hovered_index >= 0:
+                self.end_index = hovered_index
+            if self.queue:
+                if self.start_index >= 0 and self.end_index >= 0 and self.start_index != self.end_index:
+                    self.queue_pair(self.start_index, self.end_index)
+            elif self.start_index == self.end_index:
                 bpy.types.SpaceView3D.draw_handler_remove(self._handle, 'WINDOW')
                 return {'CANCELLED'}
-            elif self.start_vertex is not None and self.end_vertex is not None:
-                self.start_vertex.select = True
-                self.end_vertex.select = True
-                try:
-                    bpy.ops.mesh.merge(type='LAST')
-                    bpy.ops.ed.undo_push(message="Add an undo step *function may be moved*")
-                except TypeError:
-                    pass
-                finally:
-                    self.start_vertex = None
-                    self.end_vertex = None
-                    self.started = False
+            elif self.start_index >= 0 and self.end_index >= 0:
+                weld_pairs(self.bm, [(self.start_index, self.end_index)])
+                bmesh.update_edit_mesh(self.me)
+                bpy.ops.ed.undo_push(message="Merge Tool")
             else:
                 bpy.types.SpaceView3D.draw_handler_remove(self._handle, 'WINDOW')
                 return {'CANCELLED'}
+            self.start_index = -1
+            self.end_index = -1
+            self.started = False
             return {'RUNNING_MODAL'}
+        elif event.type in {'RET', 'NUMPAD_ENTER'} and event.value == 'PRESS' and self.pairs:
+            bpy.types.SpaceView3D.draw_handler_remove(self._handle, 'WINDOW')
+            self.apply_pairs()
+            return {'FINISHED'}
         elif event.type in {'RIGHTMOUSE', 'ESC'}:
             bpy.types.SpaceView3D.draw_handler_remove(self._handle, 'WINDOW')
             return {'CANCELLED'}
@@ -143,9 +442,10 @@ class MergeTool(bpy.types.Operator):
 
     def invoke(self, context, event):
         if context.space_data.type == 'VIEW_3D':
-            self.start_vertex = None
-            self.end_vertex = None
+            self.start_index = -1
+            self.end_index = -1
             self.started = False
+            self.pairs = []
             self.me = bpy.context.object.data
             self.world_matrix = bpy.context.object.matrix_world
             self.bm = bmesh.from_edit_mesh(self.me)
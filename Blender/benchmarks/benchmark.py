@@ -0,0 +1,190 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Times ContextSelect's traversals on synthetic meshes without Blender and compares them with stored baselines.
+#
+#   python benchmark.py                      run the default sizes and compare with baselines.json
+#   python benchmark.py --sizes 10k,4M       pick the face counts
+#   python benchmark.py --save               store this run as the new baselines
+#   python benchmark.py --check              exit with 1 if anything got slower
+#
+# Each time is the median of --repeat runs.  A result is marked SLOWER when it is more than --tolerance times its
+# baseline and also more than --noise-floor microseconds slower, so jitter on the fast queries doesn't count.
+# Baselines are only comparable on the machine they were recorded on, so without --check this only reports.
+# verify.py checks that the walkers being timed still select what they used to.
+
+import os
+import sys
+import json
+import time
+import types
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import standin
+import generators
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    scale = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def format_size(size):
+    if size >= 1000000 and size % 1000000 == 0:
+        return "%dM" % (size // 1000000)
+    if size >= 1000 and size % 1000 == 0:
+        return "%dk" % (size // 1000)
+    return str(size)
+
+
+# Average seconds per call of func over the items, median of repeat runs.
+def time_calls(func, items, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        times.append((time.perf_counter() - start) / max(1, len(items)))
+    return float(np.median(times))
+
+
+# Pairs of edges a few steps apart on the same loop or ring, for the bounded selections.
+def bounded_pairs(edges, whole, samples):
+    pairs = []
+    for e in edges:
+        path = whole(e)
+        if len(path) > 4:
+            pairs.append((int(path[0]), int(path[len(path) // 2])))
+        if len(pairs) == samples:
+            break
+    return pairs
+
+
+def run_mesh(cs, prefs, kind, size, args):
+    data = generators.make(kind, size)
+    results = {}
+    results["index_build"] = time_calls(lambda _: cs.TopologyIndex.from_mesh(data), [None], args.build_repeat)
+    topo = cs.TopologyIndex.from_mesh(data)
+
+    rng = np.random.default_rng(0)
+    # Rebuilding after a small edit, extruding a few faces.
+    edited = generators.extrude(data, rng.choice(topo.num_faces, 8, replace=False))
+    results["index_repair"] = time_calls(
+        lambda _: cs.build_topology_index(cs.TopologyIndex.mesh_arrays(edited), topo), [None], args.build_repeat)
+    # Loading it back from the disk cache, as on the first click after opening a file.
+    with tempfile.TemporaryDirectory() as folder:
+        cs.save_cached_index(topo, folder, 1 << 40)
+        results["index_load"] = time_calls(
+            lambda _: cs.load_cached_index(folder, cs.TopologyIndex.mesh_arrays(data)), [None], args.build_repeat)
+
+    edges = rng.choice(topo.num_edges, min(args.samples, topo.num_edges), replace=False).tolist()
+    face_edges = [e for e in edges if topo.edge_face_count[e]]
+    results["entire_loop"] = time_calls(lambda e: cs.entire_loop(topo, e), edges, args.repeat)
+    results["entire_ring"] = time_calls(lambda e: cs.entire_ring(topo, e), edges, args.repeat)
+    results["face_loop_from_edge"] = time_calls(lambda e: cs.face_loop_from_edge(topo, e), face_edges, args.repeat)
+    loops = bounded_pairs(edges, lambda e: cs.entire_loop(topo, e), args.samples)
+    rings = bounded_pairs(edges, lambda e: cs.entire_ring(topo, e), args.samples)
+    results["select_bounded_loop"] = time_calls(lambda p: cs.select_bounded_loop(topo, p), loops, args.repeat)
+    results["select_bounded_ring"] = time_calls(lambda p: cs.select_bounded_ring(topo, p), rings, args.repeat)
+
+    # A whole double-click, BMesh wrappers included, for meshes small enough to build them in Python.
+    if size <= args.bmesh_limit:
+        obj = standin.Object(data)
+        bm = standin.bmesh_module().from_edit_mesh(data)
+        context = types.SimpleNamespace(object=obj, preferences=standin.bpy_module().context.preferences,
+                                        tool_settings=types.SimpleNamespace(mesh_select_mode=[False, True, False]))
+
+        mesh_key = cs.get_topology_index(obj, bm).cache_key[0]
+
+        # Every repeat clicks the same edges, drop the cached loops so they are walked each time.
+        def click(e):
+            cs.drop_cached_results(mesh_key)
+            bm.select_history.add(bm.edges[e])
+            bm.select_history.add(bm.edges[e])
+            cs.maya_edge_select(context, obj)
+        results["maya_edge_select"] = time_calls(click, edges[:args.samples // 4], args.build_repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time ContextSelect on synthetic meshes.")
+    parser.add_argument("--sizes", default="10k,100k,1M", help="comma separated face counts, like 10k,1M,4M")
+    parser.add_argument("--kinds", default=",".join(generators.KINDS))
+    parser.add_argument("--samples", type=int, default=200, help="edges to time each query on")
+    parser.add_argument("--repeat", type=int, default=9, help="runs of each query to take the median of")
+    parser.add_argument("--build-repeat", type=int, default=3,
+                        help="runs of the index builds and whole clicks to take the median of")
+    parser.add_argument("--bmesh-limit", type=parse_size, default=parse_size("100k"),
+                        help="largest mesh to time whole clicks on, the Python BMesh stand-in is slow to build")
+    parser.add_argument("--baselines", default=BASELINES)
+    parser.add_argument("--save", action="store_true", help="store the results as the new baselines")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    parser.add_argument("--noise-floor", type=float, default=20.0,
+                        help="microseconds a result may exceed its baseline by before it counts as slower")
+    parser.add_argument("--check", action="store_true", help="exit with 1 if anything got slower")
+    parser.add_argument("--processes", action="store_true",
+                        help="label large indices in worker processes, like the worker_processes preference")
+    args = parser.parse_args()
+
+    cs, prefs = standin.load_addon("ContextSelect.py")
+    prefs.disk_cache = False
+    prefs.worker_processes = args.processes
+    cs.update_process_pool(args.processes)
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+
+    measured = {}
+    regressions = []
+    print("%-14s %6s %-22s %12s %12s" % ("mesh", "faces", "benchmark", "time", "baseline"))
+    for kind in args.kinds.split(","):
+        for size in [parse_size(s) for s in args.sizes.split(",")]:
+            for name, seconds in run_mesh(cs, prefs, kind, size, args).items():
+                key = "%s/%s/%s" % (kind, format_size(size), name)
+                measured[key] = seconds
+                baseline = baselines.get(key)
+                flag = ""
+                if (baseline is not None and seconds > baseline * args.tolerance
+                        and (seconds - baseline) * 1e6 > args.noise_floor):
+                    regressions.append(key)
+                    flag = "  SLOWER"
+                print("%-14s %6s %-22s %10.1fus %10s%s" % (
+                    kind, format_size(size), name, seconds * 1e6,
+                    "-" if baseline is None else "%.1fus" % (baseline * 1e6), flag))
+
+    if args.save:
+        baselines.update(measured)
+        with open(args.baselines, "w") as f:
+            json.dump(baselines, f, indent=1, sort_keys=True)
+        print("Saved %d baselines to %s" % (len(measured), args.baselines))
+    if regressions:
+        print("%d benchmarks are more than %.1fx slower than their baseline." % (len(regressions), args.tolerance))
+        if args.check:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Synthetic meshes for the benchmarks, built straight into MeshData arrays so that millions of faces only take
+# a moment.  Only the connectivity is generated, none of the code under test looks at coordinates.
+
+import math
+import numpy as np
+from standin import MeshData
+
+
+# Faces come in blocks of equal valence, an array of shape (faces, corners) each.  Edges are numbered in
+# vertex pair order.
+def _mesh(num_verts, blocks, wires=()):
+    loop_vert = np.concatenate([b.ravel() for b in blocks]).astype(np.int64)
+    loop_next = np.concatenate([np.roll(b, -1, axis=1).ravel() for b in blocks]).astype(np.int64)
+    face_loop_total = np.concatenate([np.full(len(b), b.shape[1], dtype=np.int32) for b in blocks])
+    return _from_loops(num_verts, loop_vert, loop_next, face_loop_total, np.asarray(wires, dtype=np.int64))
+
+
+def _from_loops(num_verts, loop_vert, loop_next, face_loop_total, wires):
+    keys = np.minimum(loop_vert, loop_next) * num_verts + np.maximum(loop_vert, loop_next)
+    wires = wires.reshape(-1, 2)
+    wire_keys = wires.min(axis=1) * num_verts + wires.max(axis=1)
+    unique, inverse = np.unique(np.concatenate((keys, wire_keys)), return_inverse=True)
+    edge_verts = np.stack((unique // num_verts, unique % num_verts), axis=1)
+    face_loop_start = np.zeros(len(face_loop_total), dtype=np.int32)
+    np.cumsum(face_loop_total[:-1], out=face_loop_start[1:])
+    return MeshData(num_verts, edge_verts, loop_vert, inverse[:len(keys)], face_loop_start, face_loop_total)
+
+
+def _quads(rows, cols, wrap_rows=False, wrap_cols=False, offset=0):
+    vert_cols = cols if wrap_cols else cols + 1
+    vert_rows = rows if wrap_rows else rows + 1
+    r, c = np.meshgrid(np.arange(rows), np.arange(cols), indexing='ij')
+    r1 = (r + 1) % vert_rows
+    c1 = (c + 1) % vert_cols
+    quads = np.stack((r * vert_cols + c, r * vert_cols + c1, r1 * vert_cols + c1, r1 * vert_cols + c), axis=-1)
+    return quads.reshape(-1, 4) + offset, vert_rows * vert_cols
+
+
+# A flat nx by ny grid of quads, with a border all around.
+def grid(nx, ny):
+    quads, num_verts = _quads(ny, nx)
+    return _mesh(num_verts, [quads])
+
+
+# A torus of nu by nv quads, no border and every loop and ring infinite.
+def torus(nu, nv):
+    quads, num_verts = _quads(nu, nv, wrap_rows=True, wrap_cols=True)
+    return _mesh(num_verts, [quads])
+
+
+# A UV sphere: rings - 2 bands of quads and a fan of triangles around each pole.
+def uv_sphere(segments, rings):
+    quads, num_band_verts = _quads(rings - 2, segments, wrap_cols=True, offset=1)
+    top = 0
+    bottom = num_band_verts + 1
+    s = np.arange(segments)
+    last = 1 + (rings - 2) * segments
+    top_fan = np.stack((np.full(segments, top), 1 + (s + 1) % segments, 1 + s), axis=1)
+    bottom_fan = np.stack((np.full(segments, bottom), last + s, last + (s + 1) % segments), axis=1)
+    return _mesh(num_band_verts + 2, [quads, top_fan, bottom_fan])
+
+
+# An open tube of quads with its ends closed by one n-gon each, or by triangle fans around a centre vertex.
+def cylinder(segments, rings, caps='NGON'):
+    quads, num_verts = _quads(rings, segments, wrap_cols=True)
+    s = np.arange(segments)
+    last = rings * segments
+    if caps == 'NGON':
+        return _mesh(num_verts, [quads, s[::-1].reshape(1, -1), (last + s).reshape(1, -1)])
+    bottom_fan = np.stack((np.full(segments, num_verts), (s + 1) % segments, s), axis=1)
+    top_fan = np.stack((np.full(segments, num_verts + 1), last + s, last + (s + 1) % segments), axis=1)
+    return _mesh(num_verts + 2, [quads, bottom_fan, top_fan])
+
+
+# Adds a quad standing on each of the given edges, which makes those edges non-manifold.
+def add_fins(data, edges):
+    edges = np.asarray(edges, dtype=np.int64)
+    n = data.num_verts
+    new_verts = n + np.arange(len(edges) * 2).reshape(-1, 2)
+    a = data.edge_verts[edges, 0]
+    b = data.edge_verts[edges, 1]
+    fins = np.stack((a, b, new_verts[:, 1], new_verts[:, 0]), axis=1)
+    return _extend(data, n + len(edges) * 2, fins, [])
+
+
+# Adds count wire edges: chains of segments loose edges that hang off vertices of the mesh.
+def add_wires(data, count, segments=4, seed=0):
+    rng = np.random.default_rng(seed)
+    n = data.num_verts
+    anchors = rng.integers(0, n, count)
+    chains = n + np.arange(count * segments).reshape(count, segments)
+    points = np.concatenate((anchors[:, None], chains), axis=1)
+    wires = np.stack((points[:, :-1], points[:, 1:]), axis=-1).reshape(-1, 2)
+    return _extend(data, n + count * segments, np.zeros((0, 4), dtype=np.int64), wires)
+
+
+# Extrudes the given faces the way Blender appends what an extrude adds: each face moves onto new vertices
+# and gets a quad standing on each of its old edges.  Unlike the other generators this keeps the indices of
+# everything that was already there, as edits in edit mode do.
+def extrude(data, faces):
+    faces = np.asarray(faces, dtype=np.int64)
+    counts = data.face_loop_total[faces].astype(np.int64)
+    starts = data.face_loop_start[faces].astype(np.int64)
+    first = np.repeat(np.cumsum(counts) - counts, counts)
+    offset = np.arange(counts.sum()) - first
+    size = np.repeat(counts, counts)
+    corners = np.repeat(starts, counts) + offset
+    following = first + (offset + 1) % size
+
+    num_corners = len(corners)
+    num_edges = len(data.edge_verts)
+    old_vert = data.loop_vert[corners].astype(np.int64)
+    old_edge = data.loop_edge[corners].astype(np.int64)
+    new_vert = data.num_verts + np.arange(num_corners)
+    top_edge = num_edges + np.arange(num_corners)
+    side_edge = num_edges + num_corners + np.arange(num_corners)
+    edge_verts = np.concatenate((data.edge_verts, np.stack((new_vert, new_vert[following]), axis=1),
+                                 np.stack((old_vert, new_vert), axis=1)))
+
+    loop_vert = data.loop_vert.astype(np.int64)
+    loop_edge = data.loop_edge.astype(np.int64)
+    loop_vert[corners] = new_vert
+    loop_edge[corners] = top_edge
+    side_verts = np.stack((old_vert, old_vert[following], new_vert[following], new_vert), axis=1)
+    side_edges = np.stack((old_edge, side_edge[following], top_edge, side_edge), axis=1)
+    face_loop_start = np.concatenate((data.face_loop_start, len(loop_vert) + 4 * np.arange(num_corners)))
+    face_loop_total = np.concatenate((data.face_loop_total, np.full(num_corners, 4)))
+    return MeshData(data.num_verts + num_corners, edge_verts.astype(np.int32),
+                    np.concatenate((loop_vert, side_verts.ravel())).astype(np.int32),
+                    np.concatenate((loop_edge, side_edges.ravel())).astype(np.int32),
+                    face_loop_start.astype(np.int32), face_loop_total.astype(np.int32))
+
+
+def _extend(data, num_verts, faces, wires):
+    loop_next = np.arange(len(data.loop_vert)) + 1
+    ends = data.face_loop_start + data.face_loop_total - 1
+    loop_next[ends] = data.face_loop_start
+    loop_vert = np.concatenate((data.loop_vert, faces.ravel())).astype(np.int64)
+    loop_next = np.concatenate((data.loop_vert[loop_next], np.roll(faces, -1, axis=1).ravel())).astype(np.int64)
+    face_loop_total = np.concatenate((data.face_loop_total, np.full(len(faces), faces.shape[1], dtype=np.int32)))
+    has_faces = np.bincount(data.loop_edge, minlength=len(data.edge_verts)) > 0
+    old_wires = data.edge_verts[~has_faces].astype(np.int64)
+    wires = np.concatenate((old_wires, np.asarray(wires, dtype=np.int64).reshape(-1, 2)))
+    return _from_loops(num_verts, loop_vert, loop_next, face_loop_total, wires)
+
+
+# The kinds of mesh the benchmarks run on, each sized to roughly num_faces faces.
+def make(kind, num_faces):
+    side = max(3, int(math.sqrt(num_faces)))
+    if kind == 'grid':
+        return grid(side, side)
+    if kind == 'torus':
+        return torus(side, side)
+    if kind == 'sphere':
+        rings = max(3, int(math.sqrt(num_faces / 2)))
+        return uv_sphere(rings * 2, rings)
+    if kind == 'cylinder_ngon':
+        return cylinder(side, side, caps='NGON')
+    if kind == 'cylinder_tris':
+        return cylinder(side, side, caps='TRIS')
+    if kind == 'fins':
+        data = grid(side, side)
+        return add_fins(data, np.arange(0, len(data.edge_verts), max(1, len(data.edge_verts) // 64)))
+    if kind == 'wires':
+        return add_wires(grid(side, side), max(1, num_faces // 1000))
+    raise ValueError("Unknown mesh kind: " + kind)
+
+
+KINDS = ('grid', 'torus', 'sphere', 'cylinder_ngon', 'cylinder_tris', 'fins', 'wires')
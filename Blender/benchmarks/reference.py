@@ -0,0 +1,325 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# The BMesh walkers ContextSelect used before it had a TopologyIndex, kept as the reference its array walkers
+# are checked against by verify.py.  They run on the stand-in BMesh and read their preferences from the
+# module level prefs instead of bpy, otherwise they are unchanged.
+
+import types
+
+prefs = types.SimpleNamespace(allow_non_quads_at_ends=True, terminate_self_intersects=False,
+                              boundary_ignore_wires=True)
+
+
+# Takes a vertex and return a set of indicies for adjacent vertices.
+def get_neighbour_verts(vertex):
+    edges = vertex.link_edges[:]
+    relevant_neighbour_verts = {v.index for e in edges for v in e.verts[:] if v != vertex}
+    return relevant_neighbour_verts
+
+
+# Takes a face and return a set of indicies for connected faces.
+def get_neighbour_faces(face):
+    face_edges = face.edges[:]
+    relevant_neighbour_faces = {f.index for e in face_edges for f in e.link_faces[:] if f != face}
+    return relevant_neighbour_faces
+
+
+# Takes an edge and return a set of indicies for nearby edges.
+# Will return some 'oddball' or extra edges if connected topology is triangles or poles.
+# This is no worse than the old bpy.ops.mesh.select_more(use_face_step=True) method (slightly better, even).
+def get_neighbour_edges(edge):
+    edge_loops = edge.link_loops[:]
+    edge_faces = edge.link_faces[:]  # Check here for more than 2 connected faces?
+    face_edges = {e for f in edge_faces for e in f.edges[:]}
+
+    if len(edge_loops) == 0:
+        ring_edges = []
+    # For the next 2 elif checks, link_loop hopping is only technically accurate for quads.
+    elif len(edge_loops) == 1:
+        ring_edges = [edge_loops[0].link_loop_radial_next.link_loop_next.link_loop_next.edge.index]
+    elif len(edge_loops) > 1:
+        ring_edges = [edge_loops[0].link_loop_radial_next.link_loop_next.link_loop_next.edge.index,
+                      edge_loops[1].link_loop_radial_next.link_loop_next.link_loop_next.edge.index]
+    # loop_edges returns a lot of edges if 1 vert connected to a pole, such as the cap of a UV Sphere.
+    # e not in face_edges coincidentally removes the starting edge which is what we wanted anyway.
+    loop_edges = [e.index for v in edge.verts for e in v.link_edges[:] if e not in face_edges]
+
+    relevant_neighbour_edges = set(ring_edges + loop_edges)
+    return relevant_neighbour_edges
+
+
+# Takes a boundary edge and returns a set of indices for other boundary edges
+# that are contiguous with it in the same boundary "loop".
+def get_boundary_edge_loop(edge):
+    cur_edges = [edge]
+    final_selection = set()
+    visited_verts = set()
+    while True:
+        for e in cur_edges:
+            final_selection.add(e.index)
+        edge_verts = {v for e in cur_edges for v in e.verts[:]}
+        if not prefs.boundary_ignore_wires:
+            new_edges = []
+            for v in edge_verts:
+                if v.index not in visited_verts:
+                    linked_edges = v.link_edges[:]
+                    for e in linked_edges:
+                        if not any([e for e in linked_edges if e.is_wire]):
+                            if e.is_boundary and e.index not in final_selection:
+                                new_edges.append(e)
+                visited_verts.add(v.index)
+        elif prefs.boundary_ignore_wires:
+            new_edges = [e for v in edge_verts for e in v.link_edges[:]
+                         if e.is_boundary and e.index not in final_selection]
+
+        if len(new_edges) == 0:
+            break
+        else:
+            cur_edges = new_edges
+    return final_selection
+
+
+# Takes an edge and returns a loop of face indices (as a set) for the ring direction of that edge.
+def face_loop_from_edge(edge):
+    loop = edge.link_loops[0]
+    first_loop = loop
+    cur_loop = loop
+    face_list = set()  # Checking for membership in sets is faster than lists []
+    going_forward = True
+    dead_end = False
+    while True:
+        # Jump to next loop on the same edge and walk two loops forward (opposite edge)
+        next_loop = cur_loop.link_loop_radial_next.link_loop_next.link_loop_next
+
+        next_face = next_loop.face
+        if next_face.index in face_list and prefs.terminate_self_intersects:
+            dead_end = True
+        elif next_face.index not in face_list:
+            if len(next_face.verts) == 4:
+                face_list.add(next_face.index)
+            elif len(next_face.verts) != 4 and prefs.allow_non_quads_at_ends:
+                face_list.add(next_face.index)
+
+        # If this is true then we've looped back to the beginning and are done
+        if next_loop == first_loop:
+            break
+        # If we reach a dead end because the next face is a tri or n-gon, or the next edge is boundary or nonmanifold.
+        elif len(next_face.verts) != 4 or len(next_loop.edge.link_faces) != 2 or dead_end:
+            # If going_forward then this is the first dead end and we want to go the other way
+            if going_forward:
+                going_forward = False
+                dead_end = False
+                # Return to the starting edge and go the other way
+                if len(edge.link_loops) > 1:
+                    next_loop = edge.link_loops[1]
+                else:
+                    break
+            # If not going_forward then this is the last dead end and we're done
+            else:
+                break
+        # Run this part always
+        cur_loop = next_loop
+    return face_list
+
+
+# ##################### Loopanar defs ##################### #
+
+def loop_extension(edge, vert):
+    candidates = vert.link_edges[:]
+    # For certain topology link_edges and link_loops return different numbers.
+    # So we have to use link_loops for our length test, otherwise somehow we get stuck in an infinite loop.
+    if len(vert.link_loops) == 4 and vert.is_manifold:
+        cruft = [edge]  # The next edge obviously can't be the current edge.
+        for l in edge.link_loops:
+            # The 'next' and 'prev' edges are perpendicular to the desired loop so we don't want them.
+            cruft.extend([l.link_loop_next.edge, l.link_loop_prev.edge])
+        # Therefore by process of elimination there are 3 unwanted edges in cruft and only 1 possible edge left.
+        return [e for e in candidates if e not in cruft][0]
+    else:
+        return
+
+
+def loop_end(edge):
+    # What's going on here?  This looks like it's assigning both vertices at once from the edge.verts
+    v1, v2 = edge.verts[:]
+    # And returns only one of them dependong on the result from loop_extension?
+    return not loop_extension(edge, v1) or not loop_extension(edge, v2)
+
+
+def ring_extension(edge, face):
+    if len(face.verts) == 4:
+        # Get the only 2 verts that are not in the edge we start with.
+        target_verts = [v for v in face.verts if v not in edge.verts]
+        # Return the only edge that corresponds to those two verts back to partial_ring.
+        return [e for e in face.edges if target_verts[0] in e.verts and target_verts[1] in e.verts][0]
+    else:
+        # Otherwise the face isn't a quad.. return nothing to partial_ring.
+        return
+
+
+def ring_end(edge):
+    faces = edge.link_faces[:]
+    border = len(faces) == 1  # If only one face is connected then this edge must be the border of the mesh.
+    non_manifold = len(faces) > 2  # In manifold geometry one edge can only be connected to two faces.
+    dead_ends = map(lambda x: len(x.verts) != 4, faces)
+    return border or non_manifold or any(dead_ends)
+
+
+def entire_loop(edge):
+    e = edge
+    v = edge.verts[0]
+    loop = [edge]
+    going_forward = True
+    while True:
+        ext = loop_extension(e, v)  # Pass the edge and its starting vert to loop_extension
+        if ext:  # If loop_extension returns an edge, keep going.
+            if going_forward:
+                if ext == edge:  # infinite; we've reached our starting edge and are done
+                    # Why are we returning the loop and edge twice?  Loop already has edge in it.  Why not just loop?
+                    return [edge] + loop + [edge]
+                else:  # continue forward
+                    loop.append(ext)
+            else:  # continue backward
+                loop.insert(0, ext)
+            v = ext.other_vert(v)
+            e = ext
+        else:  # finite and we've reached an end
+            if going_forward:  # the first end
+                going_forward = False
+                e = edge
+                v = edge.verts[1]
+            else:  # the other end
+                return loop  # Return the completed partial loop
+
+
+def partial_ring(edge, face):
+    part_ring = []
+    e, f = edge, face
+    while True:
+        ext = ring_extension(e, f)  # Pass the edge and face to ring_extension
+        if not ext:
+            break
+        part_ring.append(ext)
+        if ext == edge:  # infinite; we've reached our starting edge and are done
+            break
+        if ring_end(ext):  # Pass the edge returned from ring_extension to check if it is the end.
+            break
+        else:
+            f = [x for x in ext.link_faces if x != f][0]
+            e = ext
+    return part_ring  # return partial ring to entire_ring
+
+
+def entire_ring(edge):
+    fs = edge.link_faces  # Get faces connected to this edge.
+    ring = [edge]
+    # First check to see if there is ANY face connected to the edge (because Blender allows for floating edges.
+    # If there's at least 1 face, then make sure only 2 faces are connected to 1 edge (manifold geometry) to continue.
+    if len(fs) and len(fs) < 3:
+        # ne must stand for Next Edge? Take the edge from the input, and a face from fs and pass it to partial_ring..
+        dirs = [ne for ne in [partial_ring(edge, f) for f in fs] if ne]
+        if dirs:
+            if len(dirs) == 2 and set(dirs[0]) != set(dirs[1]):
+                [ring.insert(0, e) for e in dirs[1]]
+            ring.extend(dirs[0])
+    return ring  # return ring back to complete_associated_rings
+
+
+def complete_associated_loops(edges):
+    loops = []
+    for e in edges:
+        if not any([e in l for l in loops]):
+            loops.append(entire_loop(e))
+    return loops
+
+
+def complete_associated_rings(edges):
+    rings = []
+    for e in edges:
+        # At first glance this line doesn't seem to matter because rings is empty but once we start
+        # adding rings to it then I believe it's needed to prevent duplicates (why not a set?)
+        if not any([e in r for r in rings]):
+            rings.append(entire_ring(e))
+    return rings  # return rings back to select_bounded_ring
+
+
+def group_unselected(edges, ends):
+    gaps = [[]]
+    for e in edges:
+        # if not e.select:  # We don't care about what's already selected.
+        if e not in ends:  # We only care about the gap between the two ends that we used to start the selection.
+            gaps[-1].extend([e])
+        else:
+            gaps.append([])
+    return [g for g in gaps if g != []]
+
+
+# Takes two separated loop edges and returns a set of indices for edges in the shortest loop between them.
+def select_bounded_loop(edges):
+    for l in complete_associated_loops(edges):
+        gaps = group_unselected(l, edges)
+        new_sel = set()
+        if l[0] == l[-1]:  # loop is infinite
+            sg = sorted(gaps,
+                        key = lambda x: len(x),
+                        reverse = True)
+            if len(sg) > 1 and len(sg[0]) > len(sg[1]):  # single longest gap
+                final_gaps = sg[1:]
+            else:
+                final_gaps = sg
+        else:  # loop is finite
+            tails = [g for g in gaps if any(map(lambda x: loop_end(x), g))]
+            nontails = [g for g in gaps if g not in tails]
+            if nontails:
+                final_gaps = nontails
+            else:
+                final_gaps = gaps
+        for g in final_gaps:
+            for e in g:
+                new_sel.add(e.index)
+    return new_sel
+
+
+# Takes two separated ring edges and returns a set of indices for edges in the shortest ring between them.
+def select_bounded_ring(edges):
+    for r in complete_associated_rings(edges):
+        gaps = group_unselected(r, edges)
+        new_sel = set()
+        if r[0] == r[-1]:  # ring is infinite
+            sg = sorted(gaps,
+                        key = lambda x: len(x),
+                        reverse = True)
+            if len(sg) > 1 and len(sg[0]) > len(sg[1]):  # single longest gap
+                final_gaps = sg[1:]
+            else:  # Otherwise the lengths must be identical and there is no single longest gap?
+                final_gaps = sg
+        else:  # ring is finite
+            # Tails = any group of unselected edges starting at one of the starting edges
+            # and extending all the way to a dead end.
+            tails = [g for g in gaps if any(map(lambda x: ring_end(x), g))]
+            nontails = [g for g in gaps if g not in tails]  # Any group between the edges in starting edges.
+            if nontails:
+                final_gaps = nontails
+            else:
+                final_gaps = gaps
+        for g in final_gaps:
+            for e in g:
+                new_sel.add(e.index)
+    return new_sel
+
@@ -0,0 +1,405 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Just enough of bpy and bmesh to load and run ContextSelect outside of Blender.
+# MeshData stands in for a Mesh datablock and is backed by NumPy arrays, so it scales to millions of faces.
+# BMesh builds the BMVert/BMEdge/BMFace/BMLoop wrappers from it in pure Python, with the link_* attributes
+# and is_* properties behaving like the real ones, for code that still needs to walk elements.
+
+import os
+import sys
+import types
+import tempfile
+import importlib.util
+import numpy as np
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ##################### Mesh datablock ##################### #
+
+class _Collection:
+    def __init__(self, length, attributes):
+        self._length = length
+        self._attributes = attributes
+
+    def __len__(self):
+        return self._length
+
+    def foreach_get(self, attr, out):
+        out[:] = self._attributes[attr]()
+
+
+class MeshData:
+    def __init__(self, num_verts, edge_verts, loop_vert, loop_edge, face_loop_start, face_loop_total):
+        self.name = "Mesh"
+        self.num_verts = num_verts
+        self.edge_verts = np.asarray(edge_verts, dtype=np.int32).reshape(-1, 2)
+        self.loop_vert = np.asarray(loop_vert, dtype=np.int32)
+        self.loop_edge = np.asarray(loop_edge, dtype=np.int32)
+        self.face_loop_start = np.asarray(face_loop_start, dtype=np.int32)
+        self.face_loop_total = np.asarray(face_loop_total, dtype=np.int32)
+        self.edge_seam = np.zeros(len(self.edge_verts), dtype=bool)
+        self.vertices = _Collection(num_verts, {})
+        self.edges = _Collection(len(self.edge_verts), {"vertices": self.edge_verts.ravel,
+                                                        "select": lambda: self._edit_select("edges"),
+                                                        "use_seam": lambda: self.edge_seam})
+        self.loops = _Collection(len(self.loop_vert), {"vertex_index": lambda: self.loop_vert,
+                                                       "edge_index": lambda: self.loop_edge})
+        self.polygons = _Collection(len(self.face_loop_start), {"loop_start": lambda: self.face_loop_start,
+                                                                "loop_total": lambda: self.face_loop_total,
+                                                                "select": lambda: self._edit_select("faces")})
+
+    @property
+    def num_faces(self):
+        return len(self.face_loop_start)
+
+    def as_pointer(self):
+        return id(self)
+
+    # Selection as last synced from the edit BMesh, if there is one.
+    def _edit_select(self, kind):
+        bm = _edit_meshes.get(id(self))
+        if bm is None:
+            return False
+        return [elem.select for elem in getattr(bm, kind)]
+
+    # Builds the mesh from a list of faces (vertex index tuples) plus extra loose edges.  Edges are numbered
+    # in the order they are first met, the way BMesh creates them.
+    @classmethod
+    def from_faces(cls, num_verts, faces, wires=()):
+        lookup = {}
+        edge_verts = []
+        loop_vert = []
+        loop_edge = []
+        face_loop_start = []
+        face_loop_total = []
+
+        def get_edge(a, b):
+            key = (min(a, b), max(a, b))
+            if key not in lookup:
+                lookup[key] = len(edge_verts)
+                edge_verts.append((a, b))
+            return lookup[key]
+
+        for face in faces:
+            face_loop_start.append(len(loop_vert))
+            face_loop_total.append(len(face))
+            for k, v in enumerate(face):
+                loop_vert.append(v)
+                loop_edge.append(get_edge(v, face[(k + 1) % len(face)]))
+        for a, b in wires:
+            get_edge(a, b)
+        return cls(num_verts, np.array(edge_verts, dtype=np.int32).reshape(-1, 2), loop_vert, loop_edge,
+                   face_loop_start, face_loop_total)
+
+
+class Object:
+    def __init__(self, data, name="Mesh"):
+        self.data = data
+        self.name = name
+        self.type = 'MESH'
+        self.mode = 'EDIT'
+
+    def update_from_editmode(self):
+        return True
+
+
+# ##################### BMesh ##################### #
+
+class BMLoop:
+    __slots__ = ("index", "vert", "edge", "face", "link_loop_next", "link_loop_prev",
+                 "link_loop_radial_next", "link_loop_radial_prev")
+
+
+class BMVert:
+    def __init__(self, index):
+        self.index = index
+        self.link_edges = []
+        self.link_loops = []
+        self.select = False
+        self.hide = False
+
+    @property
+    def link_faces(self):
+        return [l.face for l in self.link_loops]
+
+    @property
+    def is_wire(self):
+        return bool(self.link_edges) and all(e.is_wire for e in self.link_edges)
+
+    @property
+    def is_boundary(self):
+        return any(e.is_boundary for e in self.link_edges)
+
+    # A port of BM_vert_is_manifold.
+    @property
+    def is_manifold(self):
+        if not self.link_edges:
+            return False
+        loop_num = 0
+        boundary_num = 0
+        l_first = self.link_edges[0].link_loops[0] if self.link_edges[0].link_loops else None
+        for e in self.link_edges:
+            if len(e.link_loops) == 0 or len(e.link_loops) > 2:
+                return False
+            if e.link_loops[0].vert is self:
+                loop_num += 1
+            if not e.is_boundary:
+                if e.link_loops[1].vert is self:
+                    loop_num += 1
+            else:
+                l_first = e.link_loops[0]
+                boundary_num += 1
+                if boundary_num == 3:
+                    return False
+        e_prev = l_first.edge
+        l_first = l_first if l_first.vert is self else l_first.link_loop_next
+        l_iter = l_first
+        region = 0
+        while True:
+            region += 1
+            e_next = l_iter.link_loop_prev.edge if l_iter.edge is e_prev else l_iter.edge
+            if len(e_next.link_loops) != 2:
+                break
+            e_prev = e_next
+            l_here = l_iter if l_iter.edge is e_next else l_iter.link_loop_prev
+            l_radial = l_here.link_loop_radial_next
+            l_iter = l_radial if l_radial.vert is self else l_radial.link_loop_next
+            if l_iter is l_first:
+                break
+        return loop_num == region
+
+
+class BMEdge:
+    def __init__(self, index, v1, v2):
+        self.index = index
+        self.verts = (v1, v2)
+        self.link_loops = []
+        self._select = False
+        self.hide = False
+
+    # Like BM_edge_select_set, selecting an edge selects its vertices.
+    @property
+    def select(self):
+        return self._select
+
+    @select.setter
+    def select(self, value):
+        self._select = value
+        if value:
+            for v in self.verts:
+                v.select = True
+
+    @property
+    def link_faces(self):
+        return [l.face for l in self.link_loops]
+
+    @property
+    def is_wire(self):
+        return len(self.link_loops) == 0
+
+    @property
+    def is_boundary(self):
+        return len(self.link_loops) == 1
+
+    @property
+    def is_manifold(self):
+        return len(self.link_loops) == 2
+
+    def other_vert(self, vert):
+        if vert is self.verts[0]:
+            return self.verts[1]
+        if vert is self.verts[1]:
+            return self.verts[0]
+        return None
+
+
+class BMFace:
+    def __init__(self, index):
+        self.index = index
+        self.loops = []
+        self._select = False
+        self.hide = False
+
+    # Like BM_face_select_set, selecting a face selects its edges and vertices.
+    @property
+    def select(self):
+        return self._select
+
+    @select.setter
+    def select(self, value):
+        self._select = value
+        if value:
+            for l in self.loops:
+                l.edge.select = True
+
+    @property
+    def verts(self):
+        return [l.vert for l in self.loops]
+
+    @property
+    def edges(self):
+        return [l.edge for l in self.loops]
+
+
+class BMElemSeq(list):
+    def index_update(self):
+        for i, elem in enumerate(self):
+            elem.index = i
+
+    def ensure_lookup_table(self):
+        pass
+
+
+class BMEditSelection(list):
+    @property
+    def active(self):
+        return self[-1] if self else None
+
+    def add(self, elem):
+        if elem in self:
+            self.remove(elem)
+        self.append(elem)
+
+
+class BMesh:
+    def __init__(self, data):
+        self.verts = BMElemSeq(BMVert(i) for i in range(data.num_verts))
+        self.edges = BMElemSeq()
+        self.faces = BMElemSeq()
+        self.select_history = BMEditSelection()
+        self.is_valid = True
+
+        for i, (a, b) in enumerate(data.edge_verts.tolist()):
+            e = BMEdge(i, self.verts[a], self.verts[b])
+            self.edges.append(e)
+            self.verts[a].link_edges.append(e)
+            self.verts[b].link_edges.append(e)
+
+        loop_vert = data.loop_vert.tolist()
+        loop_edge = data.loop_edge.tolist()
+        for fi, (start, total) in enumerate(zip(data.face_loop_start.tolist(), data.face_loop_total.tolist())):
+            f = BMFace(fi)
+            for li in range(start, start + total):
+                l = BMLoop()
+                l.index = li
+                l.vert = self.verts[loop_vert[li]]
+                l.edge = self.edges[loop_edge[li]]
+                l.face = f
+                f.loops.append(l)
+                l.vert.link_loops.append(l)
+                l.edge.link_loops.append(l)
+            for k, l in enumerate(f.loops):
+                l.link_loop_next = f.loops[(k + 1) % total]
+                l.link_loop_prev = f.loops[k - 1]
+            self.faces.append(f)
+
+        for e in self.edges:
+            for k, l in enumerate(e.link_loops):
+                l.link_loop_radial_next = e.link_loops[(k + 1) % len(e.link_loops)]
+                l.link_loop_radial_prev = e.link_loops[k - 1]
+
+    def select_flush_mode(self):
+        pass
+
+    def free(self):
+        self.is_valid = False
+
+
+# ##################### bpy ##################### #
+
+class _Addons(dict):
+    def __missing__(self, key):
+        addon = types.SimpleNamespace(preferences=types.SimpleNamespace())
+        self[key] = addon
+        return addon
+
+
+def _persistent(func):
+    return func
+
+
+# Registers fake bpy and bmesh modules.  Property definitions return their keyword arguments so that the
+# defaults of an addon's preferences can be read back by load_addon.
+def install():
+    if "bpy" in sys.modules and not getattr(sys.modules["bpy"], "is_standin", False):
+        raise RuntimeError("bpy is already loaded, the stand-in is only meant for running outside Blender")
+    bpy = types.ModuleType("bpy")
+    bpy.is_standin = True
+    bpy.types = types.SimpleNamespace(AddonPreferences=object, Operator=object, Menu=object, Panel=object,
+                                      Object=Object, Mesh=MeshData, SpaceView3D=types.SimpleNamespace())
+    property_type = lambda **kwargs: kwargs
+    bpy.props = types.SimpleNamespace(BoolProperty=property_type, IntProperty=property_type,
+                                      FloatProperty=property_type, EnumProperty=property_type,
+                                      StringProperty=property_type, PointerProperty=property_type,
+                                      FloatVectorProperty=property_type)
+    bpy.context = types.SimpleNamespace(preferences=types.SimpleNamespace(addons=_Addons()),
+                                        tool_settings=types.SimpleNamespace(mesh_select_mode=[False, True, False]))
+    bpy.utils = types.SimpleNamespace(register_class=lambda cls: None, unregister_class=lambda cls: None,
+                                      user_resource=lambda resource_type, *args, **kwargs: tempfile.gettempdir())
+    bpy.path = types.SimpleNamespace(abspath=os.path.abspath)
+    bpy.app = types.SimpleNamespace(handlers=types.SimpleNamespace(depsgraph_update_post=[], load_post=[],
+                                                                   save_post=[], persistent=_persistent),
+                                    tempdir="")
+    bpy.ops = types.SimpleNamespace()
+
+    bmesh = types.ModuleType("bmesh")
+    bmesh.types = types.SimpleNamespace(BMesh=BMesh, BMVert=BMVert, BMEdge=BMEdge, BMFace=BMFace, BMLoop=BMLoop)
+    bmesh.update_edit_mesh = lambda me, *args, **kwargs: None
+    bmesh.from_edit_mesh = _from_edit_mesh
+    sys.modules["bpy"] = bpy
+    sys.modules["bmesh"] = bmesh
+    return bpy
+
+
+def bpy_module():
+    return sys.modules["bpy"]
+
+
+def bmesh_module():
+    return sys.modules["bmesh"]
+
+
+_edit_meshes = {}
+
+
+def _from_edit_mesh(me):
+    bm = _edit_meshes.get(id(me))
+    if bm is None or not bm.is_valid:
+        bm = _edit_meshes[id(me)] = BMesh(me)
+    return bm
+
+
+# Loads an addon file from the Blender folder with the stand-in in place and fills in its preference
+# defaults.  Returns the module and its preferences, which can be changed to try other settings.
+def load_addon(file_name, module_name=None):
+    bpy = install()
+    module_name = module_name or os.path.splitext(file_name)[0]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(ADDON_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    # Blender keeps addons in sys.modules too, pickling functions for worker processes relies on it.
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    prefs = bpy.context.preferences.addons[module_name].preferences
+    for cls in getattr(module, "classes", []):
+        if getattr(cls, "bl_idname", None) == module_name:
+            for name, prop in getattr(cls, "__annotations__", {}).items():
+                if isinstance(prop, dict) and "default" in prop:
+                    setattr(prefs, name, prop["default"])
+    return module, prefs
@@ -0,0 +1,128 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Checks ContextSelect's array walkers against the BMesh walkers in reference.py, on the benchmark meshes at a
+# small size and for every combination of the walking preferences.
+#
+#   python verify.py                     check every kind of mesh
+#   python verify.py --kinds grid,fins   pick the kinds
+#
+# Exits with 1 if any walker disagrees with its reference.  Two differences are on purpose and skipped: face loops
+# and bounded rings that cross an edge with more than two faces, where the array walkers stop (see the README),
+# and loops of wire edges, which the reference left to bpy.ops.mesh.edgering_select.
+
+import os
+import sys
+import random
+import argparse
+import itertools
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import standin
+import generators
+import reference
+
+
+# Loops and rings come back in walking order, closed ones with their start edge repeated.  Reduce both kinds to
+# the same form: open ones in either direction, closed ones from their lowest edge and in either direction.
+def canonical(edges):
+    edges = [int(e) for e in edges]
+    if len(edges) > 1 and edges[0] == edges[-1]:
+        body = edges[:-1]
+        # The reference puts the start edge in front twice.
+        while len(body) > 1 and body[0] == body[1]:
+            body = body[1:]
+        start = body.index(min(body))
+        body = body[start:] + body[:start]
+        if len(body) > 2 and body[-1] < body[1]:
+            body = [body[0]] + body[1:][::-1]
+        return ("closed", body)
+    return ("open", min(edges, edges[::-1]))
+
+
+def check_mesh(cs, prefs, name, data, samples, report):
+    topo = cs.TopologyIndex.from_mesh(data)
+    bm = standin.BMesh(data)
+    non_manifold = {e.index for e in bm.edges if len(e.link_loops) > 2}
+
+    def check(what, expected, got):
+        if expected != got:
+            report.append("%s %s: expected %s, got %s" % (name, what, expected, got))
+
+    check("vert_is_manifold", [v.is_manifold for v in bm.verts], topo.vert_is_manifold.tolist())
+    for v in bm.verts:
+        check(("get_neighbour_verts", v.index), reference.get_neighbour_verts(v),
+              set(cs.get_neighbour_verts(topo, v.index)))
+    for f in bm.faces:
+        check(("get_neighbour_faces", f.index), reference.get_neighbour_faces(f),
+              set(cs.get_neighbour_faces(topo, f.index)))
+
+    rng = random.Random(0)
+    for flags in itertools.product((True, False), repeat=3):
+        for target in (prefs, reference.prefs):
+            target.allow_non_quads_at_ends, target.terminate_self_intersects, target.boundary_ignore_wires = flags
+        for e in bm.edges:
+            i = e.index
+            if not e.is_wire:
+                check(("entire_loop", i), canonical(x.index for x in reference.entire_loop(e)),
+                      canonical(cs.entire_loop(topo, i)))
+            check(("entire_ring", i), canonical(x.index for x in reference.entire_ring(e)),
+                  canonical(cs.entire_ring(topo, i)))
+            check(("get_neighbour_edges", i), reference.get_neighbour_edges(e), set(cs.get_neighbour_edges(topo, i)))
+            ring = {x.index for x in reference.entire_ring(e)}
+            if e.link_loops and not non_manifold.intersection(ring):
+                check(("face_loop_from_edge", i, flags), reference.face_loop_from_edge(e),
+                      set(cs.face_loop_from_edge(topo, i)))
+            if e.is_boundary:
+                check(("get_boundary_edge_loop", i, flags), reference.get_boundary_edge_loop(e),
+                      set(cs.get_boundary_edge_loop(topo, i).tolist()))
+        for a in rng.sample(bm.edges, min(samples, len(bm.edges))):
+            loop = reference.entire_loop(a)
+            b = rng.choice(loop)
+            if b is not a and not a.is_wire:
+                check(("select_bounded_loop", a.index, b.index), reference.select_bounded_loop([a, b]),
+                      set(cs.select_bounded_loop(topo, [a.index, b.index]).tolist()))
+            ring = reference.entire_ring(a)
+            b = rng.choice(ring)
+            if b is not a and not non_manifold.intersection(x.index for x in ring):
+                check(("select_bounded_ring", a.index, b.index), reference.select_bounded_ring([a, b]),
+                      set(cs.select_bounded_ring(topo, [a.index, b.index]).tolist()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check ContextSelect's walkers against the BMesh reference.")
+    parser.add_argument("--kinds", default=",".join(generators.KINDS))
+    parser.add_argument("--faces", type=int, default=150, help="rough face count of each mesh")
+    parser.add_argument("--samples", type=int, default=100, help="edge pairs to check bounded selections on")
+    parser.add_argument("--show", type=int, default=20, help="differences to print")
+    args = parser.parse_args()
+
+    cs, prefs = standin.load_addon("ContextSelect.py")
+    prefs.disk_cache = False
+    report = []
+    for kind in args.kinds.split(","):
+        before = len(report)
+        check_mesh(cs, prefs, kind, generators.make(kind, args.faces), args.samples, report)
+        print("%-14s %s" % (kind, "ok" if len(report) == before else "%d differences" % (len(report) - before)))
+    for line in report[:args.show]:
+        print(line)
+    return 1 if report else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())